@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Native asyncio benchmark engine for `mode: async` and `mode: rate` performance blocks.
+
+Closed loop (`async`): requests are driven by an asyncio.Semaphore sized by
+`concurrency` and go through a shared keep-alive connection pool, so the
+numbers reflect server throughput instead of Python thread scheduling.
+
+Open loop (`rate`): requests are scheduled on a fixed timeline of `rps` for
+`duration_s`, and latency is measured from the *intended* send time so a slow
+response can't hide the queueing it causes (coordinated omission).
+
+Bodies are read in CHUNK_SIZE pieces into a body_policy.BodySink, which keeps
+all, the head or none of them (`body_policy`). A `check` callback runs the
+test's validators on each response that came back with an expected status.
+"""
+
+import asyncio
+import socket
+import ssl
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from body_policy import CHUNK_SIZE, BodyPolicy, BodySink
+from request_spec import RequestSpec
+from server_timing import next_request_id, server_timings
+
+DEFAULT_TIMEOUT = 30
+
+
+class HTTPProtocolError(Exception):
+    """Malformed or truncated HTTP response"""
+
+
+class AsyncConnectionPool:
+    """Keep-alive HTTP/1.1 connections, shared by all tasks of one run"""
+
+    def __init__(self):
+        self._idle = defaultdict(deque)
+        self._ssl_context = None
+
+    def _ssl_for(self, scheme: str):
+        if scheme != 'https':
+            return None
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    async def _connect(self, spec: RequestSpec) -> Tuple[Any, Any, Dict[str, Optional[float]]]:
+        """Open a connection, timing DNS, TCP connect and TLS handshake separately"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        addresses = await loop.getaddrinfo(spec.host, spec.port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+
+        sock, error = None, None
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, address)
+                break
+            except OSError as e:
+                sock.close()
+                sock, error = None, e
+            except BaseException:
+                sock.close()  # cancelled, e.g. by fetch's connect timeout
+                raise
+        if sock is None:
+            raise error or OSError(f"No address for {spec.host}")
+        connected = time.perf_counter()
+
+        tls = spec.scheme == 'https'
+        try:
+            reader, writer = await asyncio.open_connection(
+                sock=sock, ssl=self._ssl_for(spec.scheme),
+                server_hostname=spec.host if tls else None)
+        except BaseException:
+            sock.close()
+            raise
+        phases = {
+            'dns_ms': (resolved - start) * 1000,
+            'connect_ms': (connected - resolved) * 1000,
+            'tls_ms': (time.perf_counter() - connected) * 1000 if tls else None,
+        }
+        return reader, writer, phases
+
+    async def acquire(self, spec: RequestSpec,
+                      fresh: bool = False) -> Tuple[Any, Any, Optional[Dict[str, Optional[float]]]]:
+        """Return (reader, writer, phases); phases is None for a reused connection"""
+        idle = self._idle[spec.origin]
+        while idle and not fresh:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, None
+            writer.close()
+        return await self._connect(spec)
+
+    def release(self, spec: RequestSpec, reader, writer, reusable: bool):
+        if reusable and not writer.is_closing():
+            self._idle[spec.origin].append((reader, writer))
+        else:
+            writer.close()
+
+    async def close(self):
+        writers = [w for idle in self._idle.values() for _, w in idle]
+        self._idle.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+async def _read_into(reader, size: int, sink: BodySink):
+    while size > 0:
+        data = await reader.readexactly(min(size, CHUNK_SIZE))
+        sink.write(data)
+        size -= len(data)
+
+
+async def read_response(reader, method: str, status_line: Optional[bytes] = None,
+                        sink: Optional[BodySink] = None) -> Tuple[int, Dict[str, str], bytes, bool]:
+    """Read one response; returns (status, headers, body, keep_alive).
+
+    Interim 1xx responses (100 Continue, 103 Early Hints) are skipped; the
+    body goes through `sink` (default: one keeping all of it) and comes
+    back as the sink's CapturedBody.
+    """
+    if sink is None:
+        sink = BodySink()
+    while True:
+        if status_line is None:
+            status_line = await reader.readline()
+        if not status_line:
+            raise HTTPProtocolError("Connection closed before response")
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise HTTPProtocolError(f"Bad status line: {status_line!r}")
+        version, status = parts[0], int(parts[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            # Repeated headers (e.g. several Server-Timing lines) combine into one list
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        if not 100 <= status < 200 or status == 101:
+            break
+        status_line = None  # interim response: the final one follows on the same connection
+
+    keep_alive = headers.get('connection', '').lower() != 'close' and version != 'HTTP/1.0'
+
+    if method == 'HEAD' or status in (204, 304) or status == 101:
+        return status, headers, sink.close(), keep_alive
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Trailers end with an empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            await _read_into(reader, size, sink)
+            await reader.readexactly(2)
+        return status, headers, sink.close(), keep_alive
+
+    if 'content-length' in headers:
+        await _read_into(reader, int(headers['content-length']), sink)
+        return status, headers, sink.close(), keep_alive
+
+    # No framing: body runs to EOF and the connection cannot be reused
+    while True:
+        data = await reader.read(CHUNK_SIZE)
+        if not data:
+            return status, headers, sink.close(), False
+        sink.write(data)
+
+
+async def fetch(pool: AsyncConnectionPool, spec: RequestSpec, timeout: float = DEFAULT_TIMEOUT,
+                fresh: bool = False,
+                body_policy: Optional[BodyPolicy] = None) -> Tuple[int, Dict[str, str], bytes, Dict[str, Any]]:
+    """Send one request over the pool, retrying once if a reused socket went stale.
+
+    Returns (status, headers, body, info) where info holds `request_id`, `reused`
+    and the phase timings: `dns_ms` / `connect_ms` / `tls_ms` (new connections only),
+    `ttfb_ms` (request sent -> status line) and `transfer_ms` (rest of the response,
+    less any jsonpath scanning), `response_bytes`, plus `server_timing` when the
+    response reports its own timing. The body is kept per `body_policy` (default: all).
+    """
+    request_id = next_request_id() if spec.stamps_id else None
+    payload = spec.wire_with_id(request_id, keep_alive=not fresh)
+    for _ in range(2):
+        start = time.perf_counter()
+        # DNS, connect and TLS count against the same timeout as the exchange itself
+        reader, writer, phases = await asyncio.wait_for(pool.acquire(spec, fresh), timeout)
+        reused = phases is None
+        try:
+            sent = time.perf_counter()
+            writer.write(payload)
+            await asyncio.wait_for(writer.drain(), max(0.001, timeout - (sent - start)))
+            status_line = await asyncio.wait_for(reader.readline(),
+                                                 max(0.001, timeout - (time.perf_counter() - start)))
+            first_byte = time.perf_counter()
+            remaining = max(0.001, timeout - (first_byte - start))
+            status, headers, body, keep_alive = await asyncio.wait_for(
+                read_response(reader, spec.method, status_line,
+                              body_policy.sink() if body_policy is not None else None), remaining)
+        except (ConnectionError, HTTPProtocolError, asyncio.IncompleteReadError):
+            writer.close()
+            if reused:
+                continue
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        done = time.perf_counter()
+        pool.release(spec, reader, writer, keep_alive and not fresh)
+        info = {
+            'request_id': request_id,
+            'reused': reused,
+            **(phases or {'dns_ms': None, 'connect_ms': None, 'tls_ms': None}),
+            'ttfb_ms': (first_byte - sent) * 1000,
+            'transfer_ms': (done - first_byte) * 1000 - body.scan_ms,
+            'response_bytes': body.size,
+        }
+        timing = server_timings(headers)
+        if timing is not None:
+            info['server_timing'] = timing
+        return status, headers, body, info
+    raise HTTPProtocolError("Stale keep-alive connection")
+
+
+ResponseCheck = Callable[[List[Tuple[str, str]], Any], Optional[str]]  # (headers, body) -> error or None
+
+
+async def _timed_request(pool: AsyncConnectionPool, spec: RequestSpec, timeout: float,
+                         start: Optional[float] = None, fresh: bool = False,
+                         retry=None, body_policy: Optional[BodyPolicy] = None,
+                         check: Optional[ResponseCheck] = None) -> Dict[str, Any]:
+    """Run one request (retried per a retry.RetryPolicy); latency counts from `start` (default: now)"""
+    if start is None:
+        start = time.perf_counter()
+    trace = None
+    try:
+        if retry is None:
+            status, headers, body, info = await fetch(pool, spec, timeout, fresh, body_policy)
+        else:
+            response, error, trace = await retry.call_async(
+                lambda: fetch(pool, spec, timeout, fresh, body_policy),
+                lambda response: retry.retry_status(response[0]), start)
+            if error is not None:
+                raise error
+            status, headers, body, info = response
+    except Exception as e:
+        result = {
+            'success': False,
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+            'error': f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        }
+        if trace is not None:
+            result.update(trace)
+        return result
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    success = status in spec.expected_status
+    result = {'success': success, 'elapsed_ms': elapsed_ms, 'status_code': status, **info}
+    if trace is not None:
+        result.update(trace)
+    if not success:
+        result['error'] = f"Unexpected status {status} (expected {spec.expected_status})"
+    elif check is not None:
+        # Validator time is client overhead, outside elapsed_ms (as in the sync loop)
+        started = time.perf_counter()
+        error = check(list(headers.items()), body)
+        result['validate_ms'] = (time.perf_counter() - started) * 1000 + body.scan_ms
+        if error is not None:
+            result['success'] = False
+            result['error'] = error
+    return result
+
+
+ResultCallback = Callable[[Dict[str, Any]], None]
+SpecFeed = Callable[[], RequestSpec]  # next request to send (feeders.RequestFeed)
+StopCheck = Callable[[], bool]        # true once the loop should stop issuing requests
+
+
+async def run_closed_loop(spec: RequestSpec, repeat: int, concurrency: int,
+                          timeout: float = DEFAULT_TIMEOUT,
+                          on_result: Optional[ResultCallback] = None,
+                          fresh: bool = False, feed: Optional[SpecFeed] = None,
+                          retry=None, stop: Optional[StopCheck] = None,
+                          body_policy: Optional[BodyPolicy] = None,
+                          check: Optional[ResponseCheck] = None) -> List[Dict[str, Any]]:
+    """Issue `repeat` requests with at most `concurrency` in flight.
+
+    Each sample goes to `on_result` when given (nothing is kept), otherwise
+    samples are collected and returned. With `feed`, every request is drawn
+    from it instead of repeating `spec`. Once `stop()` is true no new request
+    is issued (e.g. a tripped circuit breaker); those in flight finish.
+    """
+    pool = AsyncConnectionPool()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = []
+    emit = on_result or results.append
+    tasks = set()
+
+    async def worker(request: RequestSpec):
+        try:
+            emit(await _timed_request(pool, request, timeout, fresh=fresh, retry=retry, body_policy=body_policy,
+                                      check=check))
+        finally:
+            semaphore.release()
+
+    try:
+        for _ in range(repeat):
+            await semaphore.acquire()
+            if stop is not None and stop():
+                semaphore.release()
+                break
+            task = asyncio.ensure_future(worker(feed() if feed else spec))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await pool.close()
+    return results
+
+
+async def run_open_loop(spec: RequestSpec, rps: float, duration_s: float, max_inflight: int,
+                        timeout: float = DEFAULT_TIMEOUT,
+                        on_result: Optional[ResultCallback] = None,
+                        fresh: bool = False, feed: Optional[SpecFeed] = None,
+                        retry=None, stop: Optional[StopCheck] = None,
+                        body_policy: Optional[BodyPolicy] = None,
+                        check: Optional[ResponseCheck] = None) -> List[Dict[str, Any]]:
+    """Send at a constant arrival rate, independent of response times.
+
+    Request i is due at t0 + i/rps. If `max_inflight` requests are outstanding
+    the next one waits for a slot, but its latency still counts from when it
+    was due, so client-side backlog shows up in the tail instead of vanishing.
+    """
+    pool = AsyncConnectionPool()
+    slots = asyncio.Semaphore(max(1, max_inflight))
+    total = int(rps * duration_s)
+    interval = 1.0 / rps
+    results = []
+    emit = on_result or results.append
+    tasks = set()
+
+    async def worker(intended: float, request: RequestSpec):
+        async with slots:
+            lag_ms = max(0.0, time.perf_counter() - intended) * 1000
+            # Retries (and their backoff) keep the slot: they are load this client still owes
+            result = await _timed_request(pool, request, timeout, start=intended, fresh=fresh, retry=retry,
+                                          body_policy=body_policy, check=check)
+        result['schedule_lag_ms'] = lag_ms
+        emit(result)
+
+    t0 = time.perf_counter()
+    try:
+        for i in range(total):
+            intended = t0 + i * interval
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if stop is not None and stop():
+                break
+            task = asyncio.ensure_future(worker(intended, feed() if feed else spec))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await pool.close()
+    return results
+
+
+def run_async_benchmark(spec: RequestSpec, repeat: int, concurrency: int,
+                        timeout: Optional[float] = None,
+                        on_result: Optional[ResultCallback] = None,
+                        fresh: bool = False, feed: Optional[SpecFeed] = None,
+                        retry=None, stop: Optional[StopCheck] = None,
+                        body_policy: Optional[BodyPolicy] = None,
+                        check: Optional[ResponseCheck] = None) -> List[Dict[str, Any]]:
+    """Blocking entry point used by BenchmarkRunner"""
+    return asyncio.run(run_closed_loop(spec, repeat, concurrency, timeout or DEFAULT_TIMEOUT,
+                                       on_result, fresh, feed, retry, stop, body_policy, check))
+
+
+def run_rate_benchmark(spec: RequestSpec, rps: float, duration_s: float, max_inflight: int,
+                       timeout: Optional[float] = None,
+                       on_result: Optional[ResultCallback] = None,
+                       fresh: bool = False, feed: Optional[SpecFeed] = None,
+                       retry=None, stop: Optional[StopCheck] = None,
+                       body_policy: Optional[BodyPolicy] = None,
+                       check: Optional[ResponseCheck] = None) -> List[Dict[str, Any]]:
+    """Blocking entry point for `mode: rate`"""
+    return asyncio.run(run_open_loop(spec, rps, duration_s, max_inflight, timeout or DEFAULT_TIMEOUT,
+                                     on_result, fresh, feed, retry, stop, body_policy, check))
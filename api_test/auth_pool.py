@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Authenticated load: a pool of logged-in users whose tokens the engines hand out.
+
+    performance:
+      mode: async
+      auth:
+        login:                                  # request block, rendered once per pool user
+          url: http://localhost:8000/api/login
+          method: POST
+          headers: {Content-Type: application/json}
+          body: {template: '{"email":"$email","password":"$password"}'}
+        credentials: {csv: ../data/users.csv}   # any feeder (see feeders.py), one draw per user
+        users: 10
+        token: {jsonpath_mini: access_token}    # bound as $token (`bind:` renames it)
+        refresh_token: {jsonpath_mini: refresh_token}
+        refresh:                                # optional; renders $refresh_token / $token
+          url: http://localhost:8000/api/refresh
+          method: POST
+          headers: {Content-Type: application/json}
+          body: {template: '{"refresh_token":"$refresh_token"}'}
+        refresh_before_s: 60
+        assign: round_robin                     # scenarios: per_vu = one user per VU for its lifetime
+    headers: {template: {Authorization: "Bearer $token"}}
+
+Every user logs in before the clock starts. A token's lifetime comes from the
+`expires_in` extractor, else the JWT `exp` claim, else `ttl_s`. A background
+thread renews tokens `refresh_before_s` ahead of expiry (logging in again when
+the refresh fails) and swaps them in, so the load loop only reads the current
+token and never waits on auth.
+"""
+
+import base64
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Any, Optional
+
+from feeders import Feeder, resolve_feeders
+from request_spec import RequestTemplate
+from transport import DEFAULT_TIMEOUT, PooledTransport
+
+AUTH_DEFAULTS = {
+    'login': None,
+    'credentials': None,
+    'users': 10,
+    'bind': 'token',
+    'token': {'jsonpath_mini': 'access_token'},
+    'refresh_token': None,
+    'expires_in': {'jsonpath_mini': 'expires_in'},
+    'ttl_s': None,
+    'refresh': None,
+    'refresh_before_s': 60,
+    'assign': 'round_robin',
+    'timeout': DEFAULT_TIMEOUT,
+}
+ASSIGN_MODES = ('round_robin', 'per_vu')
+EXTRACTOR_KEYS = ('token', 'refresh_token', 'expires_in')
+CHECK_INTERVAL_S = 1.0   # how often the refresher looks for tokens due
+RENEW_RETRY_S = 5.0      # wait after a failed refresh + login before trying that user again
+
+
+def resolve_auth(config: Any, where: str, base_dir: str = '.',
+                 scenario: bool = False) -> Optional[Dict[str, Any]]:
+    """auth block with defaults filled in (None without one); ValueError if it is invalid"""
+    if config is None or config is False:
+        return None
+    if not isinstance(config, dict):
+        raise ValueError(f"{where}: auth must be a mapping, got {config!r}")
+    unknown = set(config) - set(AUTH_DEFAULTS)
+    if unknown:
+        raise ValueError(f"{where}: unknown auth keys {sorted(unknown)}")
+    resolved = dict(AUTH_DEFAULTS, **config)
+    for key in ('login', 'refresh'):
+        request = resolved[key]
+        if request is None and key == 'refresh':
+            continue
+        if not isinstance(request, dict) or not request.get('url'):
+            raise ValueError(f"{where}: auth {key} must be a request block with a url")
+        RequestTemplate(request)  # a bad body or template fails here, not mid-run
+    for key in EXTRACTOR_KEYS:
+        extractor = resolved[key]
+        if extractor is not None and (not isinstance(extractor, dict) or len(extractor) != 1):
+            raise ValueError(f"{where}: auth {key} must be one extractor, e.g. {{jsonpath_mini: {key}}}")
+    if resolved['token'] is None:
+        raise ValueError(f"{where}: auth needs a token extractor")
+    if not isinstance(resolved['users'], int) or resolved['users'] < 1:
+        raise ValueError(f"{where}: auth users must be an integer >= 1")
+    if resolved['assign'] not in ASSIGN_MODES:
+        raise ValueError(f"{where}: auth assign must be one of {ASSIGN_MODES}, got {resolved['assign']!r}")
+    if resolved['assign'] == 'per_vu' and not scenario:
+        raise ValueError(f"{where}: auth assign per_vu needs a scenario (a performance block has no virtual users)")
+    if resolved['ttl_s'] is not None and resolved['ttl_s'] <= 0:
+        raise ValueError(f"{where}: auth ttl_s must be > 0")
+    if resolved['credentials'] is not None:
+        try:
+            resolved['credentials'] = resolve_feeders({'credentials': resolved['credentials']},
+                                                      base_dir)['credentials']
+        except ValueError as e:
+            raise ValueError(f"{where}: auth {e}")
+    return resolved
+
+
+def jwt_expires_in(token: Any) -> Optional[float]:
+    """Seconds until a JWT's `exp` claim (None if the token is not a JWT or has no exp)"""
+    parts = str(token).split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+        return float(payload['exp']) - time.time()
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class TokenPool:
+    """Logged-in users of one run; the load loop draws tokens, a background thread renews them"""
+
+    def __init__(self, config: Dict[str, Any], variables: Dict[str, Any], seed: Optional[int] = None,
+                 shard: Optional[List[int]] = None):
+        from pyresttest import validators
+        self.config = config
+        self.bind = config['bind']
+        self.variables = dict(variables)
+        self.login = RequestTemplate(config['login'])
+        self.refresh = RequestTemplate(config['refresh']) if config['refresh'] else None
+        self.extractors = {key: validators.parse_extractor(*next(iter(config[key].items())))
+                           for key in EXTRACTOR_KEYS if config[key] is not None}
+        self.credentials = Feeder({'credentials': config['credentials']}, seed, shard) \
+            if config['credentials'] else None
+        self.transport = PooledTransport(config['timeout'])
+        # Per user: its variables ($token, credentials...) and when to renew them.
+        # Entries are replaced whole, so the load loop never sees a half-updated user.
+        self.sessions: List[Dict[str, Any]] = []
+        self.renew_at: List[Optional[float]] = []
+        self.counters = Counter()
+        self.last_error: Optional[str] = None
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'TokenPool':
+        """Log every user in (before the measured run) and start the refresher if tokens expire"""
+        for _ in range(self.config['users']):
+            session = dict(self.credentials.next()) if self.credentials is not None else {}
+            try:
+                renew_at = self._authenticate(session, self.login)
+            except Exception as e:
+                self.last_error = str(e)
+                self.counters['auth_login_failed'] += 1
+                continue
+            self.sessions.append(session)
+            self.renew_at.append(renew_at)
+            self.counters['auth_logins'] += 1
+        if not self.sessions:
+            self.close()
+            raise RuntimeError(f"auth: no user could log in ({self.last_error})")
+        self.counters['auth_users'] = len(self.sessions)
+        if any(at is not None for at in self.renew_at):
+            self._thread = threading.Thread(target=self._run, name='auth-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def draw(self, vu: Optional[int] = None) -> Dict[str, Any]:
+        """Variables of the user for the next request: round robin, or virtual user `vu`'s own"""
+        sessions = self.sessions
+        index = vu if vu is not None and self.config['assign'] == 'per_vu' else next(self._next)
+        return sessions[index % len(sessions)]
+
+    def _authenticate(self, session: Dict[str, Any], request: RequestTemplate) -> Optional[float]:
+        """Send login or refresh for one user; updates its variables, returns when to renew them"""
+        spec = request.render({**self.variables, **session})
+        response = self.transport.send(spec)
+        if response['status'] not in spec.expected_status:
+            raise ValueError(f"{spec.method} {spec.url}: status {response['status']}")
+        values = {key: extractor.extract(body=response['body'], headers=response['headers'], context=None)
+                  for key, extractor in self.extractors.items()}
+        if not values['token']:
+            raise ValueError(f"{spec.method} {spec.url}: no token in the response")
+        session[self.bind] = values['token']
+        if values.get('refresh_token'):
+            session['refresh_token'] = values['refresh_token']
+
+        lifetime = None
+        try:
+            lifetime = float(values['expires_in']) if values.get('expires_in') is not None else None
+        except (TypeError, ValueError):
+            pass
+        if lifetime is None:
+            lifetime = jwt_expires_in(values['token'])
+        if lifetime is None:
+            lifetime = self.config['ttl_s']
+        if lifetime is None:
+            return None
+        # Short-lived tokens are renewed at half their life rather than looping on refresh
+        return time.monotonic() + lifetime - min(self.config['refresh_before_s'], lifetime / 2)
+
+    def _run(self):
+        while not self._stop.wait(CHECK_INTERVAL_S):
+            now = time.monotonic()
+            for index, renew_at in enumerate(self.renew_at):
+                if self._stop.is_set():
+                    return
+                if renew_at is not None and now >= renew_at:
+                    self._renew(index)
+
+    def _renew(self, index: int):
+        """Refresh one user's token, logging in again if that fails; the old token stays until then"""
+        for request, counter in ((self.refresh, 'auth_refreshes'), (self.login, 'auth_relogins')):
+            if request is None:
+                continue
+            session = dict(self.sessions[index])
+            try:
+                renew_at = self._authenticate(session, request)
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            self.sessions[index] = session
+            self.renew_at[index] = renew_at
+            self.counters[counter] += 1
+            return
+        self.counters['auth_renew_failed'] += 1
+        self.renew_at[index] = time.monotonic() + RENEW_RETRY_S
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.transport.close()
+
+
+def auth_report(counters: Counter) -> Optional[Dict[str, Any]]:
+    """metrics['auth'] from recorder counters (summed over worker shards), None without a pool"""
+    if not counters.get('auth_users'):
+        return None
+    return {'users': counters['auth_users'], 'logins': counters['auth_logins'],
+            'login_failed': counters.get('auth_login_failed', 0),
+            'refreshes': counters.get('auth_refreshes', 0), 'relogins': counters.get('auth_relogins', 0),
+            'renew_failed': counters.get('auth_renew_failed', 0)}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Baseline store and statistical regression check for performance tests.
+
+Each run can save its per-test latency histograms keyed by suite / test /
+git revision, in SQLite (`*.db`, `*.sqlite`) or a plain JSON file. A later
+run is compared against the stored baseline percentile by percentile with a
+bootstrap test: a slowdown counts only if it is both statistically
+significant and larger than a minimum effect size, so noise and tiny drifts
+don't fail the build while a 30% regression under the absolute
+threshold_ms still does.
+"""
+
+import bisect
+import json
+import math
+import os
+import random
+import sqlite3
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from latency_histogram import LatencyHistogram
+
+COMPARE_PERCENTILES = (50.0, 90.0, 95.0, 99.0)
+DEFAULT_ITERATIONS = 2000
+DEFAULT_ALPHA = 0.05
+DEFAULT_MIN_EFFECT = 0.10  # ignore slowdowns under 10% even if significant
+
+
+def git_revision(cwd: Optional[str] = None) -> str:
+    """Short hash of HEAD (with a -dirty suffix), or 'unknown' outside git"""
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+    if not rev:
+        return 'unknown'
+    return f"{rev}-dirty" if dirty else rev
+
+
+class BaselineStore:
+    """Per-test histograms keyed by (suite, test, revision); one entry per key, newest wins"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.sqlite = self.path.endswith(('.db', '.sqlite', '.sqlite3'))
+        if self.sqlite:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS baselines ("
+                " suite TEXT NOT NULL, test TEXT NOT NULL, revision TEXT NOT NULL,"
+                " created_at TEXT NOT NULL, histogram TEXT NOT NULL,"
+                " PRIMARY KEY (suite, test, revision))")
+            self._db.commit()
+        else:
+            self._entries = []
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f).get('entries', [])
+
+    def save(self, suite: str, test: str, revision: str, histogram: Dict[str, Any]):
+        created_at = datetime.now().isoformat()
+        if self.sqlite:
+            self._db.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?)",
+                             (suite, test, revision, created_at, json.dumps(histogram)))
+            return
+        self._entries = [e for e in self._entries
+                         if (e['suite'], e['test'], e['revision']) != (suite, test, revision)]
+        self._entries.append({'suite': suite, 'test': test, 'revision': revision,
+                              'created_at': created_at, 'histogram': histogram})
+
+    def latest(self, suite: str, test: str, revision: Optional[str] = None,
+               exclude_revision: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Newest entry for a test: pinned to `revision`, or else preferring other revisions"""
+        candidates = self._find(suite, test)
+        if revision is not None:
+            candidates = [e for e in candidates if e['revision'] == revision]
+        elif exclude_revision is not None:
+            others = [e for e in candidates if e['revision'] != exclude_revision]
+            candidates = others or candidates
+        return max(candidates, key=lambda e: e['created_at']) if candidates else None
+
+    def _find(self, suite: str, test: str) -> List[Dict[str, Any]]:
+        if not self.sqlite:
+            return [e for e in self._entries if e['suite'] == suite and e['test'] == test]
+        rows = self._db.execute(
+            "SELECT revision, created_at, histogram FROM baselines WHERE suite = ? AND test = ?",
+            (suite, test)).fetchall()
+        return [{'suite': suite, 'test': test, 'revision': rev, 'created_at': created,
+                 'histogram': json.loads(hist)} for rev, created, hist in rows]
+
+    def close(self):
+        if self.sqlite:
+            self._db.commit()
+            self._db.close()
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self._entries}, f)
+        os.replace(tmp, self.path)
+
+
+class _QuantileSampler:
+    """Exact bootstrap of a quantile from histogram buckets.
+
+    The k-th smallest of n resampled values is the empirical inverse CDF at a
+    Beta(k, n - k + 1) draw, so one bootstrap replicate costs one beta draw
+    and a bisect instead of resampling n values.
+    """
+
+    def __init__(self, hist: LatencyHistogram):
+        self.count = hist.count
+        self.values = []
+        self.cumulative = []
+        seen = 0
+        for _, high_ms, n in hist.buckets():
+            seen += n
+            self.values.append(min(max(high_ms, hist.min_ms), hist.max_ms))
+            self.cumulative.append(seen)
+
+    def draw(self, q: float, rng: random.Random) -> float:
+        k = max(1, int(math.ceil(q / 100.0 * self.count)))
+        u = rng.betavariate(k, self.count - k + 1)
+        rank = max(1, int(math.ceil(u * self.count)))
+        return self.values[min(bisect.bisect_left(self.cumulative, rank), len(self.values) - 1)]
+
+
+def compare_histograms(baseline: LatencyHistogram, current: LatencyHistogram,
+                       percentiles=COMPARE_PERCENTILES, iterations: int = DEFAULT_ITERATIONS,
+                       alpha: float = DEFAULT_ALPHA, min_effect: float = DEFAULT_MIN_EFFECT,
+                       seed: int = 0) -> Dict[str, Any]:
+    """Bootstrap each percentile of current vs baseline; flags significant slowdowns.
+
+    `alpha` is family-wise: each percentile is tested at alpha / len(percentiles).
+    """
+    rng = random.Random(seed)
+    alpha_each = alpha / len(percentiles)
+    base, cur = _QuantileSampler(baseline), _QuantileSampler(current)
+    out = {'baseline_count': baseline.count, 'current_count': current.count, 'percentiles': {}}
+    regressed = False
+    for q in percentiles:
+        base_ms, cur_ms = baseline.percentile(q), current.percentile(q)
+        diffs = sorted(cur.draw(q, rng) - base.draw(q, rng) for _ in range(iterations))
+        not_slower = bisect.bisect_right(diffs, 0.0)
+        p_value = (not_slower + 1) / (iterations + 1)
+        change = (cur_ms - base_ms) / base_ms if base_ms else 0.0
+        significant = p_value < alpha_each and change >= min_effect
+        regressed = regressed or significant
+        out['percentiles'][f"p{q:g}"] = {
+            'baseline_ms': base_ms,
+            'current_ms': cur_ms,
+            'change': change,
+            'ci_low_ms': diffs[int(iterations * alpha / 2)],
+            'ci_high_ms': diffs[int(iterations * (1 - alpha / 2)) - 1],
+            'p_value': p_value,
+            'regression': significant,
+        }
+    out['regression'] = regressed
+    return out
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+How much of each response body the benchmark client keeps in memory.
+
+    performance:
+      response_body: discard       # count the bytes, keep nothing
+      # response_body: head:4096   # keep the first 4 KiB (validators see only that)
+      # response_body: full        # keep the whole body
+    scenario:
+      response_body: discard       # per scenario, or per step
+
+Without `response_body` the body is discarded unless a validator needs the
+whole document. Bodies are read in CHUNK_SIZE pieces into a BodySink, so a
+large payload never sits in memory in full just to be measured.
+
+jsonpath_mini validators and extract_binds don't need the whole document
+either: a JsonPathScanner walks the JSON as chunks arrive, keeping only the
+bytes of the token it is in, and decodes the queried value once it is
+complete. Validators on other extractors get the kept part of the body.
+
+Every sample carries `response_bytes`; PerfRecorder keeps their histogram so
+payload bloat shows up next to the latency.
+"""
+
+import copy
+import json
+import re
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from latency_histogram import LatencyHistogram
+
+CHUNK_SIZE = 64 * 1024
+SIZE_HIGHEST = 1 << 40  # largest body the size histogram tracks, in bytes
+
+_WS = re.compile(rb'[ \t\r\n]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(rb'-?[0-9][0-9.eE+-]*|true|false|null')
+_TO_BRACKET = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*[\[\]{}]')
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*')
+_PLAIN = re.compile(rb'[^"\[\]{}]*')
+_OPEN, _CLOSE = b'[{', b']}'
+_QUOTE, _COLON, _COMMA = ord('"'), ord(':'), ord(',')
+
+
+def parse_body_policy(value: Any, where: str) -> Optional[str]:
+    """Normalized `response_body` (None = decide from the validators); ValueError if invalid"""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if text in ('full', 'discard'):
+        return text
+    if text.startswith('head:') and text[5:].isdigit() and int(text[5:]) > 0:
+        return f"head:{int(text[5:])}"
+    raise ValueError(f"{where}: response_body must be discard, head:N or full, got {value!r}")
+
+
+def size_histogram() -> LatencyHistogram:
+    """Histogram for response sizes: the LatencyHistogram buckets, counting bytes instead of ms"""
+    return LatencyHistogram(significant_figures=2, highest_ms=SIZE_HIGHEST, resolution_ms=1)
+
+
+def _path(query: str) -> Optional[List[Any]]:
+    """jsonpath_mini query as keys / list indexes, None if it can't be scanned forward"""
+    parts = []
+    for part in query.strip('.').split('.'):
+        try:
+            part = int(part)  # same rule as pyresttest's query_dictionary
+        except ValueError:
+            pass
+        if part == '' or isinstance(part, int) and part < 0:
+            return None  # whole document / counted from the end
+        parts.append(part)
+    return parts
+
+
+class JsonPathScanner:
+    """Finds the value at one jsonpath_mini query in a JSON body fed chunk by chunk"""
+
+    def __init__(self, path: List[Any]):
+        self.path = path
+        self.buffer = bytearray()
+        self.stack: List[List[Any]] = []  # per tracked container: [is_object, key or index, expecting]
+        self.skip = 0                     # depth inside a container off the path
+        self.in_string = False            # inside a string off the path
+        self.done = False
+        self.value = None
+        self.error: Optional[str] = None
+
+    def feed(self, data):
+        if not self.done:
+            self.buffer += data
+            self._scan(False)
+
+    def finish(self):
+        if not self.done:
+            self._scan(True)
+        if not self.done:
+            self._finish(error='Not legal JSON!')
+
+    def _finish(self, value: Any = None, error: Optional[str] = None):
+        self.done = True
+        self.value = value
+        self.error = error
+        self.buffer = bytearray()
+
+    def _after_value(self):
+        if self.stack:
+            self.stack[-1][2] = 'comma'
+        else:
+            self._finish()  # the whole document ended without reaching the path
+
+    def _scan(self, final: bool):
+        buf, pos, end = self.buffer, 0, len(self.buffer)
+        while not self.done:
+            if self.in_string:
+                # Inside a string off the path: consumed as it arrives, never buffered whole
+                pos = _STRING_BODY.match(buf, pos).end()
+                if pos >= end or buf[pos] != _QUOTE:
+                    break  # more of it (or the rest of an escape) comes in the next chunk
+                pos += 1
+                self.in_string = False
+                if not self.skip:
+                    self._after_value()
+                continue
+            pos = _WS.match(buf, pos).end()
+            if pos >= end:
+                break
+            c = buf[pos]
+            if self.skip:
+                # Off the path: only brackets matter, strings are stepped over whole
+                match = _TO_BRACKET.match(buf, pos)
+                while match is not None:
+                    pos = match.end()
+                    self.skip += 1 if buf[pos - 1] in _OPEN else -1
+                    if not self.skip:
+                        break
+                    match = _TO_BRACKET.match(buf, pos)
+                if not self.skip:
+                    self._after_value()
+                    continue
+                # No bracket in the rest of the buffer: step up to the string it ends in, if any
+                pos = _PLAIN.match(buf, pos).end()
+                if pos < end:
+                    match = _STRING.match(buf, pos)
+                    if match is not None:
+                        pos = match.end()
+                    else:
+                        self.in_string = True
+                        pos += 1
+                    continue
+                break
+
+            frame = self.stack[-1] if self.stack else None
+            expecting = frame[2] if frame else 'value'
+            if expecting == 'value':
+                depth = len(self.stack)
+                keys = [f[1] for f in self.stack]
+                on_path = keys == self.path[:depth]
+                target = on_path and depth == len(self.path)
+                if target and c in _OPEN:
+                    # Every tracked container is on the path, so this value is the one asked for
+                    try:
+                        value, _ = json.JSONDecoder().raw_decode(bytes(buf[pos:]).decode('utf-8'))
+                    except (ValueError, UnicodeDecodeError):
+                        if final:
+                            self._finish(error='Not legal JSON!')
+                        break  # not complete yet
+                    self._finish(value)
+                    break
+                if c in _OPEN:
+                    pos += 1
+                    if on_path:
+                        self.stack.append([c == ord('{'), None if c == ord('{') else 0,
+                                           'key' if c == ord('{') else 'first'])
+                    else:
+                        self.skip = 1
+                    continue
+                if c == _QUOTE and not target:
+                    if on_path:
+                        self._finish()  # a string where the path needs a container
+                        break
+                    self.in_string = True
+                    pos += 1
+                    continue
+                match = _STRING.match(buf, pos) if c == _QUOTE else _SCALAR.match(buf, pos)
+                if match is None or (match.end() == end and not final):
+                    if match is None and c != _QUOTE and (final or end - pos >= 5):
+                        self._finish(error='Not legal JSON!')
+                    break  # a number or keyword may go on in the next chunk
+                pos = match.end()
+                if target:
+                    try:
+                        self._finish(json.loads(match.group().decode('utf-8')))
+                    except (ValueError, UnicodeDecodeError):
+                        self._finish(error='Not legal JSON!')
+                    break
+                if on_path:
+                    self._finish()  # a scalar where the path needs a container
+                    break
+                self._after_value()
+            elif expecting in ('key', 'first') and c in _CLOSE:
+                self._finish()  # empty container on the path
+            elif expecting == 'first':
+                frame[2] = 'value'
+            elif expecting == 'key':
+                match = _STRING.match(buf, pos)
+                if match is None:
+                    if c != _QUOTE:
+                        self._finish(error='Not legal JSON!')
+                    break
+                frame[1] = json.loads(match.group().decode('utf-8'))
+                frame[2] = 'colon'
+                pos = match.end()
+            elif expecting == 'colon':
+                if c != _COLON:
+                    self._finish(error='Not legal JSON!')
+                    break
+                frame[2] = 'value'
+                pos += 1
+            elif c == _COMMA:
+                if frame[0]:
+                    frame[2] = 'key'
+                else:
+                    frame[1] += 1
+                    frame[2] = 'value'
+                pos += 1
+            else:
+                self._finish(error=None if c in _CLOSE else 'Not legal JSON!')  # path not in the document
+        if not self.done:
+            del buf[:pos]  # the state machine holds everything needed from consumed bytes
+
+
+class CapturedBody(bytes):
+    """Kept part of a response body, plus its full `size` and the streamed jsonpath results"""
+
+    size = 0
+    scanners: Dict[str, JsonPathScanner] = {}
+    scan_ms = 0.0
+
+
+class StreamedValue:
+    """Stands in for a jsonpath_mini extractor, answering from the value scanned off the stream"""
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.query = extractor.query
+
+    def extract(self, body=None, headers=None, context=None):
+        scanner = body.scanners[self.query]
+        if scanner.error:
+            raise ValueError(scanner.error)
+        return scanner.value
+
+    def get_readable_config(self, context=None):
+        return self.extractor.get_readable_config(context=context)
+
+
+class BodySink:
+    """Receives one body in chunks: counts it, keeps what the policy allows, feeds the scanners"""
+
+    def __init__(self, limit: Optional[int] = None, queries: Dict[str, List[Any]] = None):
+        self.limit = limit  # None = everything
+        self.size = 0
+        self.kept = 0
+        self.parts = []
+        self.scanners = {query: JsonPathScanner(path) for query, path in (queries or {}).items()}
+        self.scan_s = 0.0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limit is None:
+            self.parts.append(bytes(data))
+        elif self.kept < self.limit:
+            part = bytes(data[:self.limit - self.kept])
+            self.parts.append(part)
+            self.kept += len(part)
+        if self.scanners:
+            started = time.perf_counter()
+            for scanner in self.scanners.values():
+                scanner.feed(data)
+            self.scan_s += time.perf_counter() - started
+
+    def close(self) -> CapturedBody:
+        started = time.perf_counter()
+        for scanner in self.scanners.values():
+            scanner.finish()
+        body = CapturedBody(self.parts[0] if len(self.parts) == 1 else b''.join(self.parts))
+        body.size = self.size
+        body.scanners = self.scanners
+        body.scan_ms = (self.scan_s + time.perf_counter() - started) * 1000
+        return body
+
+
+class BodyPolicy:
+    """Resolved response_body policy: what to keep and which queries to scan while reading"""
+
+    def __init__(self, mode: str, queries: Dict[str, List[Any]] = None):
+        self.mode = mode
+        self.limit = 0 if mode == 'discard' else None if mode == 'full' else int(mode[5:])
+        self.queries = queries or {}
+
+    def sink(self) -> BodySink:
+        return BodySink(self.limit, self.queries)
+
+    @classmethod
+    def resolve(cls, setting: Optional[str], checks: List[Any] = (), extractors: List[Any] = (),
+                where: str = 'response_body') -> Tuple['BodyPolicy', List[Any], List[Any]]:
+        """Policy for validators `checks` and `extractors`, returned rewritten to use streamed values.
+
+        ValueError when `discard` is asked for but a validator needs the body itself.
+        """
+        if setting == 'full':
+            return cls('full'), list(checks), list(extractors)
+        queries = {}
+        needs_body = False
+
+        def stream(extractor):
+            nonlocal needs_body
+            if getattr(extractor, 'extractor_type', None) == 'jsonpath_mini' and not extractor.is_templated:
+                path = _path(extractor.query)
+                if path is not None:
+                    queries[extractor.query] = path
+                    return StreamedValue(extractor)
+            if getattr(extractor, 'is_body_extractor', False):
+                needs_body = True
+            return extractor
+
+        streamed_checks = []
+        for check in checks:
+            if not hasattr(check, 'extractor'):
+                needs_body = True  # a validator type that reads the body its own way
+                streamed_checks.append(check)
+                continue
+            check = copy.copy(check)
+            check.extractor = stream(check.extractor)
+            if hasattr(getattr(check, 'expected', None), 'extract'):
+                check.expected = stream(check.expected)
+            streamed_checks.append(check)
+        streamed_extractors = [stream(extractor) for extractor in extractors]
+
+        if setting is None:
+            if needs_body:
+                return cls('full'), list(checks), list(extractors)
+            setting = 'discard'
+        if setting == 'discard' and needs_body:
+            raise ValueError(f"{where}: response_body discard keeps no body, but a validator or "
+                             f"extractor needs it (use head:N or full)")
+        return cls(setting, queries), streamed_checks, streamed_extractors
+
+
+
+def format_bytes(size: float) -> str:
+    """1536 -> '1.5 KB'"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Capacity search (`mode: capacity`): ramp load step by step until the endpoint
+stops keeping up, and report the highest throughput it sustained.
+
+    performance:
+      mode: capacity
+      ramp: concurrency        # closed loop, `step_requests` per level; or `rate` (open loop, rps)
+      start: 5
+      factor: 2                # 5, 10, 20, 40, ... (or `step: 10` for +10 per level)
+      max: 200
+      step_requests: 400       # concurrency ramp; `step_duration_s` for the rate ramp
+      min_gain: 0.05           # < 5% more throughput from more concurrency (or 5% short of the rate) = saturated
+      slo:
+        p99_ms: 500            # the knee: first level breaking a latency/error assertion
+        max_error_rate: 0
+
+Each level is an ordinary async or rate run (so workers, feeders and
+connection settings apply), scored with compute_metrics. The search stops at
+the knee: an SLO breach, errors above `max_error_rate` (default 0), or
+throughput that stops following the load (no longer grows with concurrency,
+or falls behind the offered rate). The best passing level is
+the test's result; every level is kept in `capacity.curve`.
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from slo import evaluate_slo
+
+RAMPS = ('concurrency', 'rate')
+DEFAULT_MIN_GAIN = 0.05
+CAPACITY_DEFAULTS = {
+    'concurrency': {'start': 5, 'factor': 2, 'max': 200, 'max_steps': 10},
+    'rate': {'start': 10, 'factor': 2, 'max': 2000, 'max_steps': 10, 'step_duration_s': 5},
+}
+# Keys that only steer the search; not passed on to the per-level runs
+CAPACITY_KEYS = ('ramp', 'start', 'factor', 'step', 'max', 'max_steps', 'step_requests',
+                 'step_duration_s', 'min_gain', 'slo')
+
+
+def resolve_capacity(perf_config: Dict[str, Any], test_name: str) -> Dict[str, Any]:
+    """Capacity block with the ramp's defaults filled in; ValueError if it can't run"""
+    ramp = perf_config.get('ramp', 'concurrency')
+    if ramp not in RAMPS:
+        raise ValueError(f"Test '{test_name}': capacity ramp must be one of {RAMPS}, got {ramp!r}")
+    resolved = dict(CAPACITY_DEFAULTS[ramp], ramp=ramp)
+    resolved.update(perf_config)
+    if not 0 < resolved['start'] <= resolved['max']:
+        raise ValueError(f"Test '{test_name}': capacity needs 0 < start <= max")
+    if resolved.get('step') is not None:
+        if resolved['step'] <= 0:
+            raise ValueError(f"Test '{test_name}': capacity step must be positive")
+    elif resolved['factor'] <= 1:
+        raise ValueError(f"Test '{test_name}': capacity factor must be > 1")
+    if int(resolved['max_steps']) < 1:
+        raise ValueError(f"Test '{test_name}': capacity max_steps must be >= 1")
+    return resolved
+
+
+def quick_capacity(perf_config: Dict[str, Any]):
+    """Shrink a resolved capacity block in place for --quick runs"""
+    perf_config['max_steps'] = min(perf_config['max_steps'], 3)
+    if perf_config['ramp'] == 'rate':
+        perf_config['step_duration_s'] = min(perf_config['step_duration_s'], 1)
+    else:
+        perf_config['step_requests'] = min(perf_config.get('step_requests', 50), 50)
+
+
+def levels(perf_config: Dict[str, Any]) -> Iterator[float]:
+    """start, then +step or ×factor, ending exactly at max (at most max_steps levels)"""
+    level, top = perf_config['start'], perf_config['max']
+    integral = perf_config['ramp'] == 'concurrency'
+    for _ in range(int(perf_config['max_steps'])):
+        yield int(level) if integral else level
+        if level >= top:
+            return
+        step = perf_config.get('step')
+        following = level + step if step is not None else level * perf_config['factor']
+        if integral:
+            following = max(int(following), int(level) + 1)
+        level = min(following, top)
+
+
+def step_config(perf_config: Dict[str, Any], level: float, first: bool) -> Dict[str, Any]:
+    """Performance block for one level of the ramp"""
+    config = {k: v for k, v in perf_config.items() if k not in CAPACITY_KEYS}
+    if not first:
+        # Warmup/steady-state settle the server once; later levels start from warm connections
+        config.pop('steady_state', None)
+    if perf_config['ramp'] == 'rate':
+        config.update(mode='rate', rps=level, duration_s=perf_config['step_duration_s'])
+        config.setdefault('max_inflight', max(100, int(level)))
+        if not first:
+            config.pop('warmup', None)
+    else:
+        config.update(mode='async', concurrency=level,
+                      repeat=perf_config.get('step_requests', max(100, level * 20)))
+        if not first or 'warmup' not in config:
+            # One request per new connection, so handshakes don't land in the level's p99
+            config['warmup'] = level
+    return config
+
+
+def knee_reason(perf_config: Dict[str, Any], metrics: Dict[str, Any],
+                previous: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Why this level is past the knee, or None if it is sustainable"""
+    slo = {k: v for k, v in (perf_config.get('slo') or {}).items() if k != 'min_rps'}
+    for assertion in evaluate_slo(slo, metrics):
+        if not assertion['passed']:
+            actual = assertion['actual']
+            return (f"{assertion['name']} {'n/a' if actual is None else f'{actual:.4g}'}"
+                    f" breaks {assertion['target']}")
+    max_error_rate = slo.get('max_error_rate', 0)
+    if metrics['error_rate'] > max_error_rate:
+        return f"error rate {metrics['error_rate']:.2%} above {max_error_rate:.2%}"
+    if perf_config['ramp'] == 'rate':
+        # Open loop: a server that can't keep up completes less than it is offered
+        offered = metrics.get('target_rps') or 0
+        if metrics.get('throughput_rps', 0) < offered * (1 - perf_config.get('min_gain', DEFAULT_MIN_GAIN)):
+            return f"throughput {metrics.get('throughput_rps', 0):.1f} rps below offered {offered}"
+    elif previous is not None:
+        gain = metrics.get('throughput_rps', 0) / (previous.get('throughput_rps') or 1) - 1
+        if gain < perf_config.get('min_gain', DEFAULT_MIN_GAIN):
+            return f"throughput gain {gain:+.1%} (saturated)"
+    return None
+
+
+def curve_point(level: float, metrics: Dict[str, Any], reason: Optional[str]) -> Dict[str, Any]:
+    point = {'level': level, 'throughput_rps': metrics.get('throughput_rps'),
+             'error_rate': metrics['error_rate'], 'sustainable': reason is None}
+    for key in ('median_ms', 'p95_ms', 'p99_ms'):
+        point[key] = metrics.get(key)
+    if reason is not None:
+        point['reason'] = reason
+    return point
+
+
+def find_capacity(runner, test_config: Dict, perf_config: Dict, context=None,
+                  request=None) -> Dict[str, Any]:
+    """Run the ramp with a BenchmarkRunner; metrics of the best sustainable level plus `capacity`"""
+    return search_capacity(runner, test_config, perf_config, context, request)[0]
+
+
+def search_capacity(runner, test_config: Dict, perf_config: Dict, context=None,
+                    request=None) -> Tuple[Dict[str, Any], Any]:
+    """find_capacity's metrics, plus the PerfRecorder of the level they were scored on"""
+    curve: List[Dict[str, Any]] = []
+    best: Optional[Tuple[float, Dict[str, Any], Any, Dict[str, Any]]] = None
+    previous = None
+    knee = None
+    for index, level in enumerate(levels(perf_config)):
+        config = step_config(perf_config, level, index == 0)
+        recorder = runner.collect_samples(test_config, config, context, request)
+        metrics = runner.compute_metrics(recorder, config)
+        reason = knee_reason(perf_config, metrics, previous)
+        curve.append(curve_point(level, metrics, reason))
+        if reason is not None:
+            knee = {'level': level, 'reason': reason}
+            break
+        if best is None or metrics.get('throughput_rps', 0) > best[1].get('throughput_rps', 0):
+            best = (level, metrics, recorder, config)
+        previous = metrics
+
+    if best is None:
+        level = None  # not even the first level held: it is reported, failing its SLO
+    else:
+        level, _, recorder, config = best
+    # Re-score the chosen level against the full slo (min_rps = the capacity we need)
+    metrics = runner.compute_metrics(recorder, dict(config, slo=perf_config.get('slo')))
+    metrics['mode'] = 'capacity'
+    metrics['capacity'] = {
+        'ramp': perf_config['ramp'],
+        'max_sustainable_rps': metrics.get('throughput_rps', 0.0) if level is not None else 0.0,
+        'level': level,
+        'knee': knee,
+        'curve': curve,
+    }
+    return metrics, recorder
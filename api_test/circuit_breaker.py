@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Fail fast when the target is down or a run is hopeless.
+
+Per run, a CircuitBreaker watches the samples as they are recorded:
+
+    performance:
+      circuit_breaker:
+        consecutive_errors: 10     # connection errors / timeouts in a row
+        error_rate: 0.8            # or failed share of the last `window` requests
+        window: 100
+      # circuit_breaker: false     # measure failures on purpose
+
+Once it trips, the engine stops issuing requests, requests already in flight
+finish, and the metrics carry `aborted` with the reason.
+
+Across tests, TargetHealth tracks each origin (scheme, host, port): a load
+run aborted on connection errors, or `open_after` functional tests in a row
+that could not connect, opens the origin's circuit. Further tests against it
+are skipped with the reason until `cooldown_s` has passed; then one test is
+let through as a probe, and its outcome closes or re-opens the circuit.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+BREAKER_DEFAULTS = {
+    'consecutive_errors': 10,
+    'error_rate': 0.8,
+    'window': 100,
+}
+DEFAULT_OPEN_AFTER = 2      # functional tests in a row without a connection
+DEFAULT_COOLDOWN_S = 30.0   # open circuit -> one probe test allowed
+
+
+def resolve_breaker(config: Any, where: str) -> Optional[Dict[str, Any]]:
+    """circuit_breaker block with defaults (None when disabled); ValueError if it is invalid"""
+    if config is False:
+        return None
+    if config is None or config is True:
+        config = {}
+    if not isinstance(config, dict):
+        raise ValueError(f"{where}: circuit_breaker must be a mapping or false, got {config!r}")
+    unknown = set(config) - set(BREAKER_DEFAULTS)
+    if unknown:
+        raise ValueError(f"{where}: unknown circuit_breaker keys {sorted(unknown)}")
+    resolved = dict(BREAKER_DEFAULTS, **config)
+    if int(resolved['consecutive_errors']) < 1 or int(resolved['window']) < 1:
+        raise ValueError(f"{where}: circuit_breaker consecutive_errors and window must be >= 1")
+    if not 0 < resolved['error_rate'] <= 1:
+        raise ValueError(f"{where}: circuit_breaker error_rate must be in (0, 1]")
+    return resolved
+
+
+def is_connection_error(sample: Dict[str, Any]) -> bool:
+    """Failed without any HTTP response: refused, reset, DNS, timeout"""
+    return not sample['success'] and sample.get('status_code') is None
+
+
+class CircuitBreaker:
+    """Trips on consecutive connection errors or on the error rate over a sliding window"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.consecutive_limit = int(config['consecutive_errors'])
+        self.error_rate = config['error_rate']
+        self.window = deque(maxlen=int(config['window']))
+        self.window_failed = 0
+        self.consecutive = 0
+        self.reason: Optional[str] = None
+        self.connection = False  # tripped because the target stopped answering
+
+    @classmethod
+    def for_config(cls, config: Optional[Dict[str, Any]]) -> Optional['CircuitBreaker']:
+        return cls(config) if config else None
+
+    @property
+    def tripped(self) -> bool:
+        return self.reason is not None
+
+    def record(self, sample: Dict[str, Any]):
+        if self.reason is not None:
+            return
+        failed = not sample['success']
+        if len(self.window) == self.window.maxlen:
+            self.window_failed -= self.window[0]
+        self.window.append(failed)
+        self.window_failed += failed
+
+        if is_connection_error(sample):
+            self.consecutive += 1
+            if self.consecutive >= self.consecutive_limit:
+                self.connection = True
+                self.reason = (f"{self.consecutive} connection errors in a row "
+                               f"(last: {sample.get('error', 'unknown')})")
+                return
+        else:
+            self.consecutive = 0
+        if len(self.window) == self.window.maxlen and self.window_failed >= self.error_rate * len(self.window):
+            self.reason = (f"error rate {self.window_failed / len(self.window):.0%} over the last "
+                           f"{len(self.window)} requests (limit {self.error_rate:.0%})")
+
+    def report(self, completed: int) -> Dict[str, Any]:
+        return {'reason': self.reason, 'connection': self.connection, 'after_requests': completed}
+
+
+class TargetHealth:
+    """Open / half-open / closed circuit per origin, shared by every suite of a run"""
+
+    def __init__(self, open_after: int = DEFAULT_OPEN_AFTER, cooldown_s: float = DEFAULT_COOLDOWN_S):
+        self.open_after = open_after
+        self.cooldown_s = cooldown_s
+        self._failures: Dict[Tuple, int] = {}
+        self._open: Dict[Tuple, Tuple[float, str]] = {}  # origin -> (opened at, reason)
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def check(self, origin: Optional[Tuple]) -> Optional[str]:
+        """Reason to skip a test against `origin`, or None to run it (maybe as the probe)"""
+        if origin is None:
+            return None
+        with self._lock:
+            state = self._open.get(origin)
+            if state is None:
+                return None
+            opened, reason = state
+            if origin not in self._probing and time.monotonic() - opened >= self.cooldown_s:
+                self._probing.add(origin)
+                return None
+            return f"circuit open for {origin[0]}://{origin[1]}:{origin[2]}: {reason}"
+
+    def record(self, origin: Optional[Tuple], connected: bool, reason: Optional[str] = None,
+               conclusive: bool = False):
+        """Outcome of one test; `conclusive` opens the circuit at once (an aborted load run)"""
+        if origin is None:
+            return
+        with self._lock:
+            probe = origin in self._probing
+            self._probing.discard(origin)
+            if connected:
+                self._failures.pop(origin, None)
+                self._open.pop(origin, None)
+                return
+            failures = self._failures[origin] = self._failures.get(origin, 0) + 1
+            if conclusive or probe or failures >= self.open_after:
+                self._open[origin] = (time.monotonic(), reason or 'connection failed')
+
+    def open_targets(self) -> Dict[str, str]:
+        with self._lock:
+            return {f"{o[0]}://{o[1]}:{o[2]}": reason for o, (_, reason) in self._open.items()}
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Multi-process load generation.
+
+Shards a performance block's `repeat` / `rps` budget across worker processes,
+each running its own client loop (so request building and response parsing
+are not serialized by one GIL), then merges their PerfRecorders (latency
+histograms and error counts) back into a single result.
+
+When the parent wants raw samples (--stream-samples, the OpenMetrics
+exporter), workers send them back in batches over a managed queue.
+"""
+
+import copy
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Any, Optional
+
+from perf_recorder import PerfRecorder
+
+SAMPLE_BATCH = 256          # samples per queue message
+SAMPLE_FLUSH_S = 0.25       # ...or whatever a worker has after this long
+
+
+def split_budget(total: int, parts: int) -> List[int]:
+    """Split an integer budget into `parts` near-equal shares"""
+    base, extra = divmod(int(total), parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def split_warmup(shards: List[Dict], perf_config: Dict) -> List[Dict]:
+    """Split a request-count warmup across shards (a duration applies to each as is)"""
+    warmup = perf_config.get('warmup')
+    if isinstance(warmup, int) and not isinstance(warmup, bool) and shards:
+        for shard, count in zip(shards, split_budget(warmup, len(shards))):
+            shard['warmup'] = count
+    return shards
+
+
+def shard_perf_config(perf_config: Dict, workers: int) -> List[Dict]:
+    """Per-worker performance blocks that add up to the original budget"""
+    mode = perf_config.get('mode', 'sync')
+    shards = []
+    if mode == 'rate':
+        rps = perf_config.get('rps', 10) / workers
+        inflight = split_budget(perf_config.get('max_inflight', 100), workers)
+        for i in range(workers):
+            shard = copy.deepcopy(perf_config)
+            shard['rps'] = rps
+            shard['max_inflight'] = max(1, inflight[i])
+            shards.append(shard)
+        return split_feeders(split_warmup(shards, perf_config), perf_config)
+
+    repeats = split_budget(perf_config.get('repeat', 50), workers)
+    concurrency = split_budget(perf_config.get('concurrency', 5), workers)
+    for i in range(workers):
+        if repeats[i] == 0:
+            continue
+        shard = copy.deepcopy(perf_config)
+        shard['repeat'] = repeats[i]
+        shard['concurrency'] = max(1, concurrency[i])
+        shards.append(shard)
+    return split_feeders(split_warmup(shards, perf_config), perf_config)
+
+
+def split_feeders(shards: List[Dict], perf_config: Dict) -> List[Dict]:
+    """Give each shard its slice of sequential feeder values (and its own random seed) and of the auth pool"""
+    if perf_config.get('feeders') or perf_config.get('auth'):
+        for index, shard in enumerate(shards):
+            shard['feeder_shard'] = [index, len(shards)]
+    if perf_config.get('auth'):
+        # Each worker logs in its share of the users, from its own slice of the credentials
+        # (a file with fewer rows than workers wraps around, so every shard gets some)
+        users = split_budget(perf_config['auth']['users'], len(shards))
+        for shard, count in zip(shards, users):
+            shard['auth'] = dict(perf_config['auth'], users=max(1, count))
+    return shards
+
+
+class SampleBatcher:
+    """Worker-side sample sink: puts samples on the parent's queue in batches"""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.batch = []
+        self.flushed = time.monotonic()
+
+    def __call__(self, sample: Dict[str, Any]):
+        self.batch.append(sample)
+        if len(self.batch) >= SAMPLE_BATCH or time.monotonic() - self.flushed >= SAMPLE_FLUSH_S:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.samples.put(self.batch)
+            self.batch = []
+        self.flushed = time.monotonic()
+
+
+def run_shard(base_url: str, test_config: Dict, perf_config: Dict,
+              variables: Dict, request=None, samples=None) -> Dict[str, Any]:
+    """Worker entry point: run one shard locally, return the serialized recorder"""
+    from pyresttest.binding import Context
+    from run_all_suites import BenchmarkRunner
+
+    context = Context()
+    context.bind_variables(variables)
+    runner = BenchmarkRunner(base_url)
+    batcher = None
+    if samples is not None:
+        # Sent before the recorder, so the parent has every sample once the shard is done
+        batcher = runner.sample_sink = SampleBatcher(samples)
+    try:
+        return runner.collect_samples(test_config, perf_config, context, request).to_dict()
+    finally:
+        if batcher is not None:
+            batcher.flush()
+        runner.close()
+
+
+class WorkerPool:
+    """Process pool reused across performance tests of one run"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._samples = None
+
+    def run(self, base_url: str, test_config: Dict, perf_config: Dict,
+            context, request=None,
+            sample_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> PerfRecorder:
+        """Run a sharded performance test; returns the merged recorder.
+
+        `request` (a pre-parsed RequestTemplate) is pickled to the workers as is.
+        With `sample_sink`, every worker's raw samples are fed to it in this process.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        samples = None
+        if sample_sink is not None:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+                self._samples = self._manager.Queue()
+            samples = self._samples
+
+        variables = dict(context.get_values()) if context is not None else {}
+        futures = [
+            self._executor.submit(run_shard, base_url, test_config, shard, variables, request, samples)
+            for shard in shard_perf_config(perf_config, self.workers)
+        ]
+
+        if samples is not None:
+            pending = futures
+            while pending:
+                self._drain(samples, sample_sink, SAMPLE_FLUSH_S)
+                pending = wait(pending, timeout=0)[1]
+            self._drain(samples, sample_sink)
+
+        recorder = PerfRecorder.for_perf_config(perf_config)
+        for future in futures:
+            recorder.merge(PerfRecorder.from_dict(future.result()))
+        return recorder
+
+    @staticmethod
+    def _drain(samples, sample_sink: Callable[[Dict[str, Any]], None], timeout: float = 0):
+        """Feed queued sample batches to `sample_sink`; waits up to `timeout` for the first"""
+        try:
+            batch = samples.get(timeout=timeout) if timeout else samples.get_nowait()
+            while True:
+                for sample in batch:
+                    sample_sink(sample)
+                batch = samples.get_nowait()
+        except queue.Empty:
+            pass
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = self._samples = None
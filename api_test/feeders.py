@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Data feeders for performance blocks.
+
+    performance:
+      mode: async
+      repeat: 500
+      concurrency: 30
+      feeders:
+        post_id: {range: [1, 200]}              # $post_id = 1..200, cycled
+        event_id: {sql: events, column: id}     # sampled from database_backup.sql
+        user: {csv: data/users.csv}             # every column: $email, $password, ...
+        page: {choice: [1, 2, 3]}
+      feed_seed: 42                             # reproducible random draws
+
+Each request draws one value set from every feeder and renders the test's
+templates with it (`url: {template: ".../getPostById/$post_id"}`), so one
+test spreads load over many rows instead of hammering a single hot one.
+Files are read lazily and cycled; nothing is loaded before the first draw.
+"""
+
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import threading
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+FEEDER_TYPES = ('range', 'choice', 'csv', 'jsonl', 'sql')
+ORDERS = ('sequential', 'random')
+DEFAULT_SQL_DUMP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'database_backup.sql')
+DEFAULT_SQL_SAMPLE = 10000   # rows kept (reservoir sample) per sql feeder
+DEFAULT_SHUFFLE_BUFFER = 1000  # window for random order over csv/jsonl files
+SPEC_CACHE_SIZE = 4096       # distinct rendered requests kept per test
+
+_PG_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+_PG_ESCAPE_RE = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+
+
+def feeder_type(name: str, spec: Any) -> str:
+    """Which of FEEDER_TYPES a feeder declaration is; ValueError if none or several"""
+    kinds = [k for k in FEEDER_TYPES if isinstance(spec, dict) and k in spec]
+    if len(kinds) != 1:
+        raise ValueError(f"feeder '{name}' needs exactly one of {', '.join(FEEDER_TYPES)}, got {spec!r}")
+    return kinds[0]
+
+
+def resolve_feeders(feeders: Any, base_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Validated feeders with file paths made absolute (relative to the suite file)"""
+    if not isinstance(feeders, dict) or not feeders:
+        raise ValueError(f"feeders must be a mapping of name -> feeder, got {feeders!r}")
+    resolved = {}
+    for name, spec in feeders.items():
+        kind = feeder_type(name, spec)
+        spec = dict(spec)
+        order = spec.get('order', 'random' if kind in ('choice', 'sql') else 'sequential')
+        if order not in ORDERS:
+            raise ValueError(f"feeder '{name}': order must be one of {ORDERS}, got {order!r}")
+        spec['order'] = order
+
+        if kind == 'range':
+            start, stop, step = _range_bounds(name, spec['range'])
+            if (stop - start) * step < 0:
+                raise ValueError(f"feeder '{name}': range {spec['range']!r} is empty")
+        elif kind == 'choice':
+            if not isinstance(spec['choice'], list) or not spec['choice']:
+                raise ValueError(f"feeder '{name}': choice must be a non-empty list")
+        else:
+            if kind == 'sql':
+                spec.setdefault('file', DEFAULT_SQL_DUMP)
+            path_key = 'file' if kind == 'sql' else kind
+            path = str(spec[path_key])
+            if not os.path.isabs(path):
+                path = os.path.normpath(os.path.join(base_dir, path))
+            if not os.path.exists(path):
+                raise ValueError(f"feeder '{name}': file not found: {path}")
+            spec[path_key] = path
+        resolved[name] = spec
+    return resolved
+
+
+def _range_bounds(name: str, value: Any) -> Tuple[int, int, int]:
+    """(start, stop, step) from `[start, stop]`, `[start, stop, step]` or a mapping; stop is inclusive"""
+    if isinstance(value, dict):
+        value = [value.get('start', 0), value.get('stop'), value.get('step', 1)]
+    if not isinstance(value, list) or len(value) not in (2, 3) or value[1] is None:
+        raise ValueError(f"feeder '{name}': range must be [start, stop] or [start, stop, step]")
+    start, stop = int(value[0]), int(value[1])
+    step = int(value[2]) if len(value) == 3 else 1
+    if step == 0:
+        raise ValueError(f"feeder '{name}': range step must not be 0")
+    return start, stop, step
+
+
+def _pg_unescape(value: str) -> Optional[str]:
+    """One field of PostgreSQL COPY text format"""
+    if value == '\\N':
+        return None
+    if '\\' not in value:
+        return value
+
+    def replace(match):
+        code = match.group(1)
+        if code[0] == 'x' and len(code) > 1:
+            return chr(int(code[1:], 16))
+        if code[0] in '01234567':
+            return chr(int(code, 8))
+        return _PG_ESCAPES.get(code, code)
+    return _PG_ESCAPE_RE.sub(replace, value)
+
+
+def sql_rows(path: str, table: str) -> Iterator[Dict[str, Optional[str]]]:
+    """Rows of `COPY [public.]table (...) FROM stdin;` in a pg_dump file, streamed"""
+    prefixes = (f"COPY public.{table} (", f"COPY {table} (")
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith(prefixes):
+                columns = [c.strip().strip('"') for c in line[line.index('(') + 1:line.index(')')].split(',')]
+                break
+        else:
+            raise ValueError(f"table '{table}' not found in {path}")
+        for line in f:
+            line = line.rstrip('\n')
+            if line == '\\.':
+                return
+            yield dict(zip(columns, (_pg_unescape(v) for v in line.split('\t'))))
+
+
+def csv_rows(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def jsonl_rows(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Feeder:
+    """Lazily drawn variable sets for one performance block (one dict per request)"""
+
+    def __init__(self, feeders: Dict[str, Dict[str, Any]], seed: Optional[int] = None,
+                 shard: Optional[List[int]] = None):
+        # Worker shards take every n-th sequential value and their own random seed
+        self.offset, self.stride = (shard or (0, 1))
+        self.rng = random.Random(None if seed is None else seed + self.offset)
+        self.names = list(feeders)
+        self._streams = [self._stream(name, spec) for name, spec in feeders.items()]
+        self.drawn = 0
+
+    def next(self) -> Dict[str, Any]:
+        values = {}
+        for stream in self._streams:
+            values.update(next(stream))
+        self.drawn += 1
+        return values
+
+    def _stream(self, name: str, spec: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        kind = feeder_type(name, spec)
+        column = spec.get('column')
+        if kind == 'range':
+            start, stop, step = _range_bounds(name, spec['range'])
+            values = range(start, stop + (1 if step > 0 else -1), step)
+            return ({name: v} for v in self._pick(values, spec['order']))
+        if kind == 'choice':
+            return ({name: v} for v in self._pick(spec['choice'], spec['order']))
+        if kind == 'sql':
+            rows = self._sample(sql_rows(spec['file'], spec['sql']),
+                                int(spec.get('sample', DEFAULT_SQL_SAMPLE)), spec['order'])
+        else:
+            reader = csv_rows if kind == 'csv' else jsonl_rows
+            rows = self._cycle(lambda: reader(spec[kind]), spec['order'],
+                               int(spec.get('buffer', DEFAULT_SHUFFLE_BUFFER)))
+        if column is not None:
+            return ({name: row[column]} for row in rows)
+        return rows
+
+    def _pick(self, values, order: str) -> Iterator[Any]:
+        """Endless draws from an in-memory sequence"""
+        if order == 'random':
+            while True:
+                yield values[self.rng.randrange(len(values))]
+        index = self.offset
+        while True:
+            yield values[index % len(values)]
+            index += self.stride
+
+    def _sample(self, rows: Iterator[Dict[str, Any]], size: int, order: str):
+        """Reservoir sample of a row stream, read on the first draw"""
+        sample = []
+        for seen, row in enumerate(rows):
+            if seen < size:
+                sample.append(row)
+            else:
+                slot = self.rng.randrange(seen + 1)
+                if slot < size:
+                    sample[slot] = row
+        if not sample:
+            raise ValueError("sql feeder matched no rows")
+        yield from self._pick(sample, order)
+
+    def _cycle(self, open_rows, order: str, buffer: int) -> Iterator[Dict[str, Any]]:
+        """Stream a file over and over: every n-th row, or shuffled within a sliding window.
+
+        A shard past the end of a short file (fewer rows than workers) wraps
+        around the row count, as _pick does for in-memory values.
+        """
+        offset = self.offset
+        while True:
+            rows = itertools.islice(open_rows(), offset, None, self.stride)
+            if order == 'random':
+                rows = self._shuffled(rows, buffer)
+            empty = True
+            for row in rows:
+                empty = False
+                yield row
+            if empty:
+                count = sum(1 for _ in open_rows())
+                if offset < count or not count:
+                    raise ValueError("feeder file has no rows")
+                offset %= count
+
+    def _shuffled(self, rows: Iterator[Any], size: int) -> Iterator[Any]:
+        window = []
+        for row in rows:
+            if len(window) < size:
+                window.append(row)
+                continue
+            slot = self.rng.randrange(size)
+            yield window[slot]
+            window[slot] = row
+        self.rng.shuffle(window)
+        yield from window
+
+
+class RequestFeed:
+    """Callable returning the next RequestSpec, with one feeder draw (and/or pool token) bound per request"""
+
+    def __init__(self, template, variables: Dict[str, Any], feeder: Optional[Feeder],
+                 cache_size: int = SPEC_CACHE_SIZE, auth=None):
+        self.template = template
+        self.variables = dict(variables)
+        self.feeder = feeder
+        self.auth = auth  # auth_pool.TokenPool
+        self.cache_size = cache_size
+        self._specs = {}
+        self._lock = threading.Lock()  # worker threads draw too; feeder streams are generators
+
+    def __call__(self):
+        with self._lock:
+            values = self.feeder.next() if self.feeder is not None else {}
+        if self.auth is not None:
+            values = {**values, **self.auth.draw()}
+        # Only the variables the templates use decide which request this is
+        key = tuple(str(values.get(name, self.variables.get(name))) for name in self.template.variables)
+        spec = self._specs.get(key)
+        if spec is None:
+            spec = self.template.render({**self.variables, **values})
+            if len(self._specs) < self.cache_size:
+                self._specs[key] = spec  # repeat draws reuse the encoded bytes
+        return spec
+
+    @property
+    def distinct(self) -> int:
+        """Distinct requests seen so far (capped at cache_size)"""
+        return len(self._specs)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+In-process suite execution.
+
+Loads a suite file once and runs its tests through pyresttest's Python API
+against one shared Context, returning structured results instead of forking
+`python -m pyresttest` / `abc.py` and scraping their console output.
+"""
+
+import contextlib
+import io
+import os
+import re
+import sys
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Any, Optional
+
+import pycurl
+
+from pyresttest import resttest, validators
+from pyresttest.binding import Context
+from pyresttest.tests import Test
+
+from capacity import search_capacity
+from retry import RetryPolicy
+from scenario import ScenarioRun
+from suite_cache import SuitePlan, load_plan
+
+OUTPUT_LIMIT = 500  # Characters of pyresttest console output kept per test
+CURL_TIMEOUT = 28  # CURLE_OPERATION_TIMEDOUT; other curl errors count as connection errors
+_CURL_CODE_RE = re.compile(r'\((\d+),')
+
+
+class ThreadOutput(io.TextIOBase):
+    """sys.stdout stand-in that routes each thread's output to its own stream"""
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, 'stream', None) or self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+
+class BoundedOutput(io.TextIOBase):
+    """Captured console output of one test: keeps the first `limit` characters, drops the rest"""
+
+    def __init__(self, limit: int = OUTPUT_LIMIT):
+        self.limit = limit
+        self.parts = []
+        self.kept = 0
+
+    def write(self, text):
+        if self.kept < self.limit:
+            part = text[:self.limit - self.kept]
+            self.parts.append(part)
+            self.kept += len(part)
+        return len(text)
+
+    def getvalue(self) -> str:
+        return ''.join(self.parts)
+
+
+@contextlib.contextmanager
+def threaded_output():
+    """Install a ThreadOutput as sys.stdout while suites run on worker threads"""
+    router = ThreadOutput(sys.stdout)
+    sys.stdout = router
+    try:
+        yield router
+    finally:
+        sys.stdout = router.default
+
+
+@contextlib.contextmanager
+def capture_output(stream):
+    """Send print() output to `stream`; per thread when a ThreadOutput is installed"""
+    router = sys.stdout
+    if not isinstance(router, ThreadOutput):
+        with contextlib.redirect_stdout(stream):
+            yield stream
+        return
+    previous = getattr(router._local, 'stream', None)
+    router._local.stream = stream
+    try:
+        yield stream
+    finally:
+        router._local.stream = previous
+
+
+def extracted_binds(test_config: Dict) -> List[str]:
+    """Names a test binds via `extract_binds` (list-of-maps or map form)"""
+    binds = test_config.get('extract_binds') or []
+    if isinstance(binds, dict):
+        return list(binds)
+    return [name for item in binds if isinstance(item, dict) for name in item]
+
+
+def curl_phases(curl, elapsed_ms: float) -> Dict[str, Optional[float]]:
+    """Phase breakdown (ms) from libcurl's cumulative monotonic timers.
+
+    `validate_ms` is what run_test spent outside libcurl: templating,
+    validators and extractors.
+    """
+    ms = {name: curl.getinfo(opt) * 1000 for name, opt in (
+        ('namelookup', pycurl.NAMELOOKUP_TIME), ('connect', pycurl.CONNECT_TIME),
+        ('appconnect', pycurl.APPCONNECT_TIME), ('pretransfer', pycurl.PRETRANSFER_TIME),
+        ('starttransfer', pycurl.STARTTRANSFER_TIME), ('total', pycurl.TOTAL_TIME))}
+    return {
+        'dns_ms': ms['namelookup'],
+        'connect_ms': max(0.0, ms['connect'] - ms['namelookup']),
+        'tls_ms': max(0.0, ms['appconnect'] - ms['connect']) if ms['appconnect'] else None,
+        'ttfb_ms': max(0.0, ms['starttransfer'] - ms['pretransfer']),
+        'transfer_ms': max(0.0, ms['total'] - ms['starttransfer']),
+        'validate_ms': max(0.0, elapsed_ms - ms['total']),
+    }
+
+
+class LoadedSuite(SuitePlan):
+    """Compiled suite plan plus what the in-process runner needs from its config"""
+
+    def required_binds(self) -> List[str]:
+        """Binds the suite expects from the shared setup stage (`config: requires: [...]`)"""
+        required = []
+        for node in self.config_nodes:
+            names = (node.get('requires') if isinstance(node, dict) else None) or []
+            required.extend([names] if isinstance(names, str) else names)
+        return required
+
+
+def load_suite(path: str) -> LoadedSuite:
+    """Compiled plan for a YAML suite (parsed once, then served from the plan cache)"""
+    return load_plan(path, LoadedSuite)
+
+
+def curl_error_kind(response) -> Optional[str]:
+    """`timeout` / `connection` if pyresttest reported a curl exception, else None"""
+    for failure in response.failures or []:
+        if failure.failure_type == validators.FAILURE_CURL_EXCEPTION:
+            match = _CURL_CODE_RE.search(failure.message)
+            return 'timeout' if match and int(match.group(1)) == CURL_TIMEOUT else 'connection'
+    return None
+
+
+class SuiteSession:
+    """Runs the tests of one LoadedSuite against a shared Context"""
+
+    def __init__(self, suite: LoadedSuite, base_url: str, context: Optional[Context] = None,
+                 retry: Optional[Dict[str, Any]] = None):
+        self.suite = suite
+        self.base_url = base_url
+        self.retry = retry  # policy for tests without their own `retry` block (--max-retries)
+        self.working_directory = os.path.dirname(os.path.abspath(suite.path))
+
+        self.test_config = resttest.TestConfig()
+        for node in suite.config_nodes:
+            self.test_config = resttest.parse_configuration(node, base_config=self.test_config)
+
+        self.context = context if context is not None else Context()
+        self.context.bind_variable('base_url', base_url)
+        if self.test_config.variable_binds:
+            self.context.bind_variables(self.test_config.variable_binds)
+        if self.test_config.generators:
+            for name, generator in self.test_config.generators.items():
+                self.context.add_generator(name, generator)
+
+        self._parsed = {}
+        self._curl = None
+
+    def parse_test(self, index: int) -> Test:
+        """pyresttest Test for the index-th test block (parsed once)"""
+        if index not in self._parsed:
+            with resttest.cd(self.working_directory):
+                self._parsed[index] = Test.parse_test(self.base_url, self.suite.test_configs[index])
+        return self._parsed[index]
+
+    def retry_policy(self, index: int) -> Optional[RetryPolicy]:
+        test_config = self.suite.test_configs[index]
+        return RetryPolicy.for_config(self.suite.retry_configs[index] if 'retry' in test_config
+                                      else self.retry)
+
+    def _perform(self, mytest: Test):
+        if self._curl is None:
+            self._curl = pycurl.Curl()
+        response = resttest.run_test(mytest, test_config=self.test_config,
+                                     context=self.context, curl_handle=self._curl)
+        if curl_error_kind(response) is not None:
+            # run_test closed the handle; a retry needs a new one
+            self._curl = None
+        return response
+
+    def run_test(self, index: int) -> Dict[str, Any]:
+        """Run one functional test (retried per its policy) and return a structured result"""
+        test_config = self.suite.test_configs[index]
+        name = test_config.get('name', f'Test_{index + 1}')
+        trace = None
+        try:
+            mytest = self.parse_test(index)
+            retry = self.retry_policy(index)
+
+            output = BoundedOutput()  # a verbose test (e.g. a body dump) can't grow it past OUTPUT_LIMIT
+            start = time.perf_counter()
+            with capture_output(output):
+                if retry is None:
+                    response = self._perform(mytest)
+                else:
+                    response, error, trace = retry.call(
+                        lambda: self._perform(mytest),
+                        lambda response: not response.passed and (
+                            retry.retry_status(response.response_code)
+                            or curl_error_kind(response) in retry.error_kinds))
+                    if error is not None:
+                        raise error
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            return {'name': name, 'passed': False, 'error': str(e)}
+
+        try:
+            phases = curl_phases(self._curl, elapsed_ms) if self._curl is not None else None
+        except pycurl.error:
+            # run_test closes the handle on curl/parse errors; start a new one
+            phases = None
+            self._curl = None
+
+        result = {
+            'name': name,
+            'passed': bool(response.passed),
+            'status_code': response.response_code,
+            'url': response.test.url if response.test is not None else mytest.url,
+            'elapsed_ms': elapsed_ms,
+            'phases': phases,
+            'failures': [f.message for f in (response.failures or [])],
+            'output': output.getvalue()
+        }
+        if trace is not None:
+            result.update(trace)
+        return result
+
+    def close(self):
+        if self._curl is not None:
+            self._curl.close()
+            self._curl = None
+
+
+def performance_entry(name: str, recorder) -> Dict[str, Any]:
+    """run_suite's result for one load run (perf test, scenario or scenario step) from its PerfRecorder"""
+    return {
+        'name': name,
+        'type': 'performance',
+        'histogram': recorder.latency,
+        'timings': recorder.timing_summaries(),
+        'server_timing': recorder.server_timing_summaries(),
+        'errors': dict(recorder.errors)
+    }
+
+
+def run_suite(suite: LoadedSuite, base_url: str, benchmark=None,
+              context: Optional[Context] = None) -> Dict[str, Any]:
+    """Run every test of a loaded suite in order, in-process.
+
+    Tests with a `performance` block are handed to `benchmark` (a BenchmarkRunner)
+    when given, so they see binds extracted by earlier tests; otherwise they run once.
+    With `benchmark`, the suite's scenarios run after its tests: one entry for the
+    aggregate plus one per step (`step` set), as in SuiteRunner's report.
+    """
+    session = SuiteSession(suite, base_url, context)
+    tests = []
+    try:
+        for index, test_config in enumerate(suite.test_configs):
+            perf_config = suite.perf_configs[index]
+            if perf_config and benchmark is not None:
+                capacity = None
+                if perf_config.get('mode') == 'capacity':
+                    # The ramp, not one plain run; the histogram is the chosen level's
+                    metrics, recorder = search_capacity(benchmark, test_config, perf_config,
+                                                        session.context, suite.requests[index])
+                    capacity = metrics['capacity']
+                else:
+                    recorder = benchmark.collect_samples(test_config, perf_config, session.context,
+                                                         suite.requests[index])
+                entry = performance_entry(test_config.get('name', f'Test_{index + 1}'), recorder)
+                if capacity is not None:
+                    entry['capacity'] = capacity
+                tests.append(entry)
+            else:
+                result = session.run_test(index)
+                result['type'] = 'functional'
+                tests.append(result)
+        for scenario in suite.scenarios if benchmark is not None else []:
+            run = ScenarioRun(scenario, session.context.get_values(), on_result=benchmark.sample_sink,
+                              seed=scenario.config.get('seed'),
+                              check=partial(benchmark.check_response, context=session.context)).run()
+            tests.append(dict(performance_entry(scenario.name, run.aggregate), scenario=scenario.name))
+            for step in scenario.setup + scenario.steps:
+                tests.append(dict(performance_entry(f"{scenario.name} / {step.name}", run.steps[step.name]),
+                                  scenario=scenario.name, step=step.name))
+    finally:
+        session.close()
+
+    functional = [t for t in tests if t['type'] == 'functional']
+    return {
+        'suite': suite.name,
+        'tests': tests,
+        'passed': sum(1 for t in functional if t['passed']),
+        'total': len(functional)
+    }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Fixed-memory, mergeable latency histogram (HdrHistogram-style log-linear buckets).
+
+Values are recorded in milliseconds and stored as integer counts per bucket,
+so memory depends only on the configured range and precision, never on the
+number of samples. Histograms with the same configuration merge exactly,
+which lets workers ship bucket counts instead of raw samples.
+"""
+
+import math
+from typing import Dict, List, Any, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional: record_values falls back to a record() loop
+    np = None
+
+DEFAULT_SIGNIFICANT_FIGURES = 3
+DEFAULT_HIGHEST_MS = 3_600_000.0  # one hour
+DEFAULT_RESOLUTION_MS = 0.001  # microsecond units
+
+SUMMARY_PERCENTILES = (
+    ('p50_ms', 50.0),
+    ('p90_ms', 90.0),
+    ('p95_ms', 95.0),
+    ('p99_ms', 99.0),
+    ('p999_ms', 99.9),
+)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency recorder with configurable precision"""
+
+    def __init__(self, significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES,
+                 highest_ms: float = DEFAULT_HIGHEST_MS,
+                 resolution_ms: float = DEFAULT_RESOLUTION_MS):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.highest_ms = highest_ms
+        self.resolution_ms = resolution_ms
+
+        # Buckets below sub_bucket_count are exact; above, each power of two
+        # is split into `half` linear sub-buckets (relative error < 10^-digits)
+        self._sub_bucket_count = 1 << math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._sub_bucket_bits = self._sub_bucket_count.bit_length() - 1
+        self._half = self._sub_bucket_count // 2
+        self._highest_units = max(1, int(math.ceil(highest_ms / resolution_ms)))
+
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self._sum_sq = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+        self.overflow = 0  # samples clamped to highest_ms
+
+    # -- bucket arithmetic ---------------------------------------------------
+
+    def _index_for(self, units: int) -> int:
+        if units < self._sub_bucket_count:
+            return units
+        shift = units.bit_length() - self._sub_bucket_bits
+        return shift * self._half + (units >> shift)
+
+    def _bucket_range(self, index: int):
+        """(lowest, highest) unit value that maps to bucket `index`"""
+        if index < self._sub_bucket_count:
+            return index, index
+        shift = index // self._half - 1
+        low = (index - shift * self._half) << shift
+        return low, low + (1 << shift) - 1
+
+    # -- recording -----------------------------------------------------------
+
+    def record(self, value_ms: float, count: int = 1):
+        """Record `count` occurrences of a latency in milliseconds"""
+        if value_ms < 0:
+            value_ms = 0.0
+        units = int(round(value_ms / self.resolution_ms))
+        if units > self._highest_units:
+            units = self._highest_units
+            self.overflow += count
+        index = self._index_for(units)
+        self.counts[index] = self.counts.get(index, 0) + count
+
+        self.count += count
+        self.total_ms += value_ms * count
+        self._sum_sq += value_ms * value_ms * count
+        if self.min_ms is None or value_ms < self.min_ms:
+            self.min_ms = value_ms
+        if self.max_ms is None or value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def record_values(self, values):
+        """Record many latencies (ms) at once; bucket indexing is vectorized when NumPy is available"""
+        if np is None:
+            for value in values:
+                self.record(value)
+            return
+        values = np.maximum(np.asarray(values, dtype=np.float64), 0.0)
+        if not values.size:
+            return
+        units = np.rint(values / self.resolution_ms).astype(np.int64)
+        over = units > self._highest_units
+        self.overflow += int(over.sum())
+        units[over] = self._highest_units
+        # bit_length() of each value: frexp's exponent is exact for integers below 2**53
+        shift = np.maximum(np.frexp(units.astype(np.float64))[1] - self._sub_bucket_bits, 0)
+        indexes = np.where(units < self._sub_bucket_count, units, shift * self._half + (units >> shift))
+        for index, n in zip(*np.unique(indexes, return_counts=True)):
+            self.counts[int(index)] = self.counts.get(int(index), 0) + int(n)
+
+        self.count += int(values.size)
+        self.total_ms += float(values.sum())
+        self._sum_sq += float(np.dot(values, values))
+        low, high = float(values.min()), float(values.max())
+        if self.min_ms is None or low < self.min_ms:
+            self.min_ms = low
+        if self.max_ms is None or high > self.max_ms:
+            self.max_ms = high
+
+    def _compatible(self, other: 'LatencyHistogram') -> bool:
+        return (self.significant_figures == other.significant_figures and
+                self.highest_ms == other.highest_ms and
+                self.resolution_ms == other.resolution_ms)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add another histogram's counts into this one (same configuration only)"""
+        if not self._compatible(other):
+            raise ValueError("Cannot merge histograms with different precision or range")
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self._sum_sq += other._sum_sq
+        self.overflow += other.overflow
+        if other.min_ms is not None and (self.min_ms is None or other.min_ms < self.min_ms):
+            self.min_ms = other.min_ms
+        if other.max_ms is not None and (self.max_ms is None or other.max_ms > self.max_ms):
+            self.max_ms = other.max_ms
+        return self
+
+    # -- queries -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    @property
+    def std_dev_ms(self) -> float:
+        """Sample standard deviation (matches statistics.stdev)"""
+        if self.count < 2:
+            return 0.0
+        variance = (self._sum_sq - self.count * self.mean_ms ** 2) / (self.count - 1)
+        return math.sqrt(max(0.0, variance))
+
+    def percentile(self, q: float) -> float:
+        """Value at percentile q (0-100), accurate to the configured precision"""
+        if not self.count:
+            return 0.0
+        if q >= 100:
+            return self.max_ms
+        rank = max(1, int(math.ceil(q / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                _, high = self._bucket_range(index)
+                value = high * self.resolution_ms
+                return min(max(value, self.min_ms), self.max_ms)
+        return self.max_ms
+
+    def buckets(self) -> List[tuple]:
+        """Non-empty buckets as (low_ms, high_ms, count), ascending"""
+        out = []
+        for index in sorted(self.counts):
+            low, high = self._bucket_range(index)
+            out.append((low * self.resolution_ms, high * self.resolution_ms, self.counts[index]))
+        return out
+
+    def summary(self) -> Dict[str, float]:
+        """count/min/max/avg/std_dev plus p50/p90/p95/p99/p99.9"""
+        out = {
+            'count': self.count,
+            'min_ms': self.min_ms or 0.0,
+            'max_ms': self.max_ms or 0.0,
+            'avg_ms': self.mean_ms,
+            'std_dev': self.std_dev_ms,
+        }
+        for key, q in SUMMARY_PERCENTILES:
+            out[key] = self.percentile(q)
+        return out
+
+    # -- serialization -------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON-friendly form (sparse bucket counts)"""
+        return {
+            'significant_figures': self.significant_figures,
+            'highest_ms': self.highest_ms,
+            'resolution_ms': self.resolution_ms,
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'sum_sq': self._sum_sq,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms,
+            'overflow': self.overflow,
+            'counts': [[index, self.counts[index]] for index in sorted(self.counts)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        hist = cls(data.get('significant_figures', DEFAULT_SIGNIFICANT_FIGURES),
+                   data.get('highest_ms', DEFAULT_HIGHEST_MS),
+                   data.get('resolution_ms', DEFAULT_RESOLUTION_MS))
+        hist.counts = {int(index): int(n) for index, n in data.get('counts', [])}
+        hist.count = data.get('count', sum(hist.counts.values()))
+        hist.total_ms = data.get('total_ms', 0.0)
+        hist._sum_sq = data.get('sum_sq', 0.0)
+        hist.min_ms = data.get('min_ms')
+        hist.max_ms = data.get('max_ms')
+        hist.overflow = data.get('overflow', 0)
+        return hist
+
+    @classmethod
+    def from_values(cls, values, **kwargs) -> 'LatencyHistogram':
+        hist = cls(**kwargs)
+        hist.record_values(values)
+        return hist
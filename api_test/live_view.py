@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Live progress for running performance tests.
+
+    ▶ 3120/5000 | 812.4 rps | in-flight 50 | p50 3.12 p95 8.20 p99 12.01 ms | errors 503×3 conn×1 | retries 12 | ETA 2s
+
+The load loop only appends each sample to a deque (atomic under the GIL, no
+lock, no arithmetic); a background thread drains it about once per second and
+does all the counting and percentile work. Rolling percentiles cover the last
+few seconds, built from per-second histograms. On a TTY the line is redrawn in
+place; otherwise (CI logs, pipes) a plain line is printed every few seconds.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Any, Optional
+
+from latency_histogram import LatencyHistogram
+from warmup import parse_warmup
+
+REFRESH_S = 1.0        # TTY redraw interval
+LOG_INTERVAL_S = 5.0   # plain log line interval when stdout is not a TTY
+ROLLING_WINDOW_S = 5   # seconds of samples behind rps and p50/p95/p99
+
+# (requests completed, seconds elapsed) -> requests currently outstanding
+InflightEstimate = Callable[[int, float], int]
+
+
+def inflight_estimate(perf_config: Dict[str, Any]) -> Optional[InflightEstimate]:
+    """Outstanding requests derived from the loop's shape, so the engines need no extra hook"""
+    if perf_config.get('mode') == 'capacity':
+        return None  # changes with every level of the ramp
+    if perf_config.get('mode') == 'rate':
+        rps = perf_config.get('rps', 10)
+        max_inflight = perf_config.get('max_inflight', 100)
+        # Everything due by now and not done yet is in flight (or waiting for a slot)
+        return lambda done, elapsed: max(0, min(max_inflight, int(rps * elapsed) + 1 - done))
+    concurrency = perf_config.get('concurrency', 5)
+    total = expected_requests(perf_config)
+    if total is None:
+        return lambda done, elapsed: concurrency
+    return lambda done, elapsed: max(0, min(concurrency, total - done))
+
+
+def expected_requests(perf_config: Dict[str, Any]) -> Optional[int]:
+    """Samples the block will produce, warmup included (None when only its duration is known)"""
+    if perf_config.get('mode') == 'capacity':
+        return None  # ends at the knee
+    warmup_count, warmup_s = parse_warmup(perf_config)
+    if perf_config.get('mode') == 'rate':
+        rps = perf_config.get('rps', 10)
+        return int(rps * (perf_config.get('duration_s', 10) + warmup_s)) + warmup_count
+    if warmup_s:
+        return None
+    return perf_config.get('repeat', 50) + warmup_count
+
+
+class LiveProgress:
+    """Background view over the samples of one running test"""
+
+    def __init__(self, expected: Optional[int] = None, duration_s: Optional[float] = None,
+                 inflight: Optional[InflightEstimate] = None, stream=None, tty: Optional[bool] = None):
+        self.expected = expected
+        self.duration_s = duration_s
+        self.inflight = inflight
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty() if tty is None else tty
+        self.interval = REFRESH_S if self.tty else LOG_INTERVAL_S
+
+        self.inbox = deque()
+        self.record = self.inbox.append  # the only thing the load loop calls
+        self.done = 0
+        self.failed = Counter()  # status code (or 'conn') -> failed requests
+        self.retries = 0         # attempts beyond the first, under a retry policy
+        self.window = deque()    # [second, LatencyHistogram of successes, completions]
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._width = 0
+
+    @classmethod
+    def for_perf_config(cls, perf_config: Dict[str, Any], **kwargs) -> 'LiveProgress':
+        duration = None
+        if perf_config.get('mode') == 'rate':
+            duration = perf_config.get('duration_s', 10) + parse_warmup(perf_config)[1]
+        return cls(expected_requests(perf_config), duration, inflight_estimate(perf_config), **kwargs)
+
+    def __enter__(self) -> 'LiveProgress':
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='live-progress', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.tty and self._width:
+            # Final numbers are printed by the runner; leave a clean line for them
+            self.stream.write('\r' + ' ' * self._width + '\r')
+            self.stream.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.drain()
+            self.render()
+
+    def drain(self):
+        """Fold queued samples into the counters and the current second's histogram"""
+        second = int(time.perf_counter() - self.started)
+        if not self.window or self.window[-1][0] != second:
+            self.window.append([second, LatencyHistogram(significant_figures=2), 0])
+        while self.window[0][0] <= second - ROLLING_WINDOW_S:
+            self.window.popleft()
+        current = self.window[-1]
+        inbox = self.inbox
+        while inbox:
+            sample = inbox.popleft()
+            current[2] += 1
+            if sample.get('success'):
+                current[1].record(sample['elapsed_ms'])
+            else:
+                self.failed[sample.get('status_code') or 'conn'] += 1
+            self.retries += sample.get('attempts', 1) - 1
+            self.done += 1
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        span = min(elapsed, ROLLING_WINDOW_S) or 1.0
+        rps = sum(bucket[2] for bucket in self.window) / span
+        rolling = LatencyHistogram(significant_figures=2)
+        for bucket in self.window:
+            rolling.merge(bucket[1])
+
+        parts = [f"{self.done}/{self.expected}" if self.expected else f"{self.done} done", f"{rps:.1f} rps"]
+        if self.inflight is not None:
+            parts.append(f"in-flight {self.inflight(self.done, elapsed)}")
+        if rolling.count:
+            parts.append(f"p50 {rolling.percentile(50):.2f} p95 {rolling.percentile(95):.2f} "
+                         f"p99 {rolling.percentile(99):.2f} ms")
+        if self.failed:
+            parts.append('errors ' + ' '.join(f"{code}×{n}" for code, n in self.failed.most_common()))
+        if self.retries:
+            parts.append(f"retries {self.retries}")
+        eta = self.eta(elapsed, rps)
+        if eta is not None:
+            parts.append(f"ETA {eta:.0f}s")
+        return "    ▶ " + ' | '.join(parts)
+
+    def eta(self, elapsed: float, rps: float) -> Optional[float]:
+        if self.duration_s is not None:
+            return max(0.0, self.duration_s - elapsed)
+        if self.expected and rps > 0:
+            return max(0, self.expected - self.done) / rps
+        return None
+
+    def render(self):
+        line = self.line()
+        if self.tty:
+            self._width = max(self._width, len(line))
+            self.stream.write('\r' + line.ljust(self._width))
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
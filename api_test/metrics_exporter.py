@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics exporter for the harness's own request counters and latencies.
+
+    python run_all_suites.py --metrics-port 9464               # scrape http://127.0.0.1:9464/metrics
+    python run_all_suites.py --metrics-textfile /var/lib/node_exporter/harness.prom
+
+Exposed series (labels suite, test, status; status is the HTTP code or `error`):
+
+    harness_requests_total                    completed requests
+    harness_request_duration_seconds          latency histogram (fixed `le` buckets)
+    harness_test_running                      1 while the test is running
+
+Like the live view, the load loop only appends each sample to a per-test
+deque. A collector thread drains the deques once per `interval`, renders the
+whole exposition and swaps it in as one immutable bytes object, so a scrape
+only reads the last snapshot and never touches the counters.
+"""
+
+import bisect
+import os
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+
+DEFAULT_INTERVAL = 1.0  # seconds between snapshots
+# Upper bounds (seconds) of the latency buckets, +Inf implied
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+TEXT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class TestSeries:
+    """Cumulative counters of one suite/test; fed through `record`"""
+
+    def __init__(self, suite: str, test: str, buckets: Tuple[float, ...]):
+        self.suite = suite
+        self.test = test
+        self.buckets = buckets
+        self.inbox = deque()
+        self.record = self.inbox.append  # the only thing the load loop calls
+        self.running = True
+        # status -> [per-bucket counts..., +Inf count], and status -> latency sum (s)
+        self.counts: Dict[str, List[int]] = {}
+        self.sums: Dict[str, float] = {}
+
+    def drain(self):
+        inbox = self.inbox
+        buckets = self.buckets
+        while inbox:
+            sample = inbox.popleft()
+            status = str(sample.get('status_code') or 'error')
+            seconds = sample.get('elapsed_ms', 0.0) / 1000
+            counts = self.counts.get(status)
+            if counts is None:
+                counts = self.counts[status] = [0] * (len(buckets) + 1)
+                self.sums[status] = 0.0
+            counts[bisect.bisect_left(buckets, seconds)] += 1
+            self.sums[status] += seconds
+
+
+class MetricsExporter:
+    """Registry of per-test series plus the snapshot thread, HTTP endpoint and textfile writer"""
+
+    def __init__(self, port: Optional[int] = None, textfile: Optional[str] = None,
+                 host: str = '127.0.0.1', interval: float = DEFAULT_INTERVAL,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.port = port
+        self.textfile = textfile
+        self.host = host
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self.series: List[TestSeries] = []
+        self._lock = threading.Lock()  # series registration only, never per sample
+        self._snapshots = {True: b'# EOF\n', False: b''}  # openmetrics? -> rendered bytes
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def start(self) -> 'MetricsExporter':
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/metrics', '/'):
+                        self.send_error(404)
+                        return
+                    openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                    body = exporter._snapshots[openmetrics]
+                    self.send_response(200)
+                    self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else TEXT_TYPE)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass  # keep scrapes out of the run's console output
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]  # port 0 picks a free one
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Take a final snapshot (so the textfile has the complete run) and stop serving"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.snapshot()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def test_series(self, suite: str, test: str) -> TestSeries:
+        """Series for a starting test; reused (and marked running again) if the name repeats"""
+        with self._lock:
+            for series in self.series:
+                if (series.suite, series.test) == (suite, test):
+                    series.running = True
+                    return series
+            series = TestSeries(suite, test, self.buckets)
+            self.series.append(series)
+            return series
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.snapshot()
+
+    def snapshot(self):
+        """Drain every series and publish freshly rendered expositions"""
+        with self._lock:
+            series = list(self.series)
+        for item in series:
+            item.drain()
+        self._snapshots = {True: self.render(series, True).encode('utf-8'),
+                           False: self.render(series, False).encode('utf-8')}
+        if self.textfile:
+            self.write_textfile(self._snapshots[False])
+
+    def write_textfile(self, body: bytes):
+        # node_exporter's textfile collector must never see a half-written file
+        tmp = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, self.textfile)
+        except OSError:
+            pass
+
+    def render(self, series: List[TestSeries], openmetrics: bool) -> str:
+        """Exposition text; OpenMetrics or the classic Prometheus text format"""
+        requests = 'harness_requests' if openmetrics else 'harness_requests_total'
+        lines = [f'# TYPE {requests} counter',
+                 f'# HELP {requests} Requests completed by the benchmark harness']
+        for item in series:
+            for status, counts in sorted(item.counts.items()):
+                lines.append(f'harness_requests_total{_labels(suite=item.suite, test=item.test, status=status)} '
+                             f'{sum(counts)}')
+
+        lines += ['# TYPE harness_request_duration_seconds histogram',
+                  '# HELP harness_request_duration_seconds Request latency seen by the harness']
+        if openmetrics:
+            lines.append('# UNIT harness_request_duration_seconds seconds')
+        for item in series:
+            for status, counts in sorted(item.counts.items()):
+                labels = {'suite': item.suite, 'test': item.test, 'status': status}
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'harness_request_duration_seconds_bucket{_labels(**labels, le=le)} {cumulative}')
+                lines.append(f'harness_request_duration_seconds_count{_labels(**labels)} {cumulative}')
+                lines.append(f'harness_request_duration_seconds_sum{_labels(**labels)} '
+                             f'{_number(item.sums[status])}')
+
+        lines += ['# TYPE harness_test_running gauge',
+                  '# HELP harness_test_running 1 while the test is generating load']
+        for item in series:
+            lines.append(f'harness_test_running{_labels(suite=item.suite, test=item.test)} '
+                         f'{1 if item.running else 0}')
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
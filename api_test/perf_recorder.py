@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Accumulator for per-request benchmark samples.
+
+Every engine (sync, threaded, asyncio, open-loop, worker processes) emits
+plain sample dicts; PerfRecorder folds them into fixed-memory histograms and
+counters that can be merged across workers and serialized for the report.
+"""
+
+from collections import Counter
+from typing import Dict, Any, Optional
+
+from body_policy import size_histogram
+from latency_histogram import LatencyHistogram
+from server_timing import NETWORK_QUEUE, network_queue_ms
+
+# Optional per-sample phase timings, recorded from `<name>_ms` keys.
+# dns/connect/tls only appear on samples that opened a connection;
+# validate is client-side validator time, kept out of elapsed_ms.
+TIMING_KEYS = ('dns', 'connect', 'tls', 'ttfb', 'transfer', 'validate')
+
+
+class PerfRecorder:
+    """Latency + timing + server-timing + response size histograms, error/status counters"""
+
+    def __init__(self, significant_figures: int = 3):
+        self.significant_figures = significant_figures
+        self.latency = LatencyHistogram(significant_figures=significant_figures)
+        self.timings: Dict[str, LatencyHistogram] = {}
+        self.server_timings: Dict[str, LatencyHistogram] = {}  # component -> ms, from response headers
+        # Latency of the first try of each retried-policy request; not a phase, so not in timings
+        self.first_attempt = LatencyHistogram(significant_figures=significant_figures)
+        self.response_size = size_histogram()  # bytes per response body, failed requests included
+        self.errors = Counter()
+        self.status_codes = Counter()
+        self.counters = Counter()
+        self.elapsed_s = 0.0  # wall-clock time of the run that filled this recorder
+        self.aborted: Optional[Dict[str, Any]] = None  # circuit breaker report if the run was cut short
+
+    @classmethod
+    def for_perf_config(cls, perf_config: Dict) -> 'PerfRecorder':
+        return cls(significant_figures=perf_config.get('histogram_precision', 3))
+
+    def timing(self, name: str) -> LatencyHistogram:
+        if name not in self.timings:
+            self.timings[name] = LatencyHistogram(significant_figures=self.significant_figures)
+        return self.timings[name]
+
+    def server_timing(self, name: str) -> LatencyHistogram:
+        if name not in self.server_timings:
+            self.server_timings[name] = LatencyHistogram(significant_figures=self.significant_figures)
+        return self.server_timings[name]
+
+    def record(self, sample: Dict[str, Any]):
+        """Fold one sample dict into the histograms and counters"""
+        status = sample.get('status_code')
+        if status is not None:
+            self.status_codes[str(status)] += 1
+        if sample['success']:
+            self.latency.record(sample['elapsed_ms'])
+            server = sample.get('server_timing')
+            if server:
+                # Same population as the client latency: successful responses only
+                for name, ms in server.items():
+                    self.server_timing(name).record(ms)
+                if sample.get('attempts', 1) == 1:
+                    # A retried sample's elapsed_ms spans every attempt and backoff
+                    self.server_timing(NETWORK_QUEUE).record(network_queue_ms(sample))
+        else:
+            self.errors[sample.get('error', 'Unknown error')] += 1
+
+        for name in TIMING_KEYS:
+            value = sample.get(f'{name}_ms')
+            if value is not None:
+                self.timing(name).record(value)
+
+        attempts = sample.get('attempts')
+        if attempts is not None:
+            # Only samples sent under a retry policy carry attempts / first_attempt_ms
+            self.first_attempt.record(sample['first_attempt_ms'])
+            self.counters['attempts'] += attempts
+            if attempts > 1:
+                self.counters['retried'] += 1
+                if sample['success']:
+                    self.counters['retry_recovered'] += 1
+            if sample.get('retry_stop'):
+                self.counters[f"retry_{sample['retry_stop']}"] += 1
+
+        size = sample.get('response_bytes')
+        if size is not None:
+            self.response_size.record(size)
+
+        reused = sample.get('reused')
+        if reused is not None:
+            self.counters['connections_reused' if reused else 'connections_opened'] += 1
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def completed(self) -> int:
+        """Every request that finished, including warmup / pre-steady-state ones"""
+        discarded = self.counters.get('discarded_warmup', 0) + self.counters.get('discarded_steady_state', 0)
+        return self.latency.count + self.failed + discarded
+
+    def merge(self, other: 'PerfRecorder') -> 'PerfRecorder':
+        self.latency.merge(other.latency)
+        for name, hist in other.timings.items():
+            self.timing(name).merge(hist)
+        for name, hist in other.server_timings.items():
+            self.server_timing(name).merge(hist)
+        self.first_attempt.merge(other.first_attempt)
+        self.response_size.merge(other.response_size)
+        self.errors.update(other.errors)
+        self.status_codes.update(other.status_codes)
+        self.counters.update(other.counters)
+        # Shards run side by side, so the merged run lasted as long as the slowest one
+        self.elapsed_s = max(self.elapsed_s, other.elapsed_s)
+        if self.aborted is None:
+            self.aborted = other.aborted
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'significant_figures': self.significant_figures,
+            'latency': self.latency.to_dict(),
+            'timings': {name: hist.to_dict() for name, hist in self.timings.items()},
+            'server_timings': {name: hist.to_dict() for name, hist in self.server_timings.items()},
+            'first_attempt': self.first_attempt.to_dict(),
+            'response_size': self.response_size.to_dict(),
+            'errors': dict(self.errors),
+            'status_codes': dict(self.status_codes),
+            'counters': dict(self.counters),
+            'elapsed_s': self.elapsed_s,
+            'aborted': self.aborted,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PerfRecorder':
+        recorder = cls(data.get('significant_figures', 3))
+        recorder.latency = LatencyHistogram.from_dict(data['latency'])
+        recorder.timings = {name: LatencyHistogram.from_dict(h) for name, h in data.get('timings', {}).items()}
+        recorder.server_timings = {name: LatencyHistogram.from_dict(h)
+                                   for name, h in data.get('server_timings', {}).items()}
+        # Older dicts kept it as a timing
+        first_attempt = data.get('first_attempt') or data.get('timings', {}).get('first_attempt')
+        if first_attempt is not None:
+            recorder.timings.pop('first_attempt', None)
+            recorder.first_attempt = LatencyHistogram.from_dict(first_attempt)
+        if 'response_size' in data:
+            recorder.response_size = LatencyHistogram.from_dict(data['response_size'])
+        recorder.errors = Counter(data.get('errors', {}))
+        recorder.status_codes = Counter(data.get('status_codes', {}))
+        recorder.counters = Counter(data.get('counters', {}))
+        recorder.elapsed_s = data.get('elapsed_s', 0.0)
+        recorder.aborted = data.get('aborted')
+        return recorder
+
+    def timing_summaries(self) -> Optional[Dict[str, Dict[str, float]]]:
+        """Percentile summary per phase (in request order), with the end-to-end total alongside"""
+        if not self.timings:
+            return None
+        order = {name: i for i, name in enumerate(TIMING_KEYS)}
+        names = sorted(self.timings, key=lambda name: order.get(name, len(order)))
+        out = {name: self.timings[name].summary() for name in names}
+        out['total'] = self.latency.summary()
+        return out
+
+    def retry_summary(self) -> Optional[Dict[str, Any]]:
+        """Retry amplification plus first-attempt vs end-to-end latency, for runs with a retry policy"""
+        first_attempt = self.first_attempt
+        if not first_attempt.count:
+            return None
+        attempts = self.counters.get('attempts', 0)
+        return {
+            'requests': first_attempt.count,
+            'attempts': attempts,
+            'retries': attempts - first_attempt.count,
+            'amplification': attempts / first_attempt.count,
+            'retried_requests': self.counters.get('retried', 0),
+            'recovered': self.counters.get('retry_recovered', 0),
+            'exhausted': self.counters.get('retry_exhausted', 0),
+            'budget_denied': self.counters.get('retry_budget', 0),
+            'first_attempt': first_attempt.summary(),
+            'end_to_end': self.latency.summary(),
+        }
+
+    def server_timing_summaries(self) -> Optional[Dict[str, Dict[str, float]]]:
+        """Percentile summary per server-reported component, `network_queue` and client latency last"""
+        if not self.server_timings:
+            return None
+        names = sorted(name for name in self.server_timings if name != NETWORK_QUEUE)
+        out = {name: self.server_timings[name].summary() for name in names}
+        if NETWORK_QUEUE in self.server_timings:
+            out[NETWORK_QUEUE] = self.server_timings[NETWORK_QUEUE].summary()
+        out['client'] = self.latency.summary()
+        return out
+
+    def response_size_summary(self) -> Optional[Dict[str, Any]]:
+        """Body sizes in bytes: percentiles plus the total transferred, None when none were recorded"""
+        sizes = self.response_size
+        if not sizes.count:
+            return None
+        summary = sizes.summary()  # the histogram's `_ms` keys hold bytes here
+        out = {'count': sizes.count, 'total_bytes': int(sizes.total_ms)}
+        for key in ('min', 'avg', 'p50', 'p95', 'p99', 'max'):
+            out[f'{key}_bytes'] = int(round(summary[f'{key}_ms']))
+        return out
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Request resolution shared by the benchmark engines.
+Turns a suite `test` block into a concrete method/url/headers/body request.
+
+A RequestTemplate parses the block's templates once and re-renders only when
+one of the variables it references changes; the resulting RequestSpec
+serializes itself to HTTP/1.1 bytes once, so the measurement loops just
+write a frozen buffer (stamping a per-request ID is one concatenation into it).
+"""
+
+from string import Template
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
+
+from server_timing import REQUEST_ID_HEADER
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _flatten(value: Any) -> Any:
+    """Merge pyresttest-style list-of-dicts into a single dict"""
+    if isinstance(value, list) and all(isinstance(v, dict) for v in value):
+        merged = {}
+        for item in value:
+            merged.update(item)
+        return merged
+    return value
+
+
+def _template_of(value: Any) -> Optional[Any]:
+    """Return the template payload if value is a `{template: ...}` node"""
+    value = _flatten(value)
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            if str(key).lower() == 'template':
+                return inner
+    return None
+
+
+def expected_statuses(test_config: Dict, method: str) -> List[int]:
+    """Expected status codes, with pyresttest's defaults for write methods"""
+    expected = test_config.get('expected_status')
+    if expected is None:
+        if method in ('POST', 'PUT'):
+            return [200, 201, 204]
+        if method == 'DELETE':
+            return [200, 202, 204]
+        return [200]
+    if not isinstance(expected, list):
+        expected = [expected]
+    return [int(s) for s in expected]
+
+
+class RequestSpec:
+    """Concrete request for one benchmark iteration"""
+
+    def __init__(self, method: str, url: str, headers: Dict[str, str],
+                 body: Optional[bytes], expected_status: List[int]):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.expected_status = expected_status
+
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or DEFAULT_PORTS.get(self.scheme, 80)
+        self.target = parts.path or '/'
+        if parts.query:
+            self.target += '?' + parts.query
+        self._wire = {}
+        self._stamped = {}  # keep_alive -> (head up to the ID value, rest of the request)
+        # A test that sends its own X-Request-ID keeps it
+        self.stamps_id = REQUEST_ID_HEADER.lower() not in {k.lower() for k in headers}
+
+    @property
+    def origin(self) -> tuple:
+        """Connection pool key"""
+        return (self.scheme, self.host, self.port)
+
+    @property
+    def host_header(self) -> str:
+        if self.port == DEFAULT_PORTS.get(self.scheme):
+            return self.host
+        return f"{self.host}:{self.port}"
+
+    def wire(self, keep_alive: bool = True) -> bytes:
+        """The request as HTTP/1.1 bytes, encoded on first use and reused afterwards"""
+        payload = self._wire.get(keep_alive)
+        if payload is None:
+            payload = self._wire[keep_alive] = encode_request(self, keep_alive)
+        return payload
+
+    def wire_with_id(self, request_id: Optional[str], keep_alive: bool = True) -> bytes:
+        """wire() with an `X-Request-ID` header after Host (plain wire() for None or a test-set ID)"""
+        if request_id is None or not self.stamps_id:
+            return self.wire(keep_alive)
+        parts = self._stamped.get(keep_alive)
+        if parts is None:
+            payload = self.wire(keep_alive)
+            split = payload.index(b"\r\n", payload.index(b"\r\n") + 2) + 2
+            parts = self._stamped[keep_alive] = (payload[:split] + f"{REQUEST_ID_HEADER}: ".encode('latin-1'),
+                                                 b"\r\n" + payload[split:])
+        return parts[0] + request_id.encode('latin-1') + parts[1]
+
+
+def encode_request(spec: RequestSpec, keep_alive: bool = True) -> bytes:
+    """Serialize a RequestSpec as an HTTP/1.1 request"""
+    lines = [f"{spec.method} {spec.target} HTTP/1.1", f"Host: {spec.host_header}"]
+    names = {k.lower() for k in spec.headers}
+    for key, value in spec.headers.items():
+        lines.append(f"{key}: {value}")
+    if 'connection' not in names:
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    if spec.body is not None and 'content-length' not in names:
+        lines.append(f"Content-Length: {len(spec.body)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+    return head + spec.body if spec.body is not None else head
+
+
+def _compile(value: Any) -> Any:
+    """Template object for a `{template: ...}` node, the plain value otherwise"""
+    template = _template_of(value)
+    return value if template is None else Template(str(template))
+
+
+def _substitute(value: Any, variables: Dict) -> Any:
+    return value.safe_substitute(variables) if isinstance(value, Template) else value
+
+
+class RequestTemplate:
+    """A suite test block with its templates parsed once; render() per set of binds"""
+
+    def __init__(self, test_config: Dict):
+        self.method = str(test_config.get('method', 'GET')).upper()
+        self.url = _compile(test_config.get('url', ''))
+
+        raw_headers = _flatten(test_config.get('headers') or {})
+        template = _template_of(raw_headers)
+        if template is not None:
+            self.headers = [(Template(str(k)), Template(str(v)))
+                            for k, v in _flatten(template).items()]
+        else:
+            self.headers = [(str(k), str(v)) for k, v in raw_headers.items()]
+
+        body = test_config.get('body')
+        if body is not None:
+            body = _compile(body)
+            if not isinstance(body, (bytes, str, Template)):
+                raise ValueError(f"Unsupported body for benchmark request: {body!r}")
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+        self.body = body
+        self.expected_status = expected_statuses(test_config, self.method)
+        self.variables = self._referenced()
+        self._rendered = None  # (values of self.variables, RequestSpec)
+
+    def _referenced(self) -> List[str]:
+        """Names the templates reference (e.g. ['token'])"""
+        names = []
+        for value in [self.url, self.body] + [part for pair in self.headers for part in pair]:
+            if isinstance(value, Template):
+                for match in Template.pattern.finditer(value.template):
+                    name = match.group('named') or match.group('braced')
+                    if name and name not in names:
+                        names.append(name)
+        return names
+
+    def __getstate__(self):
+        # The rendered spec belongs to this process's binds; workers re-render
+        state = dict(self.__dict__)
+        state['_rendered'] = None
+        return state
+
+    def render(self, variables: Dict) -> RequestSpec:
+        """RequestSpec for these binds; the previous one is reused while they are unchanged"""
+        key = tuple(variables.get(name) for name in self.variables)
+        rendered = self._rendered
+        if rendered is not None and rendered[0] == key:
+            return rendered[1]
+
+        headers = {_substitute(k, variables): _substitute(v, variables) for k, v in self.headers}
+        body = self.body
+        if isinstance(body, Template):
+            body = body.safe_substitute(variables).encode('utf-8')
+        spec = RequestSpec(self.method, str(_substitute(self.url, variables)), headers, body,
+                           self.expected_status)
+        self._rendered = (key, spec)
+        return spec
+
+
+def build_request(test_config: Dict, context=None,
+                  template: Optional[RequestTemplate] = None) -> RequestSpec:
+    """Resolve a suite test block (or its pre-parsed template) against a pyresttest Context"""
+    variables = context.get_values() if context is not None else {}
+    if template is None:
+        template = RequestTemplate(test_config)
+    return template.render(variables)
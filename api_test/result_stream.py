@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Append-only NDJSON results stream.
+
+Each record (run header, suite start/end, test summary, optional per-request
+sample) is written as one compact JSON line as soon as it exists, optionally
+gzip-compressed, and synced to disk periodically. The final report is rebuilt
+by reading the stream back, so a run that dies halfway still leaves every
+record written up to the last sync.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Any, Iterator, Optional
+
+DEFAULT_FSYNC_INTERVAL = 1.0  # seconds
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def is_gzip_path(path: str) -> bool:
+    return str(path).endswith('.gz')
+
+
+def is_gzip_file(path: str) -> bool:
+    """Sniff the gzip magic, so `--gzip` streams read back whatever they are named"""
+    with open(path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+class ResultStream:
+    """One NDJSON record per line; flush per summary record, fsync every `fsync_interval` s"""
+
+    def __init__(self, path: str, compress: Optional[bool] = None,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        self.path = str(path)
+        self.compress = is_gzip_path(self.path) if compress is None else compress
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self._lock = threading.Lock()
+        self._raw = open(self.path, 'wb')
+        # Sync-flushed gzip members stay readable up to the last flush if we crash
+        self._out = gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress else self._raw
+        self._last_sync = time.monotonic()
+
+    def write(self, record: Dict[str, Any], flush: bool = True):
+        """Append one record; samples pass flush=False and ride on the periodic sync"""
+        line = json.dumps(record, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._raw.closed:
+                return
+            self._out.write(line)
+            self.records += 1
+            now = time.monotonic()
+            if now - self._last_sync >= self.fsync_interval:
+                self._sync(now)
+            elif flush:
+                self._out.flush()
+
+    def _sync(self, now: float):
+        self._out.flush()
+        if self._out is not self._raw:
+            self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._last_sync = now
+
+    def sync(self):
+        """Force everything written so far onto disk"""
+        with self._lock:
+            if not self._raw.closed:
+                self._sync(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            if self._raw.closed:
+                return
+            self._sync(time.monotonic())
+            if self._out is not self._raw:
+                self._out.close()
+            self._raw.close()
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a stream, stopping quietly at a truncated tail"""
+    opener = gzip.open if is_gzip_file(path) else open
+    with opener(path, 'rb') as f:
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partially written last record
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    break
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            # gzip stream cut off mid-member by a crash
+            return
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Retry policy for functional tests, performance blocks and scenario steps.
+
+    - test:
+        name: "Logout (May Fail)"
+        retry:
+          max_attempts: 3              # first attempt included
+          on_status: [429, 502, 503, 504]
+          on_errors: [connection, timeout]   # also: protocol
+          backoff_base_ms: 100         # attempt n waits uniform(0, min(max, base * 2^(n-1)))
+          backoff_max_ms: 5000
+          budget: 0.1                  # retries <= 10% of requests (+ budget_min_retries)
+        performance:
+          retry: { max_attempts: 2 }   # overrides the test's policy for the load run; `retry: false` = none
+
+Backoff uses full jitter, so clients that failed together don't retry
+together. The budget is shared by every request of one run: once retries
+reach `budget` × requests, failures are reported as they are instead of
+multiplying the load on a server that is already struggling.
+
+Each logical request produces one sample with `attempts`, `first_attempt_ms`
+(latency of the first try) and `elapsed_ms` covering every attempt and backoff;
+`retry_stop` is `exhausted` or `budget` when a retryable failure was given up on.
+"""
+
+import asyncio
+import http.client
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from async_engine import HTTPProtocolError
+
+RETRY_DEFAULTS = {
+    'max_attempts': 3,
+    'on_status': [429, 502, 503, 504],
+    'on_errors': ['connection', 'timeout'],
+    'backoff_base_ms': 100,
+    'backoff_max_ms': 5000,
+    'budget': 0.2,
+    'budget_min_retries': 10,
+}
+
+# Names usable in `on_errors`
+ERROR_GROUPS = {
+    'connection': (ConnectionError, asyncio.IncompleteReadError),
+    'timeout': (TimeoutError, socket.timeout, asyncio.TimeoutError),
+    'protocol': (http.client.HTTPException, HTTPProtocolError),
+}
+
+
+def resolve_retry(config: Any, where: str) -> Optional[Dict[str, Any]]:
+    """Retry block with defaults filled in (None when disabled); ValueError if it is invalid"""
+    if config is None or config is False:
+        return None
+    if config is True:
+        config = {}
+    elif isinstance(config, int) and not isinstance(config, bool):
+        config = {'max_attempts': config}
+    if not isinstance(config, dict):
+        raise ValueError(f"{where}: retry must be a mapping, a number of attempts or false, got {config!r}")
+    unknown = set(config) - set(RETRY_DEFAULTS)
+    if unknown:
+        raise ValueError(f"{where}: unknown retry keys {sorted(unknown)}")
+    resolved = dict(RETRY_DEFAULTS, **config)
+    if not isinstance(resolved['max_attempts'], int) or resolved['max_attempts'] < 1:
+        raise ValueError(f"{where}: retry max_attempts must be an integer >= 1")
+    on_status = resolved['on_status']
+    resolved['on_status'] = [int(s) for s in (on_status if isinstance(on_status, list) else [on_status])]
+    on_errors = resolved['on_errors'] or []
+    resolved['on_errors'] = on_errors if isinstance(on_errors, list) else [on_errors]
+    for name in resolved['on_errors']:
+        if name not in ERROR_GROUPS:
+            raise ValueError(f"{where}: retry on_errors must be among {list(ERROR_GROUPS)}, got {name!r}")
+    if not 0 <= resolved['backoff_base_ms'] <= resolved['backoff_max_ms']:
+        raise ValueError(f"{where}: retry needs 0 <= backoff_base_ms <= backoff_max_ms")
+    if resolved['budget'] is not None and resolved['budget'] < 0:
+        raise ValueError(f"{where}: retry budget must be >= 0 (or null for no cap)")
+    return resolved
+
+
+def cli_retry(max_retries: Optional[int], backoff_base_s: Optional[float],
+              backoff_max_s: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Default policy from `--max-retries N --retry-backoff-base S --retry-backoff-max S`"""
+    if not max_retries:
+        return None
+    config = {'max_attempts': max_retries + 1}
+    if backoff_base_s is not None:
+        config['backoff_base_ms'] = backoff_base_s * 1000
+    if backoff_max_s is not None:
+        config['backoff_max_ms'] = backoff_max_s * 1000
+    config['backoff_max_ms'] = max(config.get('backoff_max_ms', RETRY_DEFAULTS['backoff_max_ms']),
+                                   config.get('backoff_base_ms', RETRY_DEFAULTS['backoff_base_ms']))
+    return resolve_retry(config, '--max-retries')
+
+
+class RetryBudget:
+    """Retries allowed so far: `ratio` × requests + `min_retries`, shared by every thread/task of a run"""
+
+    def __init__(self, ratio: Optional[float], min_retries: int = 0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+
+    def withdraw(self) -> bool:
+        """Take one retry if the budget allows it"""
+        with self._lock:
+            if self.ratio is not None and self.retries >= self.ratio * self.requests + self.min_retries:
+                return False
+            self.retries += 1
+            return True
+
+
+class RetryPolicy:
+    """Resolved retry block plus the budget of the run using it"""
+
+    def __init__(self, config: Dict[str, Any], rng: Optional[random.Random] = None):
+        self.config = config
+        self.max_attempts = config['max_attempts']
+        self.on_status = frozenset(config['on_status'])
+        self.on_errors = tuple(cls for name in config['on_errors'] for cls in ERROR_GROUPS[name])
+        self.error_kinds = frozenset(config['on_errors'])
+        self.base_s = config['backoff_base_ms'] / 1000
+        self.max_s = config['backoff_max_ms'] / 1000
+        self.budget = RetryBudget(config['budget'], config['budget_min_retries'])
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def for_config(cls, config: Optional[Dict[str, Any]]) -> Optional['RetryPolicy']:
+        """Fresh policy (and budget) for one run, or None without a retry block"""
+        return cls(config) if config else None
+
+    def retry_status(self, status: Optional[int]) -> bool:
+        return status in self.on_status
+
+    def delay_s(self, attempt: int) -> float:
+        """Full-jitter backoff after the `attempt`-th try"""
+        return self.rng.uniform(0, min(self.max_s, self.base_s * 2 ** (attempt - 1)))
+
+    def _stop(self, attempts: int) -> Optional[str]:
+        """Why a retryable failure is not retried, or None to go again"""
+        if attempts >= self.max_attempts:
+            return 'exhausted'
+        if not self.budget.withdraw():
+            return 'budget'
+        return None
+
+    def call(self, send: Callable[[], Any], should_retry: Callable[[Any], bool],
+             start: Optional[float] = None) -> Tuple[Any, Optional[Exception], Dict[str, Any]]:
+        """Run `send` until it succeeds, isn't retryable or the policy gives up.
+
+        Returns (last result or None, last exception or None, trace); trace holds
+        `attempts`, `first_attempt_ms` (from `start`, default now) and `retry_stop`.
+        """
+        start = time.perf_counter() if start is None else start
+        self.budget.request()
+        trace: Dict[str, Any] = {}
+        attempts = 0
+        while True:
+            attempts += 1
+            result, error = None, None
+            try:
+                result = send()
+                retryable = should_retry(result)
+            except Exception as e:
+                error = e
+                retryable = isinstance(e, self.on_errors)
+            if attempts == 1:
+                trace['first_attempt_ms'] = (time.perf_counter() - start) * 1000
+            stop = self._stop(attempts) if retryable else None
+            if not retryable or stop is not None:
+                break
+            time.sleep(self.delay_s(attempts))
+        trace['attempts'] = attempts
+        if stop is not None:
+            trace['retry_stop'] = stop
+        return result, error, trace
+
+    async def call_async(self, send: Callable[[], Any], should_retry: Callable[[Any], bool],
+                         start: Optional[float] = None) -> Tuple[Any, Optional[Exception], Dict[str, Any]]:
+        """call() for a coroutine function; backoff sleeps without blocking the loop"""
+        start = time.perf_counter() if start is None else start
+        self.budget.request()
+        trace: Dict[str, Any] = {}
+        attempts = 0
+        while True:
+            attempts += 1
+            result, error = None, None
+            try:
+                result = await send()
+                retryable = should_retry(result)
+            except Exception as e:
+                error = e
+                retryable = isinstance(e, self.on_errors)
+            if attempts == 1:
+                trace['first_attempt_ms'] = (time.perf_counter() - start) * 1000
+            stop = self._stop(attempts) if retryable else None
+            if not retryable or stop is not None:
+                break
+            await asyncio.sleep(self.delay_s(attempts))
+        trace['attempts'] = attempts
+        if stop is not None:
+            trace['retry_stop'] = stop
+        return result, error, trace
+
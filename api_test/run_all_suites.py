@@ -8,146 +8,467 @@ import os
 import sys
 import yaml
 import json
+import io
 import time
-import statistics
 import argparse
+import contextlib
 from pathlib import Path
+from urllib.parse import urlsplit
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import subprocess
+from functools import partial
 
 # Add pyresttest to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib', 'python3.12', 'site-packages'))
 
-from pyresttest import resttest
+from pyresttest import resttest, validators
 from pyresttest.binding import Context
 from pyresttest.contenthandling import ContentHandler
 
+from async_engine import run_async_benchmark, run_rate_benchmark
+from auth_pool import TokenPool, auth_report
+from body_policy import BodyPolicy, format_bytes
+from capacity import find_capacity, quick_capacity
+from circuit_breaker import CircuitBreaker, TargetHealth
+from baseline import DEFAULT_ALPHA, DEFAULT_MIN_EFFECT, BaselineStore, compare_histograms, git_revision
+from distributed import WorkerPool
+from feeders import Feeder, RequestFeed
+from inprocess_runner import (LoadedSuite, SuiteSession, capture_output, extracted_binds,
+                              load_suite, threaded_output)
+from latency_histogram import LatencyHistogram
+from live_view import LiveProgress
+from metrics_exporter import MetricsExporter
+from perf_recorder import PerfRecorder
+from request_spec import RequestSpec, RequestTemplate, build_request
+from result_stream import DEFAULT_FSYNC_INTERVAL, ResultStream, read_records
+from retry import RetryPolicy, cli_retry
+from sample_metrics import SampleSet
+from scenario import Scenario, ScenarioRun
+from slo import evaluate_slo, validate_slo
+from transport import PooledTransport, connection_mode
+from warmup import WarmupGate, parse_warmup, steady_state_config, warmup_report
+
+# Network phases reported by the transport for every response
+PHASE_KEYS = ('dns_ms', 'connect_ms', 'tls_ms', 'ttfb_ms', 'transfer_ms')
+
 class BenchmarkRunner:
     """Handles actual performance benchmarking with metrics collection"""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", workers: int = 1):
         self.base_url = base_url
         self.context = Context()
         self.context.bind_variable('base_url', base_url)
+        self.workers = max(1, workers)
+        self.worker_pool = WorkerPool(self.workers) if self.workers > 1 else None
+        self.transport = PooledTransport()
+        # Optional callable receiving every raw sample (e.g. the NDJSON stream)
+        self.sample_sink = None
+    
+    def close(self):
+        """Shut down worker processes and pooled connections"""
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+        self.transport.close()
+    
+    def build_validators(self, test_config: Dict) -> List[Any]:
+        """Parse the test's `validators` section into pyresttest validator objects"""
+        parsed = []
+        for item in test_config.get('validators') or []:
+            for validator_type, validator_config in item.items():
+                parsed.append(validators.parse_validator(validator_type, validator_config))
+        return parsed
         
-    def run_single_test(self, test_config: Dict) -> Dict[str, Any]:
-        """Run a single test and return timing + result"""
+    def run_single_test(self, spec: RequestSpec, fresh: bool = False, checks: List[Any] = None,
+                        context: Context = None, timeout: float = None,
+                        retry: RetryPolicy = None, body_policy: BodyPolicy = None) -> Dict[str, Any]:
+        """Run a single request over the pooled transport (retried per `retry`) and return timing + result"""
+        trace = None
         try:
-            mytest = resttest.Test()
-            mytest.url = test_config.get('url', '')
-            mytest.method = test_config.get('method', 'GET').upper()
-            
-            # Set headers
-            if 'headers' in test_config:
-                mytest.headers = test_config['headers']
-            
-            # Set body
-            if 'body' in test_config:
-                mytest.body = test_config['body']
-            
-            # Set validators
-            if 'validators' in test_config:
-                mytest.validators = test_config['validators']
-            
-            start_time = time.time()
-            result = resttest.run_test(mytest, context=self.context)
-            elapsed_ms = (time.time() - start_time) * 1000
-            
-            return {
-                'success': result.passed if hasattr(result, 'passed') else True,
-                'elapsed_ms': elapsed_ms,
-                'status_code': result.response_code if hasattr(result, 'response_code') else None
-            }
+            if retry is None:
+                response = self.transport.send(spec, fresh=fresh, timeout=timeout, body_policy=body_policy)
+            else:
+                started = time.perf_counter()
+                response, error, trace = retry.call(
+                    lambda: self.transport.send(spec, fresh=fresh, timeout=timeout, body_policy=body_policy),
+                    lambda response: retry.retry_status(response['status']), started)
+                if error is not None:
+                    raise error
         except Exception as e:
-            return {
+            result = {
                 'success': False,
                 'elapsed_ms': 0,
-                'error': str(e)
+                'error': f"{type(e).__name__}: {e}"
             }
+            if trace is not None:
+                result.update(trace)
+                result['elapsed_ms'] = (time.perf_counter() - started) * 1000
+            return result
+        
+        result = {
+            'success': response['status'] in spec.expected_status,
+            'elapsed_ms': response['total_ms'],
+            'status_code': response['status'],
+            'request_id': response['request_id'],
+            'reused': response['reused'],
+            'response_bytes': response['body_bytes']
+        }
+        for phase in PHASE_KEYS:
+            result[phase] = response[phase]
+        if response['server_timing'] is not None:
+            result['server_timing'] = response['server_timing']
+        if trace is not None:
+            result.update(trace)
+            if trace['attempts'] > 1:
+                # End to end: every attempt plus the backoff between them
+                result['elapsed_ms'] = (time.perf_counter() - started) * 1000
+        if not result['success']:
+            result['error'] = f"Unexpected status {response['status']} (expected {spec.expected_status})"
+        elif checks:
+            # Validator time is client overhead: reported as its own phase, not in elapsed_ms
+            # (jsonpath values scanned off the stream while reading included)
+            started = time.perf_counter()
+            error = self.check_response(checks, context, response['headers'], response['body'])
+            if error is not None:
+                result['success'] = False
+                result['error'] = error
+            result['validate_ms'] = (time.perf_counter() - started) * 1000 + response['scan_ms']
+        return result
+    
+    def check_response(self, checks: List[Any], context: Context, headers, body) -> Optional[str]:
+        """Run the validators on one response; the first failure's message, None if all pass"""
+        for check in checks:
+            outcome = check.validate(body=body, headers=headers, context=context or self.context)
+            if not outcome:
+                return getattr(outcome, 'message', None) or 'Validation failed'
+        return None
     
-    def run_performance_test(self, test_config: Dict, perf_config: Dict) -> Dict[str, Any]:
+    def run_performance_test(self, test_config: Dict, perf_config: Dict, context: Context = None,
+                             request: RequestTemplate = None) -> Dict[str, Any]:
         """Run performance test with repeat and concurrency"""
+        if perf_config.get('mode') == 'capacity':
+            # A ramp of async/rate runs, each going through collect_samples
+            return find_capacity(self, test_config, perf_config, context, request)
+        recorder = self.collect_samples(test_config, perf_config, context, request)
+        return self.compute_metrics(recorder, perf_config)
+    
+    def collect_samples(self, test_config: Dict, perf_config: Dict, context: Context = None,
+                        request: RequestTemplate = None) -> PerfRecorder:
+        """Run the repeat/concurrency loop; returns the filled PerfRecorder.
+        
+        `request` is the test's pre-parsed template from a compiled suite plan.
+        """
+        context = context or self.context
+        if self.worker_pool is not None:
+            # Shard the budget across processes and merge their histograms
+            return self.worker_pool.run(self.base_url, test_config, perf_config, context, request,
+                                        self.sample_sink)
+        
         repeat = perf_config.get('repeat', 50)
         concurrency = perf_config.get('concurrency', 5)
         mode = perf_config.get('mode', 'sync')
+        rps = perf_config.get('rps', 10)
+        duration_s = perf_config.get('duration_s', 10)
+        fresh = connection_mode(test_config, perf_config) == 'fresh'
+        timeout = perf_config.get('timeout')
+        # One budget per run, shared by all threads / tasks
+        retry = RetryPolicy.for_config(perf_config.get('retry'))
+        breaker = CircuitBreaker.for_config(perf_config.get('circuit_breaker'))
+        stop = None
         
-        results = []
-        errors = []
+        recorder = PerfRecorder.for_perf_config(perf_config)
+        record = recorder.record
+        if self.sample_sink is not None:
+            sink = self.sample_sink
+            
+            def record(sample, fold=recorder.record):
+                fold(sample)
+                sink(sample)
+        if breaker is not None:
+            # Sees warmup samples too: a dead target should not get a full warmup either
+            stop = lambda: breaker.reason is not None
+            
+            def record(sample, fold=record, watch=breaker.record):
+                fold(sample)
+                watch(sample)
         
-        if mode == 'async' or concurrency > 1:
-            # Use ThreadPoolExecutor for concurrency
-            with ThreadPoolExecutor(max_workers=concurrency) as executor:
-                futures = [executor.submit(self.run_single_test, test_config) for _ in range(repeat)]
-                
-                for future in as_completed(futures):
-                    result = future.result()
-                    if result['success']:
-                        results.append(result['elapsed_ms'])
-                    else:
-                        errors.append(result.get('error', 'Unknown error'))
+        # Warmup requests come on top of the measured budget and are dropped,
+        # as are samples taken before the latency settles (steady_state)
+        gate = None
+        warmup_count, warmup_s = parse_warmup(perf_config)
+        steady_state = steady_state_config(perf_config)
+        if warmup_count or warmup_s or steady_state:
+            if mode == 'rate':
+                expected = int(rps * duration_s)
+                duration_s += warmup_s + warmup_count / rps
+            else:
+                expected = repeat
+                repeat += warmup_count
+            gate = WarmupGate(record, recorder.counters, warmup_count, warmup_s, steady_state, expected)
+            record = gate
+        
+        # Templates are resolved once; the bound variables don't change during the loop
+        spec = build_request(test_config, context, request)
+        feed = feeder = auth = None
+        if perf_config.get('feeders'):
+            # ...unless feeders bind new values per request: drawn lazily by the loop below
+            feeder = Feeder(perf_config['feeders'], perf_config.get('feed_seed'),
+                            perf_config.get('feeder_shard'))
+        if perf_config.get('auth'):
+            # ...or requests take turns with the tokens of a pool of users, logged in before the clock starts
+            try:
+                auth = TokenPool(perf_config['auth'], context.get_values(), perf_config.get('feed_seed'),
+                                 perf_config.get('feeder_shard')).start()
+            except Exception as e:
+                # Like a request error: this test fails with the reason, the rest of the suite still runs
+                recorder.errors[f"{type(e).__name__}: {e}"] += 1
+                return recorder
+        if feeder is not None or auth is not None:
+            feed = RequestFeed(request or RequestTemplate(test_config), context.get_values(), feeder, auth=auth)
+        
+        # Bodies are counted, then kept whole, truncated or dropped (`response_body`); without
+        # the setting only a validator that needs the whole document keeps them
+        checks = self.build_validators(test_config)
+        body_policy, checks, _ = BodyPolicy.resolve(perf_config.get('response_body'), checks,
+                                                    where=f"Test '{test_config.get('name')}' performance")
+        check = partial(self.check_response, checks, context) if checks else None
+        
+        started = time.perf_counter()
+        if mode == 'async':
+            # Native asyncio engine over a shared keep-alive pool
+            run_async_benchmark(spec, repeat, concurrency, timeout, on_result=record, fresh=fresh, feed=feed,
+                                retry=retry, stop=stop, body_policy=body_policy, check=check)
+        elif mode == 'rate':
+            # Open loop: constant arrival rate, latency from intended send time
+            run_rate_benchmark(spec, rps, duration_s, perf_config.get('max_inflight', 100), timeout,
+                               on_result=record, fresh=fresh, feed=feed, retry=retry, stop=stop,
+                               body_policy=body_policy, check=check)
         else:
-            # Synchronous mode
-            for i in range(repeat):
-                result = self.run_single_test(test_config)
-                if result['success']:
-                    results.append(result['elapsed_ms'])
-                else:
-                    errors.append(result.get('error', 'Unknown error'))
+            if concurrency > 1:
+                # Use ThreadPoolExecutor for concurrency; each thread keeps its own connections
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    # Fed requests are drawn when a thread picks them up, so refreshed tokens apply
+                    send = (lambda: self.run_single_test(feed(), fresh, checks, context, timeout, retry,
+                                                         body_policy)) \
+                        if feed else partial(self.run_single_test, spec, fresh, checks, context, timeout, retry,
+                                             body_policy)
+                    futures = [executor.submit(send) for _ in range(repeat)]
+                    
+                    for future in as_completed(futures):
+                        if future.cancelled():
+                            continue
+                        record(future.result())
+                        if stop is not None and stop():
+                            # Drop the queued requests; the ones already running still report
+                            for pending in futures:
+                                pending.cancel()
+            else:
+                # Synchronous mode
+                for i in range(repeat):
+                    if stop is not None and stop():
+                        break
+                    record(self.run_single_test(feed() if feed else spec, fresh, checks, context, timeout,
+                                                retry, body_policy))
+            self.transport.close()
+        
+        recorder.elapsed_s = time.perf_counter() - started
+        if breaker is not None and breaker.tripped:
+            recorder.aborted = breaker.report(recorder.completed)
+        if auth is not None:
+            auth.close()
+            recorder.counters.update(auth.counters)
+        if feeder is not None:
+            recorder.counters['fed_requests'] += feeder.drawn
+            recorder.counters['distinct_requests'] += feed.distinct
+        if gate is not None:
+            gate.close()
+        return recorder
+    
+    def compute_metrics(self, recorder: PerfRecorder, perf_config: Dict) -> Dict[str, Any]:
+        """Build the min/avg/p95/p99 metrics dict from the recorded histograms"""
+        histogram = recorder.latency
+        errors = recorder.errors
+        repeat = perf_config.get('repeat', 50)
+        concurrency = perf_config.get('concurrency', 5)
+        mode = perf_config.get('mode', 'sync')
+        if mode == 'rate':
+            repeat = int(perf_config.get('rps', 10) * perf_config.get('duration_s', 10))
+            concurrency = perf_config.get('max_inflight', 100)
+        failed = recorder.failed
+        warmup = warmup_report(recorder.counters)
+        if mode == 'scenario':
+            # Duration-bound VUs: the request count is whatever the mix produced
+            concurrency = perf_config.get('virtual_users', 1)
+            repeat = histogram.count + failed
+        if warmup:
+            # Count what was measured: steady-state detection (and a warmup
+            # duration in closed-loop modes) eats into the configured budget
+            repeat = histogram.count + failed
         
         # Calculate metrics
-        if results:
-            sorted_results = sorted(results)
+        if histogram.count:
+            summary = histogram.summary()
             metrics = {
                 'total_requests': repeat,
-                'successful': len(results),
-                'failed': len(errors),
-                'min_ms': min(results),
-                'max_ms': max(results),
-                'avg_ms': statistics.mean(results),
-                'median_ms': statistics.median(results),
-                'p95_ms': sorted_results[int(len(sorted_results) * 0.95)] if len(sorted_results) > 1 else sorted_results[0],
-                'p99_ms': sorted_results[int(len(sorted_results) * 0.99)] if len(sorted_results) > 1 else sorted_results[0],
-                'std_dev': statistics.stdev(results) if len(results) > 1 else 0,
+                'successful': histogram.count,
+                'failed': failed,
+                'min_ms': summary['min_ms'],
+                'max_ms': summary['max_ms'],
+                'avg_ms': summary['avg_ms'],
+                'median_ms': summary['p50_ms'],
+                'p90_ms': summary['p90_ms'],
+                'p95_ms': summary['p95_ms'],
+                'p99_ms': summary['p99_ms'],
+                'p999_ms': summary['p999_ms'],
+                'std_dev': summary['std_dev'],
                 'mode': mode,
                 'concurrency': concurrency,
-                'repeat': repeat
+                'repeat': repeat,
+                'workers': self.workers,
+                'connection': perf_config.get('connection', 'reuse'),
+                'connections_opened': recorder.counters.get('connections_opened', 0),
+                'status_codes': dict(recorder.status_codes)
             }
+            if mode == 'rate':
+                metrics['target_rps'] = perf_config.get('rps', 10)
+                metrics['duration_s'] = perf_config.get('duration_s', 10)
             
             # Calculate threshold pass/fail if specified
             if 'threshold_ms' in perf_config:
                 threshold = perf_config['threshold_ms']
                 metrics['threshold_ms'] = threshold
                 metrics['threshold_passed'] = metrics['avg_ms'] <= threshold
-            
-            return metrics
         else:
-            return {
+            metrics = {
                 'total_requests': repeat,
                 'successful': 0,
-                'failed': len(errors),
-                'errors': errors[:5]  # First 5 errors
+                'failed': failed,
+                'status_codes': dict(recorder.status_codes)
             }
+        
+        completed = histogram.count + failed
+        metrics['error_rate'] = failed / completed if completed else 1.0
+        metrics['elapsed_s'] = recorder.elapsed_s
+        if recorder.elapsed_s > 0:
+            metrics['throughput_rps'] = recorder.completed / recorder.elapsed_s
+        
+        timings = recorder.timing_summaries()
+        if timings:
+            # Phases are recorded for failed requests too
+            metrics['timings'] = timings
+        retry = recorder.retry_summary()
+        if retry:
+            metrics['retry'] = retry
+        server_timing = recorder.server_timing_summaries()
+        if server_timing:
+            # From the responses' Server-Timing / X-Runtime headers, next to the client latency
+            metrics['server_timing'] = server_timing
+        response_size = recorder.response_size_summary()
+        if response_size:
+            metrics['response_size'] = response_size
+        if warmup:
+            metrics['warmup'] = warmup
+        if recorder.aborted:
+            # total_requests stays the planned budget; successful + failed is what was sent
+            metrics['aborted'] = recorder.aborted
+        auth = auth_report(recorder.counters)
+        if auth:
+            metrics['auth'] = auth
+        if recorder.counters.get('fed_requests'):
+            # Summed over worker shards, which draw disjoint sequential values
+            metrics['feeders'] = {'requests': recorder.counters['fed_requests'],
+                                  'distinct_requests': recorder.counters['distinct_requests']}
+        if errors or not histogram.count:
+            metrics['errors'] = [msg for msg, _ in errors.most_common(5)]  # Top 5 errors
+        
+        if perf_config.get('slo'):
+            # Each assertion is reported on its own; slo_passed only if all hold
+            metrics['slo'] = evaluate_slo(perf_config['slo'], metrics)
+            metrics['slo_passed'] = all(a['passed'] for a in metrics['slo'])
+        
+        if histogram.count:
+            metrics['histogram'] = histogram.to_dict()
+        return metrics
+    
+    def run_scenario(self, scenario: Scenario, context: Context = None) -> Dict[str, Any]:
+        """Run a workload scenario; aggregate metrics plus per-step metrics under 'steps'"""
+        context = context or self.context
+        run = ScenarioRun(scenario, context.get_values(), on_result=self.sample_sink,
+                          seed=scenario.config.get('seed'),
+                          check=partial(self.check_response, context=context)).run()
+        metrics = self.compute_metrics(run.aggregate, scenario.perf_config())
+        metrics['workers'] = 1  # VUs share one event loop; scenarios are not sharded
+        metrics['virtual_users'] = scenario.virtual_users
+        metrics['iterations'] = run.aggregate.counters.get('iterations', 0)
+        if run.aggregate.counters.get('vu_setup_failed'):
+            metrics['vu_setup_failed'] = run.aggregate.counters['vu_setup_failed']
+        metrics['steps'] = {}
+        for step in scenario.setup + scenario.steps:
+            step_config = {key: step.config[key] for key in ('slo', 'threshold_ms') if key in step.config}
+            step_config.update(mode='scenario', virtual_users=scenario.virtual_users)
+            step_metrics = self.compute_metrics(run.steps[step.name], step_config)
+            step_metrics['workers'] = 1
+            step_metrics['share'] = (run.steps[step.name].completed / run.aggregate.completed
+                                     if run.aggregate.completed else 0.0)
+            metrics['steps'][step.name] = step_metrics
+        return metrics
 
 class SuiteRunner:
     """Main suite runner orchestrating all tests"""
     
-    def __init__(self, suites_dir: str, base_url: str = "http://localhost:8000"):
+    def __init__(self, suites_dir: str, base_url: str = "http://localhost:8000", workers: int = 1,
+                 stream_path: str = None, compress: bool = False,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL, stream_samples: bool = False,
+                 setup_file: str = None, parallel: int = 1, baseline_path: str = None,
+                 compare_baseline: bool = False, save_baseline: bool = False, baseline_rev: str = None,
+                 baseline_alpha: float = DEFAULT_ALPHA, baseline_min_effect: float = DEFAULT_MIN_EFFECT,
+                 live: bool = True, exporter: MetricsExporter = None, retry: Dict[str, Any] = None,
+                 circuit_breaker: bool = True):
         self.suites_dir = Path(suites_dir)
         self.base_url = base_url
-        self.benchmark_runner = BenchmarkRunner(base_url)
-        self.results = {
+        self.benchmark_runner = BenchmarkRunner(base_url, workers)
+        self.reports_dir = self.suites_dir.parent / 'reports'
+        default_stream = 'all_suites_results.ndjson' + ('.gz' if compress else '')
+        self.stream_path = Path(stream_path) if stream_path else self.reports_dir / default_stream
+        self.compress = compress
+        self.fsync_interval = fsync_interval
+        self.stream_samples = stream_samples
+        self.stream = None
+        self.setup_file = Path(setup_file) if setup_file else None
+        self.parallel = max(1, parallel)
+        self.baseline_path = Path(baseline_path) if baseline_path else self.reports_dir / 'baseline.sqlite'
+        self.compare_baseline = compare_baseline
+        self.save_baseline = save_baseline
+        self.baseline_rev = baseline_rev
+        self.baseline_alpha = baseline_alpha
+        self.baseline_min_effect = baseline_min_effect
+        # Live progress needs this process to see every sample and to own stdout
+        self.live = live and self.parallel == 1
+        self.exporter = exporter
+        # Retry policy for tests and performance blocks without their own `retry` (--max-retries)
+        self.retry = retry
+        # Per-run breakers plus per-origin circuits across tests (--no-circuit-breaker turns both off)
+        self.circuit_breaker = circuit_breaker
+        self.targets = TargetHealth() if circuit_breaker else None
+        self.results = self.empty_results()
+    
+    @staticmethod
+    def empty_results() -> Dict[str, List]:
+        return {
             'functional': [],
             'performance': [],
             'concurrency': [],
             'retry': []
         }
+    
+    def emit(self, record: Dict[str, Any], flush: bool = True):
+        """Append a record to the results stream (no-op when not streaming)"""
+        if self.stream is not None:
+            self.stream.write(record, flush=flush)
         
-    def load_suite(self, suite_file: Path) -> Dict:
-        """Load YAML suite file"""
-        with open(suite_file, 'r') as f:
-            return yaml.safe_load(f)
+    def load_suite(self, suite_file: Path) -> LoadedSuite:
+        """Load YAML suite file (parsed once per run)"""
+        return load_suite(str(suite_file))
     
     def categorize_suite(self, suite_name: str) -> str:
         """Determine suite category"""
@@ -161,13 +482,49 @@ class SuiteRunner:
         else:
             return 'functional'
     
-    def run_suite(self, suite_file: Path, quick_mode: bool = False) -> Dict:
+    def run_setup_stage(self, setup_file: Path) -> Dict[str, Any]:
+        """Run the shared setup suite once; returns the binds it produced"""
+        print(f"\n🔑 Setup stage: {setup_file.name}")
+        suite = self.load_suite(setup_file)
+        session = SuiteSession(suite, self.base_url, retry=self.retry)
+        tests = []
+        try:
+            for index, test_config in enumerate(suite.test_configs):
+                result = session.run_test(index)
+                tests.append(result)
+                print(f"    {'✓ PASS' if result['passed'] else '✗ FAIL'} {result['name']}"
+                      f" (status: {result.get('status_code')})")
+            binds = {name: value for name, value in session.context.get_values().items()
+                     if name != 'base_url'}
+        finally:
+            session.close()
+        print(f"    Shared binds: {', '.join(sorted(binds)) or '(none)'}")
+        self.emit({'record': 'setup', 'suite_file': setup_file.name, 'tests': tests,
+                   'binds': sorted(binds)})
+        return binds
+    
+    def run_suite(self, suite_file: Path, quick_mode: bool = False, shared_binds: Dict[str, Any] = None,
+                  benchmark_runner: BenchmarkRunner = None) -> Dict:
         """Run a single suite file"""
         print(f"\n{'='*80}")
         print(f"Running: {suite_file.name}")
         print(f"{'='*80}")
         
-        suite_data = self.load_suite(suite_file)
+        benchmark_runner = benchmark_runner or self.benchmark_runner
+        suite = self.load_suite(suite_file)
+        
+        # Each suite gets its own Context, seeded with the setup binds it declares;
+        # without them (--no-setup, failed setup) the suite's own tests produce them
+        required = suite.required_binds()
+        provided = [name for name in required if name in (shared_binds or {})]
+        produced = {name for test_config in suite.test_configs for name in extracted_binds(test_config)}
+        missing = [name for name in required if name not in provided and name not in produced]
+        if missing:
+            raise ValueError(f"requires binds not produced by the setup stage: {', '.join(missing)}")
+        context = Context()
+        context.bind_variables({name: shared_binds[name] for name in provided})
+        
+        session = SuiteSession(suite, self.base_url, context, retry=self.retry)
         category = self.categorize_suite(suite_file.stem)
         
         suite_result = {
@@ -177,98 +534,324 @@ class SuiteRunner:
             'tests': [],
             'summary': {}
         }
+        self.emit({'record': 'suite', 'suite_name': suite_file.stem,
+                   'suite_file': suite_file.name, 'category': category})
         
         # PyRestTest YAML is a list of items with 'test' or 'config' keys
-        tests = []
-        if isinstance(suite_data, list):
-            tests = [item.get('test', {}) for item in suite_data if 'test' in item]
-        else:
-            tests = suite_data.get('tests', [])
+        tests = suite.test_configs
         
         for idx, test_config in enumerate(tests, 1):
             test_name = test_config.get('name', f'Test_{idx}')
             print(f"\n  [{idx}/{len(tests)}] {test_name}")
             
             # Check if this is a performance test
-            perf_config = test_config.get('performance', {})
+            perf_config = suite.perf_configs[idx - 1]
+            
+            origin = self.test_origin(test_config, suite.requests[idx - 1], session.context)
+            skip = self.targets.check(origin) if self.targets is not None else None
+            if skip:
+                print(f"    ⛔ SKIP ({skip})")
+                if perf_config and category == 'performance':
+                    self.add_test(suite_result, {
+                        'name': test_name,
+                        'type': 'performance',
+                        'metrics': {'total_requests': 0, 'successful': 0, 'failed': 0,
+                                    'aborted': {'reason': skip, 'connection': True, 'after_requests': 0}}
+                    })
+                else:
+                    self.add_test(suite_result, {
+                        'name': test_name,
+                        'type': 'functional',
+                        'result': {'skipped': True, 'passed': False, 'reason': skip, 'circuit_open': True}
+                    })
+                continue
             
             if perf_config and category == 'performance':
                 # Reduce repeat in quick mode
+                if 'slo' in perf_config:
+                    for issue in validate_slo(perf_config['slo']):
+                        print(f"    ⚠️  {issue}")
+                if self.retry and 'retry' not in perf_config:
+                    perf_config['retry'] = self.retry
+                if not self.circuit_breaker:
+                    perf_config['circuit_breaker'] = None
                 if quick_mode:
                     perf_config['repeat'] = min(perf_config.get('repeat', 50), 10)
                     perf_config['concurrency'] = min(perf_config.get('concurrency', 5), 2)
+                    perf_config['duration_s'] = min(perf_config.get('duration_s', 10), 2)
+                    if perf_config.get('warmup'):
+                        perf_config['warmup'] = min(parse_warmup(perf_config)[0], 5) or '1s'
+                    if perf_config.get('mode') == 'capacity':
+                        quick_capacity(perf_config)
                 
-                print(f"    Mode: {perf_config.get('mode', 'sync')} | "
-                      f"Repeat: {perf_config.get('repeat', 50)} | "
-                      f"Concurrency: {perf_config.get('concurrency', 5)}")
+                if perf_config.get('mode') == 'capacity':
+                    growth = f"+{perf_config['step']}" if perf_config.get('step') is not None \
+                        else f"×{perf_config['factor']}"
+                    print(f"    Mode: capacity | "
+                          f"Ramp: {perf_config['ramp']} {perf_config['start']} → {perf_config['max']} ({growth}) | "
+                          f"Max steps: {perf_config['max_steps']}")
+                elif perf_config.get('mode') == 'rate':
+                    print(f"    Mode: rate | "
+                          f"RPS: {perf_config.get('rps', 10)} | "
+                          f"Duration: {perf_config.get('duration_s', 10)}s | "
+                          f"Max in-flight: {perf_config.get('max_inflight', 100)}")
+                else:
+                    print(f"    Mode: {perf_config.get('mode', 'sync')} | "
+                          f"Repeat: {perf_config.get('repeat', 50)} | "
+                          f"Concurrency: {perf_config.get('concurrency', 5)}")
                 
-                metrics = self.benchmark_runner.run_performance_test(test_config, perf_config)
+                # Sharded runs send their samples back in batches, so the live view works there too
+                progress = LiveProgress.for_perf_config(perf_config)
+                with self.observe(benchmark_runner, suite_file.stem, test_name, progress):
+                    metrics = benchmark_runner.run_performance_test(test_config, perf_config,
+                                                                    session.context,
+                                                                    suite.requests[idx - 1])
                 
                 print(f"    ✓ Completed: {metrics.get('successful', 0)}/{metrics.get('total_requests', 0)} requests")
+                aborted = metrics.get('aborted')
+                if aborted:
+                    print(f"    ⛔ Aborted: {aborted['reason']} (after {aborted['after_requests']} requests)")
+                if self.targets is not None:
+                    if aborted and aborted['connection']:
+                        self.targets.record(origin, False, aborted['reason'], conclusive=True)
+                    else:
+                        self.targets.record(origin, bool(metrics.get('successful') or metrics.get('status_codes')))
+                if 'retry' in metrics:
+                    self.print_retry(metrics['retry'])
+                if 'capacity' in metrics:
+                    self.print_capacity(metrics['capacity'])
+                if 'warmup' in metrics:
+                    warmup = metrics['warmup']
+                    settled = warmup.get('steady_state_reached')
+                    print(f"    🔥 Discarded: {warmup['discarded']} samples "
+                          f"(warmup {warmup['warmup_discarded']}, steady-state {warmup['steady_state_discarded']})"
+                          + ('' if settled is None else f" | steady state {'reached' if settled else 'NOT reached'}"))
+                if 'auth' in metrics:
+                    self.print_auth(metrics['auth'])
+                if 'feeders' in metrics:
+                    print(f"    📦 Feeders: {', '.join(perf_config['feeders'])} → "
+                          f"{metrics['feeders']['distinct_requests']} distinct requests")
+                if 'response_size' in metrics:
+                    self.print_response_size(metrics['response_size'])
                 if 'avg_ms' in metrics:
                     print(f"    ⏱  Min: {metrics['min_ms']:.2f}ms | "
                           f"Avg: {metrics['avg_ms']:.2f}ms | "
                           f"Max: {metrics['max_ms']:.2f}ms | "
                           f"P95: {metrics['p95_ms']:.2f}ms")
+                elif metrics.get('errors'):
+                    # Nothing succeeded (e.g. the auth pool could not log in): say why
+                    print(f"    ✗ FAIL: {metrics['errors'][0]}")
                     
                     if 'threshold_passed' in metrics:
                         status = "✓ PASS" if metrics['threshold_passed'] else "✗ FAIL"
                         print(f"    Threshold: {metrics['threshold_ms']}ms → {status}")
+                for assertion in metrics.get('slo', []):
+                    actual = assertion['actual']
+                    print(f"    SLO {assertion['name']}: "
+                          f"{'n/a' if actual is None else f'{actual:.4g}'} (target {assertion['target']}) → "
+                          f"{'✓ PASS' if assertion['passed'] else '✗ FAIL'}")
                 
-                suite_result['tests'].append({
+                self.add_test(suite_result, {
                     'name': test_name,
                     'type': 'performance',
                     'metrics': metrics
                 })
+            elif provided and set(extracted_binds(test_config)) <= set(provided) \
+                    and extracted_binds(test_config):
+                # e.g. the suite's own Login: its token already came from the setup stage
+                print(f"    ↷ SKIP (binds provided by setup stage)")
+                self.add_test(suite_result, {
+                    'name': test_name,
+                    'type': 'functional',
+                    'result': {'skipped': True, 'reason': 'binds provided by setup stage'}
+                })
             else:
-                # Functional test - run once with pyresttest
-                result = self.run_functional_test(suite_file)
-                suite_result['tests'].append({
+                # Functional test - run once, in-process, sharing the suite Context
+                result = self.run_functional_test(session, idx - 1)
+                print(f"    {'✓ PASS' if result['passed'] else '✗ FAIL'}"
+                      f" (status: {result.get('status_code')}"
+                      + (f", {result['attempts']} attempts" if result.get('attempts', 1) > 1 else '')
+                      + (f", gave up: {result['retry_stop']}" if result.get('retry_stop') else '') + ")")
+                if self.targets is not None:
+                    self.targets.record(origin, bool(result.get('status_code')),
+                                        result.get('error') or '; '.join(result.get('failures', [])) or None)
+                self.add_test(suite_result, {
                     'name': test_name,
                     'type': 'functional',
                     'result': result
                 })
         
+        for scenario in suite.scenarios:
+            self.run_scenario(suite_result, scenario, session.context, quick_mode, benchmark_runner)
+        
+        session.close()
+        
         # Generate summary
         suite_result['summary'] = self.generate_suite_summary(suite_result['tests'])
+        self.emit({'record': 'suite_end', 'suite_name': suite_file.stem,
+                   'summary': suite_result['summary']})
         
         return suite_result
     
-    def run_functional_test(self, suite_file: Path) -> Dict:
-        """Run functional test using pyresttest command"""
+    def run_scenario(self, suite_result: Dict, scenario: Scenario, context: Context, quick_mode: bool,
+                     benchmark_runner: BenchmarkRunner):
+        """Run one workload scenario; the aggregate and every step become performance entries"""
+        print(f"\n  🎭 Scenario: {scenario.name}")
+        for config in [scenario.config] + [step.config for step in scenario.setup + scenario.steps]:
+            for issue in validate_slo(config['slo']) if 'slo' in config else []:
+                print(f"    ⚠️  {issue}")
+        if quick_mode:
+            scenario.quick()
+        if self.retry and 'retry' not in scenario.config:
+            scenario.retry = self.retry
+        if not self.circuit_breaker:
+            scenario.circuit_breaker = None
+        print(f"    Mode: {scenario.mode} | VUs: {scenario.virtual_users} | "
+              + (f"Iterations: {scenario.iterations}/VU" if scenario.iterations else f"Duration: {scenario.duration_s}s")
+              + (f" | Ramp-up: {scenario.ramp_up_s}s" if scenario.ramp_up_s else ''))
+        
+        expected = None
+        if scenario.iterations:
+            per_iteration = len(scenario.steps) if scenario.mode == 'journey' else 1
+            expected = scenario.virtual_users * (len(scenario.setup) + int(scenario.iterations) * per_iteration)
+        progress = LiveProgress(expected, None if scenario.iterations else scenario.ramp_up_s + scenario.duration_s)
+        with self.observe(benchmark_runner, suite_result['suite_name'], scenario.name, progress):
+            metrics = benchmark_runner.run_scenario(scenario, context)
+        steps = metrics.pop('steps')
+        
+        print(f"    ✓ Completed: {metrics.get('successful', 0)}/{metrics.get('total_requests', 0)} requests, "
+              f"{metrics['iterations']} iterations"
+              + (f" | ⚠️  {metrics['vu_setup_failed']} VU(s) failed setup" if 'vu_setup_failed' in metrics else ''))
+        if metrics.get('aborted'):
+            print(f"    ⛔ Aborted: {metrics['aborted']['reason']} "
+                  f"(after {metrics['aborted']['after_requests']} requests)")
+        if 'retry' in metrics:
+            self.print_retry(metrics['retry'])
+        if 'auth' in metrics:
+            self.print_auth(metrics['auth'])
+        if 'response_size' in metrics:
+            self.print_response_size(metrics['response_size'])
+        entries = [(scenario.name, None, metrics)] + \
+            [(f"{scenario.name} / {name}", name, step) for name, step in steps.items()]
+        for test_name, step_name, step_metrics in entries:
+            label = 'Total' if step_name is None else step_name
+            if 'avg_ms' in step_metrics:
+                print(f"    ⏱  {label:<24} n={step_metrics['successful']:<6} "
+                      f"Avg: {step_metrics['avg_ms']:.2f}ms | P95: {step_metrics['p95_ms']:.2f}ms | "
+                      f"P99: {step_metrics['p99_ms']:.2f}ms | errors: {step_metrics['error_rate']:.1%}")
+            else:
+                print(f"    ⏱  {label:<24} no successful requests")
+            for assertion in step_metrics.get('slo', []):
+                actual = assertion['actual']
+                print(f"       SLO {assertion['name']}: "
+                      f"{'n/a' if actual is None else f'{actual:.4g}'} (target {assertion['target']}) → "
+                      f"{'✓ PASS' if assertion['passed'] else '✗ FAIL'}")
+            entry = {'name': test_name, 'type': 'performance', 'scenario': scenario.name, 'metrics': step_metrics}
+            if step_name is not None:
+                entry['step'] = step_name
+            self.add_test(suite_result, entry)
+    
+    def add_test(self, suite_result: Dict, test: Dict):
+        """Record a finished test in the suite result and on the stream"""
+        suite_result['tests'].append(test)
+        self.emit({'record': 'test', 'suite_name': suite_result['suite_name'], 'test': test})
+    
+    def test_origin(self, test_config: Dict, request: RequestTemplate, context: Context):
+        """(scheme, host, port) a test talks to, for the per-origin circuit; None if it can't be resolved"""
         try:
-            cmd = [
-                sys.executable,
-                '-m', 'pyresttest',
-                self.base_url,
-                str(suite_file)
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            # Parse output
-            output = result.stdout + result.stderr
-            passed = 'FAILED' not in output and result.returncode == 0
-            
-            return {
-                'passed': passed,
-                'output': output[:500]  # Truncate
-            }
-        except Exception as e:
-            return {
-                'passed': False,
-                'error': str(e)
-            }
+            spec = build_request(test_config, context, request)
+            if not urlsplit(spec.url).netloc:
+                spec = RequestSpec('GET', self.base_url, {}, None, [])
+            return spec.origin
+        except Exception:
+            return None
+    
+    def print_retry(self, retry: Dict[str, Any]):
+        """Retry amplification and what it cost in latency"""
+        if not retry['retries'] and not retry['budget_denied']:
+            return
+        print(f"    🔁 Retries: {retry['retries']} (amplification ×{retry['amplification']:.2f}) | "
+              f"recovered {retry['recovered']} | exhausted {retry['exhausted']} | "
+              f"budget denied {retry['budget_denied']}")
+        print(f"       P95 first attempt {retry['first_attempt']['p95_ms']:.2f}ms → "
+              f"end to end {retry['end_to_end']['p95_ms']:.2f}ms")
+    
+    def print_auth(self, auth: Dict[str, Any]):
+        """Token pool: users logged in and how their tokens were kept fresh"""
+        print(f"    🔑 Auth pool: {auth['users']} user(s)"
+              + (f", {auth['login_failed']} login(s) failed" if auth['login_failed'] else '')
+              + f" | refreshes {auth['refreshes']} | re-logins {auth['relogins']}"
+              + (f" | ⚠️  renew failed {auth['renew_failed']}" if auth['renew_failed'] else ''))
+    
+    def print_response_size(self, size: Dict[str, Any]):
+        """Response body sizes, so payload bloat shows up next to the latency"""
+        print(f"    📏 Response size: avg {format_bytes(size['avg_bytes'])} | "
+              f"p95 {format_bytes(size['p95_bytes'])} | max {format_bytes(size['max_bytes'])} | "
+              f"total {format_bytes(size['total_bytes'])}")
+    
+    def print_capacity(self, capacity: Dict[str, Any]):
+        """Throughput/latency curve of a capacity search and where it broke"""
+        print(f"    📈 Capacity curve ({capacity['ramp']}):")
+        for point in capacity['curve']:
+            p99 = 'n/a' if point['p99_ms'] is None else f"{point['p99_ms']:.2f}ms"
+            print(f"       {point['level']:>8g} → {point['throughput_rps'] or 0:9.1f} rps | p99 {p99} | "
+                  f"errors {point['error_rate']:.1%} "
+                  + ('✓' if point['sustainable'] else f"✗ {point['reason']}"))
+        knee = capacity['knee']
+        if capacity['level'] is None:
+            print(f"    🏁 No sustainable level: {knee['reason']} already at {capacity['ramp']} {knee['level']:g}")
+        else:
+            print(f"    🏁 Max sustainable: {capacity['max_sustainable_rps']:.1f} rps at "
+                  f"{capacity['ramp']} {capacity['level']:g}"
+                  + (f" (knee at {knee['level']:g}: {knee['reason']})" if knee else " (ramp ended before a knee)"))
+    
+    @contextlib.contextmanager
+    def observe(self, benchmark_runner: BenchmarkRunner, suite_name: str, test_name: str,
+                progress: LiveProgress = None):
+        """Route raw samples to the NDJSON stream, the live view and the metrics exporter while a test runs"""
+        sinks = []
+        if self.stream_samples:
+            sinks.append(self.sample_writer(suite_name, test_name))
+        if progress is not None and self.live:
+            sinks.append(progress.record)
+        else:
+            progress = None
+        series = None
+        if self.exporter is not None:
+            series = self.exporter.test_series(suite_name, test_name)
+            sinks.append(series.record)
+        if len(sinks) > 1:
+            def sink(sample: Dict[str, Any], sinks=tuple(sinks)):
+                for write in sinks:
+                    write(sample)
+            benchmark_runner.sample_sink = sink
+        else:
+            benchmark_runner.sample_sink = sinks[0] if sinks else None
+        try:
+            with progress or contextlib.nullcontext():
+                yield
+        finally:
+            benchmark_runner.sample_sink = None
+            if series is not None:
+                series.running = False
+    
+    def sample_writer(self, suite_name: str, test_name: str):
+        """Sample sink that streams each raw request sample (buffered, synced periodically)"""
+        def write(sample: Dict[str, Any]):
+            self.emit({'record': 'sample', 'suite_name': suite_name, 'test': test_name, 'ts': time.time(),
+                       **sample}, flush=False)
+        return write
+    
+    def run_functional_test(self, session: SuiteSession, index: int) -> Dict:
+        """Run one functional test in-process via pyresttest's API"""
+        result = session.run_test(index)
+        result.pop('name', None)
+        return result
     
     def generate_suite_summary(self, tests: List[Dict]) -> Dict:
         """Generate summary statistics for a suite"""
         summary = {
-            'total_tests': len(tests),
+            'total_tests': sum(1 for test in tests if not test.get('step')),
             'performance_tests': 0,
             'functional_tests': 0,
             'total_requests': 0,
@@ -277,6 +860,8 @@ class SuiteRunner:
         }
         
         for test in tests:
+            if test.get('step'):
+                continue  # already counted in its scenario's aggregate
             if test['type'] == 'performance':
                 summary['performance_tests'] += 1
                 metrics = test.get('metrics', {})
@@ -300,24 +885,250 @@ class SuiteRunner:
         print(f"📁 Directory: {self.suites_dir}")
         print(f"🌐 Base URL: {self.base_url}")
         print(f"⚡ Quick Mode: {'ON (reduced iterations)' if quick_mode else 'OFF'}")
+        print(f"🧵 Load workers: {self.benchmark_runner.workers} process(es)")
+        print(f"🔀 Parallel suites: {self.parallel}")
+        print(f"📝 Streaming results to: {self.stream_path}")
         
         start_time = time.time()
         
-        for suite_file in suite_files:
-            try:
-                result = self.run_suite(suite_file, quick_mode)
-                category = result['category']
-                self.results[category].append(result)
-            except Exception as e:
-                print(f"\n❌ Error running {suite_file.name}: {e}")
+        self.reports_dir.mkdir(exist_ok=True)
+        self.stream = ResultStream(str(self.stream_path), compress=self.compress,
+                                   fsync_interval=self.fsync_interval)
+        self.emit({'record': 'run', 'timestamp': datetime.now().isoformat(),
+                   'base_url': self.base_url, 'quick': quick_mode,
+                   'workers': self.benchmark_runner.workers})
+        
+        try:
+            shared_binds = {}
+            if self.setup_file is not None:
+                try:
+                    shared_binds = self.run_setup_stage(self.setup_file)
+                except Exception as e:
+                    self.suite_failed(self.setup_file, e)
+            
+            if self.parallel > 1:
+                self.run_suites_parallel(suite_files, quick_mode, shared_binds)
+            else:
+                for suite_file in suite_files:
+                    try:
+                        self.run_suite(suite_file, quick_mode, shared_binds)
+                    except Exception as e:
+                        self.suite_failed(suite_file, e)
+            self.emit({'record': 'run_end', 'elapsed_s': time.time() - start_time})
+        except KeyboardInterrupt:
+            print("\n⚠️  Interrupted - building report from the results streamed so far")
+        finally:
+            self.benchmark_runner.close()
+            self.stream.close()
+            self.stream = None
         
         elapsed_time = time.time() - start_time
         
+        # The report is rebuilt from the stream, never from memory
+        report = self.load_stream_results(self.stream_path)
+        self.finish_report(report, elapsed_time)
+        return report
+    
+    def finish_report(self, report: Dict[str, Any], elapsed_time: float):
+        """Print the report, check it against the baseline store and save it"""
+        self.results = report['results']
+        
         # Print final report
         self.print_report(elapsed_time)
         
+        self.check_slos(report)
+        self.check_aborted(report)
+        if self.compare_baseline or self.save_baseline:
+            self.check_baseline(report)
+        
         # Save detailed results
-        self.save_results()
+        self.save_results(report)
+    
+    def performance_histograms(self, report: Dict[str, Any]):
+        """(suite, test, histogram dict) for every performance test that recorded samples"""
+        for suites in report['results'].values():
+            for suite in suites:
+                for test in suite['tests']:
+                    histogram = test.get('metrics', {}).get('histogram') if test['type'] == 'performance' else None
+                    if histogram and histogram.get('count') and not test['metrics'].get('aborted'):
+                        # A run cut short by the circuit breaker is no baseline, and no regression either
+                        yield suite['suite_name'], test['name'], histogram
+    
+    def check_slos(self, report: Dict[str, Any]):
+        """List failed SLO assertions; adds report['slo']"""
+        failures = []
+        checked = 0
+        for suites in report['results'].values():
+            for suite in suites:
+                for test in suite['tests']:
+                    assertions = test.get('metrics', {}).get('slo') if test['type'] == 'performance' else None
+                    if not assertions:
+                        continue
+                    checked += 1
+                    failures.extend({'suite': suite['suite_name'], 'test': test['name'], **a}
+                                    for a in assertions if not a['passed'])
+        if not checked:
+            return
+        # Quick mode runs ~10 requests: tail percentiles from that are noise, so don't gate on them
+        report['slo'] = {'tests': checked, 'failures': failures, 'enforced': not report.get('quick')}
+        print(f"\n🎯 SLO: {checked} test(s) checked, {len(failures)} assertion(s) failed"
+              + ('' if report['slo']['enforced'] else ' (quick mode - not enforced)'))
+        for failure in failures:
+            actual = 'n/a' if failure['actual'] is None else f"{failure['actual']:.4g}"
+            print(f"  ✗ {failure['suite']} / {failure['test']}: {failure['name']} "
+                  f"{actual} vs target {failure['target']}")
+    
+    def check_aborted(self, report: Dict[str, Any]):
+        """List runs the circuit breaker stopped and tests it skipped; adds report['circuit_breaker']"""
+        aborted = []
+        for suites in report['results'].values():
+            for suite in suites:
+                for test in suite['tests']:
+                    if test.get('step'):
+                        continue
+                    stopped = test.get('metrics', {}).get('aborted')
+                    if stopped:
+                        entry = {'reason': stopped['reason'], 'after_requests': stopped['after_requests']}
+                    elif test.get('result', {}).get('circuit_open'):
+                        entry = {'reason': test['result']['reason'], 'after_requests': 0}
+                    else:
+                        continue
+                    aborted.append({'suite': suite['suite_name'], 'test': test['name'], **entry})
+        if not aborted:
+            return
+        report['circuit_breaker'] = {'aborted': aborted,
+                                     'open_targets': self.targets.open_targets() if self.targets else {}}
+        print(f"\n⛔ Circuit breaker: {len(aborted)} test(s) aborted or skipped")
+        for entry in aborted:
+            print(f"  ✗ {entry['suite']} / {entry['test']}: {entry['reason']}"
+                  + (f" (after {entry['after_requests']} requests)" if entry['after_requests'] else ''))
+    
+    def check_baseline(self, report: Dict[str, Any]):
+        """Compare against / save to the baseline store; adds report['baseline']"""
+        revision = git_revision(os.path.dirname(os.path.abspath(__file__)))
+        self.baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        store = BaselineStore(str(self.baseline_path))
+        try:
+            report['baseline'] = {'store': str(self.baseline_path), 'revision': revision}
+            if self.compare_baseline:
+                comparisons = []
+                print(f"\n📉 Baseline comparison (store: {self.baseline_path}, current rev: {revision})")
+                for suite_name, test_name, histogram in self.performance_histograms(report):
+                    entry = store.latest(suite_name, test_name, revision=self.baseline_rev,
+                                         exclude_revision=revision)
+                    if entry is None:
+                        print(f"  ? {suite_name} / {test_name}: no baseline")
+                        comparisons.append({'suite': suite_name, 'test': test_name, 'baseline_revision': None})
+                        continue
+                    result = compare_histograms(LatencyHistogram.from_dict(entry['histogram']),
+                                                LatencyHistogram.from_dict(histogram),
+                                                alpha=self.baseline_alpha, min_effect=self.baseline_min_effect)
+                    result.update(suite=suite_name, test=test_name, baseline_revision=entry['revision'])
+                    comparisons.append(result)
+                    
+                    # Show the flagged percentile, else the one that moved most
+                    name, p = max(result['percentiles'].items(),
+                                  key=lambda item: (item[1]['regression'], item[1]['change']))
+                    status = "✗ REGRESSION" if result['regression'] else "✓"
+                    print(f"  {status} {suite_name} / {test_name} (vs {entry['revision']}): "
+                          f"{name} {p['baseline_ms']:.2f} → {p['current_ms']:.2f}ms "
+                          f"({p['change']:+.1%}, p={p['p_value']:.4f})")
+                report['baseline']['comparisons'] = comparisons
+                report['baseline']['regressions'] = sum(1 for c in comparisons if c.get('regression'))
+            if self.save_baseline:
+                saved = 0
+                for suite_name, test_name, histogram in self.performance_histograms(report):
+                    store.save(suite_name, test_name, revision, histogram)
+                    saved += 1
+                print(f"\n💾 Saved {saved} baseline histograms for rev {revision}")
+        finally:
+            store.close()
+    
+    def suite_failed(self, suite_file: Path, error: Exception):
+        print(f"\n❌ Error running {suite_file.name}: {error}")
+        self.emit({'record': 'error', 'suite_file': suite_file.name, 'error': str(error)})
+    
+    def run_suites_parallel(self, suite_files: List[Path], quick_mode: bool, shared_binds: Dict[str, Any]):
+        """Run independent suites on a thread pool; each suite's output is printed when it finishes"""
+        with threaded_output(), ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            futures = {executor.submit(self.run_suite_isolated, suite_file, quick_mode, shared_binds): suite_file
+                       for suite_file in suite_files}
+            for future in as_completed(futures):
+                output, error = future.result()
+                print(output, end='')
+                if error is not None:
+                    self.suite_failed(futures[future], error)
+    
+    def run_suite_isolated(self, suite_file: Path, quick_mode: bool,
+                           shared_binds: Dict[str, Any]) -> Tuple[str, Exception]:
+        """Worker-thread body: own BenchmarkRunner (connections, process pool) and output buffer"""
+        output = io.StringIO()
+        runner = BenchmarkRunner(self.base_url, self.benchmark_runner.workers)
+        error = None
+        with capture_output(output):
+            try:
+                self.run_suite(suite_file, quick_mode, shared_binds, runner)
+            except Exception as e:
+                error = e
+            finally:
+                runner.close()
+        return output.getvalue(), error
+    
+    def load_stream_results(self, stream_path: Path) -> Dict[str, Any]:
+        """Rebuild the results document from an NDJSON stream (complete or not)"""
+        report = {'timestamp': None, 'base_url': self.base_url, 'complete': False}
+        suites = {}
+        errors = []
+        samples = {}  # (suite, test) -> SampleSet, from --stream-samples runs
+        for record in read_records(str(stream_path)):
+            kind = record.get('record')
+            if kind == 'sample':
+                key = (record['suite_name'], record['test'])
+                if key not in samples:
+                    samples[key] = SampleSet()
+                samples[key].add_sample(record)
+            elif kind == 'run':
+                report['timestamp'] = record.get('timestamp')
+                report['quick'] = record.get('quick', False)
+                report['base_url'] = record.get('base_url', self.base_url)
+            elif kind == 'suite':
+                suites[record['suite_name']] = {
+                    'suite_name': record['suite_name'],
+                    'suite_file': record['suite_file'],
+                    'category': record['category'],
+                    'tests': [],
+                    'summary': {}
+                }
+            elif kind == 'test' and record['suite_name'] in suites:
+                suites[record['suite_name']]['tests'].append(record['test'])
+            elif kind == 'suite_end' and record['suite_name'] in suites:
+                suites[record['suite_name']]['summary'] = record['summary']
+            elif kind == 'setup':
+                report['setup'] = {'suite_file': record['suite_file'], 'tests': record['tests'],
+                                   'binds': record['binds']}
+            elif kind == 'error':
+                errors.append({'suite_file': record['suite_file'], 'error': record['error']})
+            elif kind == 'run_end':
+                report['complete'] = True
+                report['elapsed_s'] = record.get('elapsed_s')
+        
+        results = self.empty_results()
+        for suite in suites.values():
+            for test in suite['tests']:
+                sample_set = samples.get((suite['suite_name'], test['name']))
+                if sample_set is not None and len(sample_set) and 'metrics' in test:
+                    # Exact stats, per-second throughput and outliers over every raw sample
+                    test['metrics']['samples'] = sample_set.analyze()
+            if not suite['summary']:
+                # Suite was cut off mid-run: summarize the tests that made it to disk
+                suite['summary'] = self.generate_suite_summary(suite['tests'])
+                suite['partial'] = True
+            results.setdefault(suite['category'], []).append(suite)
+        report['results'] = results
+        if errors:
+            report['errors'] = errors
+        report['stream'] = str(stream_path)
+        return report
     
     def print_report(self, elapsed_time: float):
         """Print comprehensive final report"""
@@ -360,27 +1171,39 @@ class SuiteRunner:
                                   f"P95 {m['p95_ms']:.2f}ms | "
                                   f"Min {m['min_ms']:.2f}ms | "
                                   f"Max {m['max_ms']:.2f}ms")
+                        outliers = m.get('samples', {}).get('outliers')
+                        if outliers:
+                            worst = outliers['worst'][0]
+                            print(f"        outliers: {outliers['high']} above {outliers['high_fence_ms']:.2f}ms "
+                                  f"({outliers['fraction']:.1%}), worst {worst['elapsed_ms']:.2f}ms "
+                                  f"at +{worst['at_s']:.1f}s [{m['samples']['engine']}]")
+                        server_timing = m.get('server_timing')
+                        if server_timing:
+                            print("        server p95: " + ' | '.join(
+                                f"{name} {stats['p95_ms']:.2f}ms" for name, stats in server_timing.items()
+                                if name != 'client'))
+                        size = m.get('response_size')
+                        if size:
+                            print(f"        response size: p50 {format_bytes(size['p50_bytes'])} | "
+                                  f"p95 {format_bytes(size['p95_bytes'])} | total {format_bytes(size['total_bytes'])}")
         
         print(f"\n{'='*80}")
         print(f"✅ Report complete!")
         print(f"📄 Detailed results saved to: api_test/reports/all_suites_results.json")
         print(f"{'='*80}\n")
     
-    def save_results(self):
-        """Save detailed results to JSON file"""
-        reports_dir = Path(self.suites_dir).parent / 'reports'
-        reports_dir.mkdir(exist_ok=True)
+    def save_results(self, report: Dict[str, Any]):
+        """Save the report rebuilt from the stream to JSON file"""
+        self.reports_dir.mkdir(exist_ok=True)
         
-        output_file = reports_dir / 'all_suites_results.json'
+        output_file = self.reports_dir / 'all_suites_results.json'
         
         with open(output_file, 'w') as f:
-            json.dump({
-                'timestamp': datetime.now().isoformat(),
-                'base_url': self.base_url,
-                'results': self.results
-            }, f, indent=2)
+            json.dump(report, f, indent=2)
         
         print(f"\n💾 Results saved to: {output_file}")
+        if not report.get('complete'):
+            print(f"⚠️  Run did not finish - report covers what was streamed before it stopped")
 
 def main():
     parser = argparse.ArgumentParser(description='Run all test suites with performance benchmarking')
@@ -393,11 +1216,97 @@ def main():
     parser.add_argument('--suites-dir', 
                        default=os.path.join(os.path.dirname(__file__), 'suites'),
                        help='Directory containing test suites')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Processes to shard each performance test across (default: 1)')
+    parser.add_argument('--stream', default=None,
+                       help='NDJSON results stream (default: reports/all_suites_results.ndjson[.gz])')
+    parser.add_argument('--gzip', action='store_true',
+                       help='Gzip-compress the results stream')
+    parser.add_argument('--fsync-interval', type=float, default=DEFAULT_FSYNC_INTERVAL,
+                       help=f'Seconds between fsyncs of the stream (default: {DEFAULT_FSYNC_INTERVAL})')
+    parser.add_argument('--stream-samples', action='store_true',
+                       help='Also stream one record per request sample')
+    parser.add_argument('--parallel', type=int, default=1,
+                       help='Suites to run concurrently on a thread pool (default: 1)')
+    parser.add_argument('--setup', default=os.path.join(os.path.dirname(__file__), 'setup_stage.yaml'),
+                       help='Shared setup suite run once before all suites (default: setup_stage.yaml)')
+    parser.add_argument('--no-setup', action='store_true',
+                       help='Skip the shared setup stage')
+    parser.add_argument('--baseline', default=None,
+                       help='Baseline store: *.sqlite/*.db or a JSON file (default: reports/baseline.sqlite)')
+    parser.add_argument('--save-baseline', action='store_true',
+                       help='Store this run\'s histograms as the baseline for the current git revision')
+    parser.add_argument('--compare-baseline', action='store_true',
+                       help='Bootstrap-test p50/p90/p95/p99 against the baseline; exit 1 on significant slowdowns')
+    parser.add_argument('--baseline-rev', default=None,
+                       help='Compare against this revision (default: newest baseline from another revision)')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                       help=f'Family-wise significance level per test (default: {DEFAULT_ALPHA})')
+    parser.add_argument('--min-effect', type=float, default=DEFAULT_MIN_EFFECT,
+                       help=f'Smallest relative slowdown that can fail the run (default: {DEFAULT_MIN_EFFECT})')
+    parser.add_argument('--no-live', action='store_true',
+                       help='Disable the live progress line printed while each performance test runs')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve live request counters and latency histograms for Prometheus on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-textfile', default=None,
+                       help='Write the same metrics to this file (node_exporter textfile collector), replaced atomically')
+    parser.add_argument('--max-retries', type=int, default=0,
+                       help='Retry failed requests up to N times in tests without their own `retry` block')
+    parser.add_argument('--retry-backoff-base', type=float, default=None,
+                       help='Base of the exponential backoff between retries, seconds (full jitter)')
+    parser.add_argument('--retry-backoff-max', type=float, default=None,
+                       help='Cap of the backoff between retries, seconds')
+    parser.add_argument('--no-circuit-breaker', action='store_true',
+                       help='Run every request even against a target that stopped answering')
+    parser.add_argument('--from-stream', default=None,
+                       help='Only rebuild all_suites_results.json from an existing stream (e.g. a crashed run)')
     
     args = parser.parse_args()
+    if not args.no_setup and not args.from_stream and not os.path.exists(args.setup):
+        parser.error(f"setup suite not found: {args.setup} (use --no-setup to run without it)")
+    
+    exporter = None
+    if (args.metrics_port is not None or args.metrics_textfile) and not args.from_stream:
+        exporter = MetricsExporter(args.metrics_port, args.metrics_textfile).start()
+        if exporter.port is not None:
+            print(f"📈 OpenMetrics: http://{exporter.host}:{exporter.port}/metrics")
+        if exporter.textfile:
+            print(f"📈 OpenMetrics textfile: {exporter.textfile}")
+    
+    runner = SuiteRunner(args.suites_dir, args.base_url, workers=args.workers,
+                         stream_path=args.stream, compress=args.gzip,
+                         fsync_interval=args.fsync_interval, stream_samples=args.stream_samples,
+                         setup_file=None if args.no_setup else args.setup,
+                         parallel=args.parallel, baseline_path=args.baseline,
+                         compare_baseline=args.compare_baseline, save_baseline=args.save_baseline,
+                         baseline_rev=args.baseline_rev, baseline_alpha=args.alpha,
+                         baseline_min_effect=args.min_effect, live=not args.no_live, exporter=exporter,
+                         retry=cli_retry(args.max_retries, args.retry_backoff_base, args.retry_backoff_max),
+                         circuit_breaker=not args.no_circuit_breaker)
+    if args.from_stream:
+        report = runner.load_stream_results(Path(args.from_stream))
+        runner.finish_report(report, report.get('elapsed_s') or 0.0)
+        runner.benchmark_runner.close()
+    else:
+        report = runner.run_all_suites(quick_mode=args.quick, pattern=args.pattern)
+    if exporter is not None:
+        exporter.close()
     
-    runner = SuiteRunner(args.suites_dir, args.base_url)
-    runner.run_all_suites(quick_mode=args.quick, pattern=args.pattern)
+    failed = False
+    if report and report.get('errors'):
+        print(f"❌ {len(report['errors'])} suite(s) failed with an error")
+        failed = True
+    if report and report.get('baseline', {}).get('regressions'):
+        print(f"❌ {report['baseline']['regressions']} test(s) significantly slower than baseline")
+        failed = True
+    if report and report.get('slo', {}).get('enforced') and report['slo']['failures']:
+        print(f"❌ {len(report['slo']['failures'])} SLO assertion(s) failed")
+        failed = True
+    if report and report.get('circuit_breaker'):
+        print(f"❌ {len(report['circuit_breaker']['aborted'])} test(s) aborted by the circuit breaker")
+        failed = True
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -6,8 +6,9 @@ Usage:
   python run_bench_and_report.py [--url URL] [--quick] [--output report.json]
 
 Features:
-- Detects performance tests (presence of `performance` block) and runs them via `abc.py --perf`.
-- Runs regular suites with `pyresttest` and captures pass/fail counts.
+- Detects performance tests (presence of `performance` block) and benchmarks them in-process.
+- Runs regular suites in-process through pyresttest's API and captures pass/fail counts.
+- `--subprocess` falls back to the old `abc.py --perf` / `pyresttest` CLI runs.
 - Quick mode scales down `repeat` values for performance suites to keep runs short.
 - Outputs a JSON summary and prints a human-readable table.
 
@@ -22,11 +23,12 @@ import shutil
 import subprocess
 import sys
 import tempfile
-from collections import defaultdict
-from statistics import mean, median, quantiles
 
 import yaml
 
+from sample_metrics import abc_time_histograms
+from suite_cache import derived_file, load_plan
+
 ROOT = os.path.dirname(os.path.dirname(__file__)) if __file__ else '.'
 API_TEST_DIR = os.path.join(ROOT, 'api_test')
 SUITES_DIR = os.path.join(API_TEST_DIR, 'suites')
@@ -42,18 +44,10 @@ def find_pyresttest():
     return which
 
 
-def load_yaml(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
-
-
-def has_performance_block(yaml_obj):
-    if not isinstance(yaml_obj, list):
-        return False
-    for item in yaml_obj:
-        if 'test' in item and isinstance(item['test'], dict) and 'performance' in item['test']:
-            return True
-    return False
+def has_performance_block(testfile):
+    # Answered from the compiled plan cache (suite_cache.py), no YAML re-parse; scenarios are load runs too
+    plan = load_plan(testfile)
+    return plan.has_performance_block() or bool(plan.scenarios)
 
 
 def scale_performance_yaml(yaml_obj, scale=0.1, cap=10):
@@ -77,18 +71,22 @@ def scale_performance_yaml(yaml_obj, scale=0.1, cap=10):
     return out
 
 
+def render_quick_yaml(plan):
+    return yaml.dump(scale_performance_yaml(plan.items, scale=0.05, cap=10), sort_keys=False)
+
+
 def run_abc_on_file(testfile, quick=False, async_mode=False):
-    # If quick, write a temp YAML with scaled repeats
-    yaml_obj = load_yaml(testfile)
+    # If quick, run a copy with scaled repeats (cached next to the compiled plan)
+    plan = load_plan(testfile)
     tmpfile = None
-    if quick and has_performance_block(yaml_obj):
-        scaled = scale_performance_yaml(yaml_obj, scale=0.05, cap=10)
-        fd, tmpfile = tempfile.mkstemp(suffix='.yaml', prefix='tmp_suite_')
-        with os.fdopen(fd, 'w', encoding='utf-8') as f:
-            yaml.dump(scaled, f, sort_keys=False)
-        runfile = tmpfile
-    else:
-        runfile = testfile
+    runfile = testfile
+    if quick and plan.has_performance_block():
+        runfile = derived_file(plan, 'quick', render_quick_yaml)
+        if runfile is None:
+            fd, tmpfile = tempfile.mkstemp(suffix='.yaml', prefix='tmp_suite_')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(render_quick_yaml(plan))
+            runfile = tmpfile
 
     cmd = [sys.executable, ABC_PY, runfile, '--perf']
     if async_mode:
@@ -103,20 +101,8 @@ def run_abc_on_file(testfile, quick=False, async_mode=False):
         except Exception:
             pass
 
-    # Parse abc.py output lines
-    results = defaultdict(list)  # testname -> list of elapsed_ms
-    current_test = None
-    for line in out.splitlines():
-        line = line.strip()
-        if line.startswith('Test:'):
-            current_test = line.split(':', 1)[1].strip()
-        elif 'Time(ms):' in line:
-            # URL: ..., Status: X, Passed: True, Time(ms): 123.45
-            m = re.search(r'Time\(ms\):\s*([0-9.]+)', line)
-            if m and current_test:
-                results[current_test].append(float(m.group(1)))
-
-    return results, out
+    # Parse abc.py output: testname -> latency histogram
+    return abc_time_histograms(out), out
 
 
 def run_pyresttest_on_file(pyresttest_cmd, url, testfile):
@@ -139,28 +125,46 @@ def run_pyresttest_on_file(pyresttest_cmd, url, testfile):
     return {'passed': passed, 'total': total, 'raw': out}
 
 
+def run_suite_inprocess(testfile, url, quick=False, async_mode=False):
+    """Run one suite in this interpreter; returns (perf samples by test name, functional result)"""
+    from capacity import quick_capacity
+    from inprocess_runner import LoadedSuite, load_suite, run_suite
+    from run_all_suites import BenchmarkRunner
+
+    suite = load_suite(testfile)
+    if quick:
+        if suite.has_performance_block():
+            suite = LoadedSuite(testfile, scale_performance_yaml(suite.items, scale=0.05, cap=10))
+            for perf in suite.perf_configs:
+                if perf is not None and perf.get('mode') == 'capacity':
+                    quick_capacity(perf)
+        for scenario in suite.scenarios:
+            scenario.quick()
+    if async_mode:
+        for perf in suite.perf_configs:
+            if perf is not None and perf.get('mode') != 'capacity':  # capacity levels run async already
+                perf['mode'] = 'async'
+
+    benchmark = BenchmarkRunner(url)
+    try:
+        outcome = run_suite(suite, url, benchmark=benchmark)
+    finally:
+        benchmark.close()
+    results = {t['name']: t['histogram'] for t in outcome['tests'] if t['type'] == 'performance'}
+    functional = [t for t in outcome['tests'] if t['type'] == 'functional']
+    capacity = {t['name']: t['capacity'] for t in outcome['tests'] if 'capacity' in t}
+    return results, {'passed': outcome['passed'], 'total': outcome['total'], 'tests': functional,
+                     'capacity': capacity}
+
+
 def summarize_perf(results):
-    # results: testname -> list of ms
+    # results: testname -> LatencyHistogram
     summary = {}
-    for tname, values in results.items():
-        if not values:
+    for tname, hist in results.items():
+        if not hist.count:
             continue
-        values_sorted = sorted(values)
-        total = sum(values)
-        count = len(values)
-        avg = total / count
-        p50 = median(values)
-        p95 = quantiles(values, n=100)[94] if len(values) >= 2 else values_sorted[-1]
-        p99 = quantiles(values, n=100)[98] if len(values) >= 2 else values_sorted[-1]
-        summary[tname] = {
-            'count': count,
-            'min_ms': values_sorted[0],
-            'max_ms': values_sorted[-1],
-            'avg_ms': avg,
-            'p50_ms': p50,
-            'p95_ms': p95,
-            'p99_ms': p99,
-        }
+        summary[tname] = hist.summary()
+        summary[tname]['histogram'] = hist.to_dict()
     return summary
 
 
@@ -173,6 +177,10 @@ def human_print_report(report):
             for tname, s in suite['summary'].items():
                 print(f"    Test: {tname}")
                 print(f"      count: {s['count']}, min: {s['min_ms']:.2f} ms, avg: {s['avg_ms']:.2f} ms, max: {s['max_ms']:.2f} ms, p95: {s['p95_ms']:.2f} ms")
+                if 'capacity' in s:
+                    cap = s['capacity']
+                    knee = cap['knee']['reason'] if cap['knee'] else 'none reached'
+                    print(f"      capacity: {cap['max_sustainable_rps']:.1f} rps at {cap['ramp']} {cap['level']} (knee: {knee})")
         else:
             print(f"    Passed/Total: {suite['passed']}/{suite['total']}")
         print('')
@@ -184,10 +192,11 @@ def main():
     ap.add_argument('--quick', action='store_true', help='Scale down performance repeats for fast validation')
     ap.add_argument('--output', help='Write JSON report to file')
     ap.add_argument('--async', dest='async_mode', action='store_true', help='Force async runner for performance suites')
+    ap.add_argument('--subprocess', action='store_true', help='Run suites via abc.py/pyresttest CLI subprocesses (legacy)')
     args = ap.parse_args()
 
-    pyresttest_cmd = find_pyresttest()
-    if not pyresttest_cmd:
+    pyresttest_cmd = find_pyresttest() if args.subprocess else None
+    if args.subprocess and not pyresttest_cmd:
         print('pyresttest not found in PATH or venv. Please install or set up venv.')
 
     suites = sorted(glob.glob(os.path.join(SUITES_DIR, '*.yaml')))
@@ -195,12 +204,23 @@ def main():
 
     for suite in suites:
         try:
-            yaml_obj = load_yaml(suite)
+            is_perf = has_performance_block(suite)
         except Exception as e:
             print(f'Failed reading {suite}: {e}')
             continue
 
-        if has_performance_block(yaml_obj):
+        if not args.subprocess:
+            print(f"Running {'performance' if is_perf else 'functional'} suite in-process: {os.path.basename(suite)}")
+            results, res = run_suite_inprocess(suite, args.url, quick=args.quick, async_mode=args.async_mode)
+            if is_perf:
+                summary = summarize_perf(results)
+                for tname, capacity in res['capacity'].items():
+                    if tname in summary:
+                        summary[tname]['capacity'] = capacity
+                report['suites'].append({'file': os.path.basename(suite), 'type': 'performance', 'summary': summary})
+            else:
+                report['suites'].append({'file': os.path.basename(suite), 'type': 'functional', 'passed': res['passed'], 'total': res['total'], 'tests': res['tests']})
+        elif is_perf:
             print(f'Running performance suite: {os.path.basename(suite)}')
             results, raw = run_abc_on_file(suite, quick=args.quick, async_mode=args.async_mode)
             summary = summarize_perf(results)
@@ -6,7 +6,8 @@ Usage:
   python run_test_with_metrics.py [--quick] [--url URL] [--output report.md]
 
 Features:
-- Runs all 7 test suites
+- Runs all 7 test suites in-process (one YAML parse per suite, shared Context)
+- `--subprocess` keeps the legacy pyresttest / abc.py CLI runs
 - Collects pass/fail for functional tests
 - Runs performance tests and collects latency metrics (min/max/avg/p95/p99)
 - Generates comprehensive report matching Requirements 8
@@ -20,8 +21,6 @@ import re
 import subprocess
 import sys
 import time
-from collections import defaultdict
-from statistics import mean, median
 
 try:
     import yaml
@@ -29,6 +28,9 @@ except ImportError:
     print("ERROR: pyyaml not found. Run: source venv/bin/activate")
     sys.exit(1)
 
+from sample_metrics import abc_time_histograms
+from suite_cache import load_plan
+
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SUITES_DIR = os.path.join(ROOT, 'api_test', 'suites')
 VENV_PYTHON = os.path.join(ROOT, 'venv', 'bin', 'python3')
@@ -69,32 +71,16 @@ def parse_pyresttest_output(output):
 def parse_abc_perf_output(output):
     """Parse abc.py performance output for latency metrics"""
     # Output format: URL: ..., Status: X, Passed: True, Time(ms): 123.45
-    test_times = defaultdict(list)
-    current_test = None
-    
-    for line in output.splitlines():
-        if line.strip().startswith('Test:'):
-            current_test = line.split(':', 1)[1].strip()
-        elif 'Time(ms):' in line and current_test:
-            m = re.search(r'Time\(ms\):\s*([0-9.]+)', line)
-            if m:
-                test_times[current_test].append(float(m.group(1)))
-    
+    return latency_metrics(abc_time_histograms(output))
+
+
+def latency_metrics(test_times):
+    """Compute per-test latency metrics from test name -> LatencyHistogram"""
     metrics = {}
-    for test_name, times in test_times.items():
-        if not times:
+    for test_name, hist in test_times.items():
+        if not hist.count:
             continue
-        times_sorted = sorted(times)
-        n = len(times)
-        metrics[test_name] = {
-            'count': n,
-            'min_ms': times_sorted[0],
-            'max_ms': times_sorted[-1],
-            'avg_ms': mean(times),
-            'p50_ms': median(times),
-            'p95_ms': times_sorted[int(n * 0.95)] if n > 1 else times_sorted[-1],
-            'p99_ms': times_sorted[int(n * 0.99)] if n > 1 else times_sorted[-1],
-        }
+        metrics[test_name] = hist.summary()
     
     return metrics
 
@@ -118,20 +104,45 @@ def run_performance_suite(suite_path, quick=False, async_mode=False):
     return parse_abc_perf_output(output)
 
 
+def run_suite_inprocess(suite_path, url, quick=False):
+    """Run a suite through the in-process API; returns (perf metrics, functional result)"""
+    from capacity import quick_capacity
+    from inprocess_runner import load_suite, run_suite
+    from run_all_suites import BenchmarkRunner
+
+    suite = load_suite(suite_path)
+    if quick:
+        # run_suite reads the resolved perf_configs, not the raw test dicts
+        for perf in suite.perf_configs:
+            if perf is not None:
+                perf['repeat'] = min(perf.get('repeat', 50), 10)
+                perf['concurrency'] = min(perf.get('concurrency', 5), 2)
+                perf['duration_s'] = min(perf.get('duration_s', 10), 2)
+                if perf.get('mode') == 'capacity':
+                    quick_capacity(perf)
+        for scenario in suite.scenarios:
+            scenario.quick()
+
+    benchmark = BenchmarkRunner(url)
+    try:
+        outcome = run_suite(suite, url, benchmark=benchmark)
+    finally:
+        benchmark.close()
+    test_times = {t['name']: t['histogram'] for t in outcome['tests'] if t['type'] == 'performance'}
+    metrics = latency_metrics(test_times)
+    for t in outcome['tests']:
+        if 'capacity' in t and t['name'] in metrics:
+            metrics[t['name']]['capacity'] = t['capacity']
+    return metrics, {'passed': outcome['passed'], 'total': outcome['total']}
+
+
 def has_performance_block(yaml_path):
-    """Check if YAML contains performance blocks"""
+    """Check if YAML contains performance blocks or scenarios (via the compiled plan cache)"""
     try:
-        with open(yaml_path, 'r') as f:
-            data = yaml.safe_load(f)
-        if not isinstance(data, list):
-            return False
-        for item in data:
-            if 'test' in item and isinstance(item['test'], dict):
-                if 'performance' in item['test']:
-                    return True
+        plan = load_plan(yaml_path)
+        return plan.has_performance_block() or bool(plan.scenarios)
     except Exception:
-        pass
-    return False
+        return False
 
 
 def generate_markdown_report(results, output_file):
@@ -169,6 +180,13 @@ def generate_markdown_report(results, output_file):
             for test_name, m in r['metrics'].items():
                 f.write(f"| {test_name} | {m['count']} | {m['min_ms']:.2f} | {m['avg_ms']:.2f} | {m['max_ms']:.2f} | {m['p95_ms']:.2f} | {m['p99_ms']:.2f} |\n")
             f.write("\n")
+            for test_name, m in r['metrics'].items():
+                if 'capacity' in m:
+                    cap = m['capacity']
+                    knee = cap['knee']['reason'] if cap['knee'] else 'none reached'
+                    f.write(f"- **{test_name}** capacity: {cap['max_sustainable_rps']:.1f} rps "
+                            f"at {cap['ramp']} {cap['level']} (knee: {knee})\n")
+            f.write("\n")
         
         f.write("\n## Requirements 8 Compliance\n\n")
         f.write("### Test Suite Coverage\n\n")
@@ -203,6 +221,7 @@ def main():
     parser.add_argument('--quick', action='store_true', help='Quick mode (reduced repeats)')
     parser.add_argument('--url', default='http://localhost:8000', help='Base URL for tests')
     parser.add_argument('--output', default='api_test/reports/test_report.md', help='Output report file')
+    parser.add_argument('--subprocess', action='store_true', help='Use pyresttest/abc.py subprocesses (legacy)')
     args = parser.parse_args()
     
     # Find all suites
@@ -221,7 +240,17 @@ def main():
         
         is_perf = has_performance_block(suite_path)
         
-        if is_perf:
+        if not args.subprocess:
+            metrics, res = run_suite_inprocess(suite_path, args.url, quick=args.quick)
+            if is_perf:
+                results.append({'suite': suite_name, 'type': 'performance', 'metrics': metrics})
+                print(f"✅ ({len(metrics)} tests)")
+            else:
+                results.append({'suite': suite_name, 'type': 'functional',
+                                'passed': res['passed'], 'total': res['total']})
+                status = "✅" if res['passed'] == res['total'] and res['total'] > 0 else "❌"
+                print(f"{status} ({res['passed']}/{res['total']})")
+        elif is_perf:
             # Performance suite
             is_async = 'async' in suite_name.lower()
             metrics = run_performance_suite(suite_path, quick=args.quick, async_mode=is_async)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Exact metrics over raw request samples, vectorized with NumPy when it is installed.
+
+Samples are kept in typed `array('d')` buffers (8 bytes per value, no float
+objects); with NumPy they are viewed in place with `np.frombuffer` and every
+statistic is one vectorized pass, otherwise the same results come from a
+pure-Python fallback. Used for `--stream-samples` runs, where the NDJSON
+stream holds every request:
+
+    summary         exact min/max/avg/std_dev and p50..p99.9 (nearest rank,
+                    same definition as LatencyHistogram)
+    throughput      completed / failed requests per second of the run
+    outliers        Tukey fences (q3 + k·IQR) and the worst samples with their offsets
+"""
+
+import heapq
+import math
+import re
+from array import array
+from typing import Dict, List, Any, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python fallback below
+    np = None
+
+from latency_histogram import SUMMARY_PERCENTILES, LatencyHistogram
+
+ENGINE = 'numpy' if np is not None else 'python'
+DEFAULT_OUTLIER_K = 1.5
+WORST_SAMPLES = 5
+
+# abc.py prints `Test: <name>` then one `... Time(ms): 12.34` line per request
+_ABC_TEST_RE = re.compile(r'^[ \t]*Test:[ \t]*(.*?)[ \t]*$', re.MULTILINE)
+_ABC_TIME_RE = re.compile(r'Time\(ms\):\s*([0-9.]+)')
+
+
+class SampleSet:
+    """Latency, completion time and outcome of every request of one test"""
+
+    def __init__(self):
+        self.elapsed_ms = array('d')
+        self.ts = array('d')      # completion time, epoch seconds
+        self.ok = array('b')
+
+    def __len__(self) -> int:
+        return len(self.elapsed_ms)
+
+    def add(self, elapsed_ms: float, ts: float, ok: bool):
+        self.elapsed_ms.append(elapsed_ms)
+        self.ts.append(ts)
+        self.ok.append(1 if ok else 0)
+
+    def add_sample(self, sample: Dict[str, Any]):
+        """One streamed sample record (needs elapsed_ms and ts)"""
+        if 'elapsed_ms' in sample and 'ts' in sample:
+            self.add(sample['elapsed_ms'], sample['ts'], bool(sample.get('success')))
+
+    def analyze(self, bucket_s: float = 1.0, k: float = DEFAULT_OUTLIER_K) -> Dict[str, Any]:
+        if np is not None:
+            latency = np.frombuffer(self.elapsed_ms, dtype=np.float64)
+            ts = np.frombuffer(self.ts, dtype=np.float64)
+            ok = np.frombuffer(self.ok, dtype=np.int8).astype(bool)
+            return _analyze_numpy(latency, ts, ok, bucket_s, k)
+        return _analyze_python(self.elapsed_ms, self.ts, self.ok, bucket_s, k)
+
+
+def _rank(q: float, n: int) -> int:
+    """0-based nearest-rank index of percentile q in n sorted values"""
+    return min(n - 1, max(0, int(math.ceil(q / 100.0 * n)) - 1))
+
+
+def _analyze_numpy(latency, ts, ok, bucket_s: float, k: float) -> Dict[str, Any]:
+    result = {'engine': 'numpy', 'samples': int(latency.size), 'failed': int(latency.size - ok.sum())}
+    if not latency.size:
+        return result
+    seconds = ((ts - ts.min()) // bucket_s).astype(np.int64)
+    result['throughput'] = {'bucket_s': bucket_s,
+                            'completed': np.bincount(seconds).tolist(),
+                            'failed': np.bincount(seconds[~ok], minlength=int(seconds.max()) + 1).tolist()}
+
+    values = np.sort(latency[ok])
+    n = int(values.size)
+    if not n:
+        return result
+    summary = {'count': n, 'min_ms': float(values[0]), 'max_ms': float(values[-1]),
+               'avg_ms': float(values.mean()), 'std_dev': float(values.std(ddof=1)) if n > 1 else 0.0}
+    for key, q in SUMMARY_PERCENTILES:
+        summary[key] = float(values[_rank(q, n)])
+    result['summary'] = summary
+
+    q1, q3 = float(values[_rank(25, n)]), float(values[_rank(75, n)])
+    high = q3 + k * (q3 - q1)
+    low = q1 - k * (q3 - q1)
+    success_ts = ts[ok] - ts.min()
+    success_latency = latency[ok]
+    worst = np.argsort(success_latency)[::-1][:WORST_SAMPLES]
+    result['outliers'] = {
+        'k': k, 'low_fence_ms': low, 'high_fence_ms': high,
+        'high': int((values > high).sum()), 'low': int((values < low).sum()),
+        'worst': [{'elapsed_ms': float(success_latency[i]), 'at_s': float(success_ts[i])} for i in worst],
+    }
+    result['outliers']['fraction'] = (result['outliers']['high'] + result['outliers']['low']) / n
+    return result
+
+
+def _analyze_python(latency: array, ts: array, ok: array, bucket_s: float, k: float) -> Dict[str, Any]:
+    result = {'engine': 'python', 'samples': len(latency), 'failed': len(ok) - sum(ok)}
+    if not latency:
+        return result
+    start = min(ts)
+    completed: List[int] = []
+    failed: List[int] = []
+    for t, success in zip(ts, ok):
+        second = int((t - start) // bucket_s)
+        if second >= len(completed):
+            grow = second + 1 - len(completed)
+            completed.extend([0] * grow)
+            failed.extend([0] * grow)
+        completed[second] += 1
+        if not success:
+            failed[second] += 1
+    result['throughput'] = {'bucket_s': bucket_s, 'completed': completed, 'failed': failed}
+
+    successes = [(value, t - start) for value, t, success in zip(latency, ts, ok) if success]
+    n = len(successes)
+    if not n:
+        return result
+    values = sorted(value for value, _ in successes)
+    mean = math.fsum(values) / n
+    summary = {'count': n, 'min_ms': values[0], 'max_ms': values[-1], 'avg_ms': mean,
+               'std_dev': math.sqrt(math.fsum((v - mean) ** 2 for v in values) / (n - 1)) if n > 1 else 0.0}
+    for key, q in SUMMARY_PERCENTILES:
+        summary[key] = values[_rank(q, n)]
+    result['summary'] = summary
+
+    q1, q3 = values[_rank(25, n)], values[_rank(75, n)]
+    high = q3 + k * (q3 - q1)
+    low = q1 - k * (q3 - q1)
+    worst = heapq.nlargest(WORST_SAMPLES, successes)
+    result['outliers'] = {
+        'k': k, 'low_fence_ms': low, 'high_fence_ms': high,
+        'high': sum(1 for v in values if v > high), 'low': sum(1 for v in values if v < low),
+        'worst': [{'elapsed_ms': value, 'at_s': at} for value, at in worst],
+    }
+    result['outliers']['fraction'] = (result['outliers']['high'] + result['outliers']['low']) / n
+    return result
+
+
+def parse_floats(strings: List[str]):
+    """Float values of regex-captured strings in one batch"""
+    if np is not None:
+        return np.array(strings, dtype=np.float64)
+    return array('d', map(float, strings))
+
+
+def abc_time_histograms(output: str) -> Dict[str, LatencyHistogram]:
+    """Test name -> latency histogram from abc.py output, one regex pass per test block"""
+    histograms: Dict[str, LatencyHistogram] = {}
+    parts = _ABC_TEST_RE.split(output)
+    # parts = [text before the first test, name, block, name, block, ...]
+    for name, block in zip(parts[1::2], parts[2::2]):
+        times = _ABC_TIME_RE.findall(block)
+        if not times:
+            continue
+        histogram = LatencyHistogram.from_values(parse_floats(times))
+        if name in histograms:
+            histograms[name].merge(histogram)
+        else:
+            histograms[name] = histogram
+    return histograms
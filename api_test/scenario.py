@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Multi-endpoint workload scenarios: many virtual users (VUs) running a weighted
+mix of requests or a sequential user journey against the backend at once.
+
+    - scenario:
+        name: "Mixed browsing"
+        mode: weighted             # pick one step per iteration by weight; `journey` = all steps in order
+        virtual_users: 20
+        duration_s: 30             # or `iterations: N` per VU
+        ramp_up_s: 5               # VUs start evenly spread over this window
+        think_time_ms: [200, 800]  # pause after each step (fixed number or [min, max])
+        setup:                     # once per VU; extract_binds stay private to that VU
+          - name: Login
+            url: http://localhost:8000/api/login
+            method: POST
+            body: '{"email":"1@gmail.com","password":"Bao12345"}'
+            extract_binds:
+              - token: { jsonpath_mini: access_token }
+        steps:
+          - name: Me
+            weight: 5
+            url: http://localhost:8000/api/me
+            headers: { template: { Authorization: "Bearer $token" } }
+        retry: { max_attempts: 2 }   # per scenario, or per step (see retry.py)
+        circuit_breaker: { consecutive_errors: 10 }   # all VUs stop once it trips (see circuit_breaker.py)
+        # auth: { login: {...}, assign: per_vu }   # or a pool of logged-in users, one per VU (see auth_pool.py)
+        response_body: discard     # per scenario or per step: discard, head:N, full (see body_policy.py)
+        # a step's `validators` fail its sample like in the perf loops (checked by the runner's check_response)
+        slo: { p95_ms: 300 }
+
+Every step keeps its own PerfRecorder next to the aggregate one, so the report
+shows the mix as a whole and which endpoint drives its tail.
+"""
+
+import asyncio
+import bisect
+import itertools
+import random
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from async_engine import DEFAULT_TIMEOUT, AsyncConnectionPool, fetch
+from auth_pool import TokenPool, resolve_auth
+from body_policy import BodyPolicy, parse_body_policy
+from circuit_breaker import CircuitBreaker, resolve_breaker
+from perf_recorder import PerfRecorder
+from request_spec import RequestTemplate
+from retry import RetryPolicy, resolve_retry
+
+SCENARIO_MODES = ('weighted', 'journey')
+DEFAULT_VIRTUAL_USERS = 10
+DEFAULT_DURATION_S = 10
+
+
+def _think_time(value: Any, where: str) -> Optional[Tuple[float, float]]:
+    """(min_ms, max_ms) from `ms` or `[min_ms, max_ms]`"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+        return float(value), float(value)
+    if isinstance(value, list) and len(value) == 2 and 0 <= value[0] <= value[1]:
+        return float(value[0]), float(value[1])
+    raise ValueError(f"{where}: think_time_ms must be a number or [min, max], got {value!r}")
+
+
+class ScenarioStep:
+    """One request of a scenario, its template pre-parsed"""
+
+    def __init__(self, config: Dict[str, Any], where: str):
+        if not isinstance(config, dict) or not config.get('url'):
+            raise ValueError(f"{where}: each step needs a url")
+        self.config = config
+        self.name = config.get('name', where)
+        self.weight = config.get('weight', 1)
+        if isinstance(self.weight, bool) or not isinstance(self.weight, (int, float)) or self.weight <= 0:
+            raise ValueError(f"{where}: weight must be a positive number, got {self.weight!r}")
+        self.think_time = _think_time(config.get('think_time_ms'), where)
+        self.retry = resolve_retry(config.get('retry'), where)
+        self.response_body = parse_body_policy(config.get('response_body'), where)
+        self.request = RequestTemplate(config)
+
+
+class Scenario:
+    """Validated `scenario:` node of a suite"""
+
+    def __init__(self, config: Dict[str, Any], index: int = 1, base_dir: str = '.'):
+        if not isinstance(config, dict):
+            raise ValueError(f"scenario must be a mapping, got {config!r}")
+        self.config = config
+        self.name = config.get('name', f'Scenario_{index}')
+        where = f"Scenario '{self.name}'"
+        self.mode = config.get('mode', 'weighted')
+        if self.mode not in SCENARIO_MODES:
+            raise ValueError(f"{where}: mode must be one of {SCENARIO_MODES}, got {self.mode!r}")
+        self.virtual_users = int(config.get('virtual_users', DEFAULT_VIRTUAL_USERS))
+        if self.virtual_users < 1:
+            raise ValueError(f"{where}: virtual_users must be >= 1")
+        self.iterations = config.get('iterations')
+        self.duration_s = float(config.get('duration_s', DEFAULT_DURATION_S))
+        self.ramp_up_s = float(config.get('ramp_up_s', 0))
+        self.think_time = _think_time(config.get('think_time_ms'), where)
+        self.timeout = config.get('timeout', DEFAULT_TIMEOUT)
+        self.retry = resolve_retry(config.get('retry'), where)  # steps without their own `retry`
+        self.circuit_breaker = resolve_breaker(config.get('circuit_breaker'), where)
+        self.auth = resolve_auth(config.get('auth'), where, base_dir, scenario=True)
+        self.response_body = parse_body_policy(config.get('response_body'), where)  # steps without their own
+
+        steps = config.get('steps')
+        if not isinstance(steps, list) or not steps:
+            raise ValueError(f"{where}: steps must be a non-empty list")
+        self.setup = [ScenarioStep(s, f"{where} setup {i}") for i, s in enumerate(config.get('setup') or [], 1)]
+        self.steps = [ScenarioStep(s, f"{where} step {i}") for i, s in enumerate(steps, 1)]
+        names = [s.name for s in self.setup + self.steps]
+        if len(set(names)) != len(names):
+            raise ValueError(f"{where}: step names must be unique (they key the per-step histograms)")
+        self.cumulative_weights = list(itertools.accumulate(s.weight for s in self.steps))
+
+    def perf_config(self) -> Dict[str, Any]:
+        """What BenchmarkRunner.compute_metrics needs for the aggregate"""
+        perf = {key: self.config[key] for key in ('slo', 'threshold_ms', 'histogram_precision')
+                if key in self.config}
+        perf.update(mode='scenario', virtual_users=self.virtual_users)
+        return perf
+
+    def quick(self):
+        """Shrink to a smoke run (quick mode)"""
+        self.virtual_users = min(self.virtual_users, 2)
+        self.duration_s = min(self.duration_s, 2)
+        self.ramp_up_s = 0
+        if self.iterations:
+            self.iterations = min(int(self.iterations), 2)
+        self.think_time = self.think_time and (0.0, min(self.think_time[1], 50.0))
+        for step in self.setup + self.steps:
+            step.think_time = step.think_time and (0.0, min(step.think_time[1], 50.0))
+
+
+class ScenarioRun:
+    """Drives the VUs of one scenario and fills aggregate + per-step recorders"""
+
+    def __init__(self, scenario: Scenario, variables: Dict[str, Any], on_result=None,
+                 seed: Optional[int] = None, check=None):
+        from pyresttest import validators
+        self.scenario = scenario
+        self.variables = dict(variables)
+        self.on_result = on_result
+        self.check = check  # check(checks, headers=, body=) -> first failure message or None
+        self.rng = random.Random(seed)
+        precision = scenario.config.get('histogram_precision', 3)
+        self.aggregate = PerfRecorder(significant_figures=precision)
+        self.breaker = CircuitBreaker.for_config(scenario.circuit_breaker)
+        self.auth = None  # TokenPool, logged in by run()
+        self.steps = {s.name: PerfRecorder(significant_figures=precision)
+                      for s in scenario.setup + scenario.steps}
+        # One policy (and retry budget) per step, for this run only
+        self.retry = {s.name: RetryPolicy.for_config(s.retry if 'retry' in s.config else scenario.retry)
+                      for s in scenario.setup + scenario.steps}
+        # What each step keeps of its bodies; jsonpath_mini extract_binds are scanned off the stream
+        self.bodies: Dict[str, BodyPolicy] = {}
+        self.extractors = {}
+        self.checks = {}
+        for s in scenario.setup + scenario.steps:
+            binds = [(name, validators.parse_extractor(kind, config))
+                     for item in s.config.get('extract_binds') or []
+                     for name, spec in item.items() for kind, config in spec.items()]
+            checks = [validators.parse_validator(kind, config)
+                      for item in s.config.get('validators') or [] for kind, config in item.items()]
+            self.bodies[s.name], self.checks[s.name], streamed = BodyPolicy.resolve(
+                s.response_body or scenario.response_body, checks, [extractor for _, extractor in binds],
+                where=f"Scenario '{scenario.name}' step '{s.name}'")
+            self.extractors[s.name] = [(name, extractor) for (name, _), extractor in zip(binds, streamed)]
+
+    def record(self, step: ScenarioStep, sample: Dict[str, Any]):
+        sample['step'] = step.name
+        self.steps[step.name].record(sample)
+        self.aggregate.record(sample)
+        if self.breaker is not None:
+            self.breaker.record(sample)
+        if self.on_result is not None:
+            self.on_result(sample)
+
+    async def _run_step(self, pool: AsyncConnectionPool, step: ScenarioStep,
+                        variables: Dict[str, Any], specs: Dict[str, Any], vu: int = 0) -> bool:
+        """Send one step as VU `vu`; returns success. Extracted binds update the VU's variables."""
+        if self.auth is not None:
+            # This VU's pool user (per_vu) or the next one in turn; re-render only when the token changed
+            session = self.auth.draw(vu)
+            if any(variables.get(name) != value for name, value in session.items()):
+                variables.update(session)
+                specs.clear()
+        spec = specs.get(step.name)
+        if spec is None:
+            # Rendered once per VU (and again only after this VU's binds change)
+            spec = specs[step.name] = step.request.render(variables)
+        start = time.perf_counter()
+        retry = self.retry[step.name]
+        body_policy = self.bodies[step.name]
+        trace = {}
+        try:
+            if retry is None:
+                status, headers, body, info = await fetch(pool, spec, self.scenario.timeout, body_policy=body_policy)
+            else:
+                response, error, trace = await retry.call_async(
+                    lambda: fetch(pool, spec, self.scenario.timeout, body_policy=body_policy),
+                    lambda response: retry.retry_status(response[0]), start)
+                if error is not None:
+                    raise error
+                status, headers, body, info = response
+        except Exception as e:
+            self.record(step, {'success': False, 'elapsed_ms': (time.perf_counter() - start) * 1000,
+                               'error': f"{type(e).__name__}: {e}" if str(e) else type(e).__name__, **trace})
+            return False
+        # Scanning for extract_binds is client work, kept out of the latency like validator time
+        sample = {'success': status in spec.expected_status,
+                  'elapsed_ms': (time.perf_counter() - start) * 1000 - body.scan_ms, 'status_code': status,
+                  **info, **trace}
+        if not sample['success']:
+            sample['error'] = f"{step.name}: unexpected status {status} (expected {spec.expected_status})"
+        elif self.checks[step.name] and self.check is not None:
+            # Validator time is client overhead, outside elapsed_ms (as in the perf loops)
+            started = time.perf_counter()
+            error = self.check(self.checks[step.name], headers=list(headers.items()), body=body)
+            sample['validate_ms'] = (time.perf_counter() - started) * 1000 + body.scan_ms
+            if error is not None:
+                sample['success'] = False
+                sample['error'] = f"{step.name}: {error}"
+        self.record(step, sample)
+        if sample['success'] and self.extractors[step.name]:
+            for name, extractor in self.extractors[step.name]:
+                value = extractor.extract(body=body, headers=headers, context=None)
+                if value is None:
+                    return False
+                variables[name] = value
+            specs.clear()
+        return sample['success']
+
+    async def _think(self, step: ScenarioStep):
+        think = step.think_time or self.scenario.think_time
+        if think and think[1] > 0:
+            await asyncio.sleep(self.rng.uniform(*think) / 1000)
+
+    async def _virtual_user(self, index: int, deadline: float):
+        scenario = self.scenario
+        variables = dict(self.variables)
+        specs = {}
+        pool = AsyncConnectionPool()
+        try:
+            if scenario.ramp_up_s:
+                await asyncio.sleep(scenario.ramp_up_s * index / scenario.virtual_users)
+            for step in scenario.setup:
+                if not await self._run_step(pool, step, variables, specs, index):
+                    # e.g. login failed: this VU has no token to run the mix with
+                    self.aggregate.counters['vu_setup_failed'] += 1
+                    return
+            self.aggregate.counters['vus_started'] += 1
+
+            iteration = 0
+            while True:
+                if self.breaker is not None and self.breaker.tripped:
+                    return
+                if scenario.iterations:
+                    if iteration >= int(scenario.iterations):
+                        return
+                elif time.perf_counter() >= deadline:
+                    return
+                if scenario.mode == 'journey':
+                    for step in scenario.steps:
+                        await self._run_step(pool, step, variables, specs, index)
+                        await self._think(step)
+                        if not scenario.iterations and time.perf_counter() >= deadline:
+                            break
+                        if self.breaker is not None and self.breaker.tripped:
+                            break
+                else:
+                    pick = self.rng.random() * scenario.cumulative_weights[-1]
+                    step = scenario.steps[bisect.bisect_right(scenario.cumulative_weights, pick)]
+                    await self._run_step(pool, step, variables, specs, index)
+                    await self._think(step)
+                iteration += 1
+                self.aggregate.counters['iterations'] += 1
+        finally:
+            await pool.close()
+
+    async def _run(self):
+        deadline = time.perf_counter() + self.scenario.ramp_up_s + self.scenario.duration_s
+        await asyncio.gather(*(self._virtual_user(i, deadline) for i in range(self.scenario.virtual_users)))
+
+    def run(self) -> 'ScenarioRun':
+        if self.scenario.auth is not None:
+            self.auth = TokenPool(self.scenario.auth, self.variables, self.scenario.config.get('seed')).start()
+        started = time.perf_counter()
+        try:
+            asyncio.run(self._run())
+        finally:
+            if self.auth is not None:
+                self.auth.close()
+                self.aggregate.counters.update(self.auth.counters)
+        self.aggregate.elapsed_s = time.perf_counter() - started
+        if self.breaker is not None and self.breaker.tripped:
+            self.aggregate.aborted = self.breaker.report(self.aggregate.completed)
+        for recorder in self.steps.values():
+            recorder.elapsed_s = self.aggregate.elapsed_s
+        return self
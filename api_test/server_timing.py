@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Request IDs and server-side timing for benchmark samples.
+
+Every benchmark request carries an `X-Request-ID: <run prefix>-<counter>`
+header (unless the test sets one itself), so a slow sample in the NDJSON
+stream can be found in the backend's logs. Timing headers on the response are
+parsed into `sample['server_timing']` (component -> ms):
+
+    Server-Timing: db;dur=53.2, app;dur=47.1;desc="Render"   -> db, app
+    X-Runtime: 0.0532                                         -> runtime (seconds, Rails/Rack)
+    X-Response-Time: 12.3ms                                   -> response_time (Express, Koa)
+
+PerfRecorder keeps one histogram per component next to the client-side
+latency, plus `network_queue`: client latency minus the largest server
+component, i.e. time spent on the wire, in proxies and waiting for a worker.
+"""
+
+import itertools
+import os
+import re
+import uuid
+from typing import Dict, Any, Optional
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+NETWORK_QUEUE = 'network_queue'
+
+# `name;dur=12.3;desc="..."` entries, comma-separated; desc may be quoted and contain commas
+_ENTRY_RE = re.compile(r'\s*([^,;=\s]+)((?:\s*;\s*[^,;=\s]+(?:\s*=\s*(?:"(?:[^"\\]|\\.)*"|[^,;\s]*))?)*)')
+_DUR_RE = re.compile(r';\s*dur\s*=\s*"?([0-9.]+)"?', re.IGNORECASE)
+_NUMBER_RE = re.compile(r'^\s*([0-9.]+)\s*(ms|s)?\s*$', re.IGNORECASE)
+
+_counter = itertools.count(1)
+_prefix = uuid.uuid4().hex[:12]
+
+
+def _reset_after_fork():
+    # Worker processes would otherwise repeat the parent's IDs
+    global _counter, _prefix
+    _counter = itertools.count(1)
+    _prefix = uuid.uuid4().hex[:12]
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def next_request_id() -> str:
+    """Unique ID for the next request of this process"""
+    return f"{_prefix}-{next(_counter):x}"
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """Component -> duration (ms) from a Server-Timing header; entries without dur are skipped"""
+    timings: Dict[str, float] = {}
+    for match in _ENTRY_RE.finditer(value):
+        dur = _DUR_RE.search(match.group(2))
+        if dur is None:
+            continue
+        try:
+            ms = float(dur.group(1))
+        except ValueError:
+            continue
+        name = match.group(1)
+        timings[name] = timings.get(name, 0.0) + ms
+    return timings
+
+
+def _duration_ms(value: str, default_unit: str) -> Optional[float]:
+    match = _NUMBER_RE.match(value)
+    if match is None:
+        return None
+    try:
+        number = float(match.group(1))
+    except ValueError:
+        return None
+    return number * 1000 if (match.group(2) or default_unit).lower() == 's' else number
+
+
+def server_timings(headers) -> Optional[Dict[str, float]]:
+    """Server-side components (ms) from lowercased response headers, None if there are none.
+
+    `headers` is a dict or a list of (name, value) pairs; repeated headers are combined.
+    """
+    if not isinstance(headers, dict):
+        pairs, headers = headers, {}
+        for name, value in pairs:
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    timings: Dict[str, float] = {}
+    value = headers.get('server-timing')
+    if value:
+        timings.update(parse_server_timing(value))
+    value = headers.get('x-runtime')
+    if value:
+        ms = _duration_ms(value, 's')
+        if ms is not None:
+            timings['runtime'] = ms
+    value = headers.get('x-response-time')
+    if value:
+        ms = _duration_ms(value, 'ms')
+        if ms is not None:
+            timings['response_time'] = ms
+    return timings or None
+
+
+def network_queue_ms(sample: Dict[str, Any]) -> Optional[float]:
+    """Client latency not covered by the server's own timing"""
+    timings = sample.get('server_timing')
+    if not timings:
+        return None
+    return max(0.0, sample['elapsed_ms'] - max(timings.values()))
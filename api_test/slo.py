@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+SLO assertions for performance blocks.
+
+    performance:
+      slo:
+        p95_ms: 250          # upper bounds on latency percentiles
+        p99_ms: 500
+        max_error_rate: 0.01 # failed / completed requests
+        min_rps: 50          # completed requests per wall-clock second
+        max_std_dev: 80
+
+Each assertion is checked against the computed metrics and reported on its
+own, so a tail regression shows up even when the average still looks fine.
+"""
+
+from numbers import Number
+from typing import Dict, List, Any, Optional
+
+# SLO key -> (metrics key, 'max' = actual must be <= target, 'min' = actual must be >=)
+SLO_ASSERTIONS = {
+    'avg_ms': ('avg_ms', 'max'),
+    'p50_ms': ('median_ms', 'max'),
+    'p90_ms': ('p90_ms', 'max'),
+    'p95_ms': ('p95_ms', 'max'),
+    'p99_ms': ('p99_ms', 'max'),
+    'p999_ms': ('p999_ms', 'max'),
+    'max_ms': ('max_ms', 'max'),
+    'max_std_dev': ('std_dev', 'max'),
+    'max_error_rate': ('error_rate', 'max'),
+    'min_rps': ('throughput_rps', 'min'),
+}
+
+
+def validate_slo(slo: Any) -> List[str]:
+    """Problems with an `slo:` declaration (empty list when it is valid)"""
+    if not isinstance(slo, dict) or not slo:
+        return ["slo must be a non-empty mapping of assertions"]
+    issues = []
+    for key, target in slo.items():
+        if key not in SLO_ASSERTIONS:
+            issues.append(f"unknown slo key '{key}' (expected one of {', '.join(SLO_ASSERTIONS)})")
+        elif isinstance(target, bool) or not isinstance(target, Number) or target < 0:
+            issues.append(f"slo {key} must be a non-negative number, got {target!r}")
+        elif key == 'max_error_rate' and target > 1:
+            issues.append(f"slo max_error_rate is a fraction (0-1), got {target}")
+    return issues
+
+
+def evaluate_slo(slo: Dict[str, Any], metrics: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One result per assertion: name, target, actual, passed"""
+    results = []
+    for key, target in slo.items():
+        if key not in SLO_ASSERTIONS:
+            continue
+        metric, bound = SLO_ASSERTIONS[key]
+        actual: Optional[float] = metrics.get(metric)
+        if actual is None:
+            passed = False  # e.g. no successful samples to take a percentile from
+        elif bound == 'max':
+            passed = actual <= target
+        else:
+            passed = actual >= target
+        results.append({'name': key, 'target': target, 'actual': actual, 'passed': passed})
+    return results
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Compiled suite plans, cached on disk.
+
+A suite file is parsed once into a SuitePlan: the normalized list of
+config/test nodes, each performance block checked and resolved with its
+mode's defaults, each request's templates pre-parsed and each `scenario:`
+validated, each `retry:` / `circuit_breaker:` / `auth:` block resolved and
+each `response_body:` policy checked.
+The plan is pickled under `api_test/.suite_cache/` (or $SUITE_CACHE_DIR;
+set it empty to disable) keyed by the file's path and SHA-256, so repeated
+runs and large generated suites skip YAML parsing entirely. The file is
+hashed on every load: an edit that keeps mtime and size still recompiles.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import yaml
+
+from auth_pool import resolve_auth
+from body_policy import parse_body_policy
+from capacity import resolve_capacity
+from circuit_breaker import resolve_breaker
+from feeders import resolve_feeders
+from request_spec import RequestTemplate
+from retry import resolve_retry
+from scenario import Scenario
+from warmup import parse_warmup
+
+CACHE_VERSION = 9  # bump when the plan layout changes
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.suite_cache')
+
+PERFORMANCE_DEFAULTS = {
+    'sync': {'repeat': 50, 'concurrency': 5},
+    'async': {'repeat': 50, 'concurrency': 5},
+    'rate': {'rps': 10, 'duration_s': 10, 'max_inflight': 100},
+    'capacity': {},  # per-ramp defaults: capacity.CAPACITY_DEFAULTS
+}
+
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# path -> (sha256, pickled state): skips the disk on repeat loads in one process
+_memory: Dict[str, Tuple[str, bytes]] = {}
+_lock = threading.Lock()
+
+
+def cache_dir() -> Optional[str]:
+    """Directory for cached plans, or None when caching is disabled"""
+    return os.environ.get('SUITE_CACHE_DIR', DEFAULT_CACHE_DIR) or None
+
+
+def resolve_performance(perf_config: Any, test_name: str, base_dir: str = '.') -> Dict[str, Any]:
+    """Performance block with its mode's defaults filled in; ValueError if it can't run"""
+    if not isinstance(perf_config, dict):
+        raise ValueError(f"Test '{test_name}': performance must be a mapping, got {perf_config!r}")
+    mode = perf_config.get('mode', 'sync')
+    if mode not in PERFORMANCE_DEFAULTS:
+        raise ValueError(f"Test '{test_name}': unknown performance mode '{mode}' "
+                         f"(expected {', '.join(PERFORMANCE_DEFAULTS)})")
+    try:
+        parse_warmup(perf_config)
+    except (TypeError, ValueError):
+        raise ValueError(f"Test '{test_name}': invalid warmup {perf_config.get('warmup')!r}")
+    resolved = dict(PERFORMANCE_DEFAULTS[mode], mode=mode)
+    resolved.update(perf_config)
+    if mode == 'rate':
+        # Requests are due every 1/rps s for duration_s: both must be positive numbers
+        for key in ('rps', 'duration_s'):
+            value = resolved[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"Test '{test_name}': rate mode {key} must be a number > 0, got {value!r}")
+    resolved['circuit_breaker'] = resolve_breaker(perf_config.get('circuit_breaker'),
+                                                  f"Test '{test_name}' performance")
+    if 'retry' in perf_config:
+        resolved['retry'] = resolve_retry(perf_config['retry'], f"Test '{test_name}' performance")
+    if mode == 'capacity':
+        resolved = resolve_capacity(resolved, test_name)
+    if 'feeders' in perf_config:
+        try:
+            resolved['feeders'] = resolve_feeders(perf_config['feeders'], base_dir)
+        except ValueError as e:
+            raise ValueError(f"Test '{test_name}': {e}")
+    if 'auth' in perf_config:
+        resolved['auth'] = resolve_auth(perf_config['auth'], f"Test '{test_name}' performance", base_dir)
+    if 'response_body' in perf_config:
+        resolved['response_body'] = parse_body_policy(perf_config['response_body'],
+                                                      f"Test '{test_name}' performance")
+    return resolved
+
+
+class SuitePlan:
+    """Compiled suite: config nodes, raw test blocks, resolved performance blocks, request templates"""
+
+    sha256: Optional[str] = None  # of the source file, when loaded through the cache
+
+    def __init__(self, path: str, items: Any):
+        self.path = str(path)
+        self.name = Path(path).stem
+        if isinstance(items, dict):
+            # Flat `{config: ..., tests: [...]}` layout
+            config = items.get('config')
+            self.items = ([{'config': config}] if config else []) + \
+                [{'test': t} for t in items.get('tests', [])]
+        else:
+            self.items = items if isinstance(items, list) else []
+        self.config_nodes = [item['config'] for item in self.items
+                             if isinstance(item, dict) and 'config' in item]
+        self.test_configs = [item['test'] for item in self.items
+                             if isinstance(item, dict) and isinstance(item.get('test'), dict)]
+        self.scenario_configs = [item['scenario'] for item in self.items
+                                 if isinstance(item, dict) and 'scenario' in item]
+        self.compile()
+
+    def compile(self):
+        """Resolve performance blocks, pre-parse request templates (index-aligned with test_configs), build scenarios"""
+        self.perf_configs: List[Optional[Dict[str, Any]]] = []
+        self.requests: List[Optional[RequestTemplate]] = []
+        self.retry_configs: List[Optional[Dict[str, Any]]] = []
+        base_dir = os.path.dirname(os.path.abspath(self.path))
+        for index, test_config in enumerate(self.test_configs):
+            name = test_config.get('name', f'Test_{index + 1}')
+            perf_config = test_config.get('performance')
+            retry = resolve_retry(test_config.get('retry'), f"Test '{name}'")
+            self.retry_configs.append(retry)
+            perf_config = resolve_performance(perf_config, name, base_dir) if perf_config else None
+            if perf_config is not None and 'retry' not in perf_config and 'retry' in test_config:
+                # The test's policy covers its load run unless the block sets its own
+                perf_config['retry'] = retry
+            self.perf_configs.append(perf_config)
+            try:
+                self.requests.append(RequestTemplate(test_config))
+            except ValueError:
+                # e.g. a `{file: ...}` body: only pyresttest itself can send this one
+                self.requests.append(None)
+        self.scenarios = [Scenario(config, index, base_dir)
+                          for index, config in enumerate(self.scenario_configs, 1)]
+
+    def has_performance_block(self) -> bool:
+        return any(perf is not None for perf in self.perf_configs)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]):
+        plan = cls.__new__(cls)
+        plan.__dict__.update(state)
+        return plan
+
+
+def _read_cache(cache_file: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION:
+        return None
+    return entry
+
+
+def _write_cache(cache_file: str, entry: Dict[str, Any]):
+    tmp = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError:
+        # Read-only checkout or full disk: the cache is only an optimization
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _plan_state(path: str) -> bytes:
+    """Pickled SuitePlan state for path, from memory, the disk cache or a fresh compile"""
+    # Hashing is cheap next to parsing; mtime + size alone miss a same-size edit
+    with open(path, 'rb') as f:
+        raw = f.read()
+    sha = hashlib.sha256(raw).hexdigest()
+    with _lock:
+        cached = _memory.get(path)
+    if cached and cached[0] == sha:
+        return cached[1]
+
+    directory = cache_dir()
+    cache_file = entry = None
+    if directory:
+        cache_file = os.path.join(directory, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.pickle')
+        entry = _read_cache(cache_file)
+
+    if entry is not None and entry['sha256'] == sha:
+        # Unchanged content, even if touched (e.g. a fresh git checkout): keep the compiled plan
+        state = entry['state']
+    else:
+        plan = SuitePlan(path, yaml.load(raw, Loader=_Loader))
+        plan.sha256 = sha
+        state = pickle.dumps(plan.__dict__, protocol=pickle.HIGHEST_PROTOCOL)
+        if cache_file is not None:
+            _write_cache(cache_file, {'version': CACHE_VERSION, 'path': path, 'sha256': sha, 'state': state})
+
+    with _lock:
+        _memory[path] = (sha, state)
+    return state
+
+
+def load_plan(path: str, cls=SuitePlan):
+    """Compiled plan for a suite file; a fresh copy per call, safe to mutate (e.g. quick mode)"""
+    plan = cls.from_state(pickle.loads(_plan_state(os.path.abspath(str(path)))))
+    plan.path = str(path)
+    return plan
+
+
+def derived_file(plan: SuitePlan, tag: str, render) -> Optional[str]:
+    """Cached file generated from a plan (e.g. a scaled-down copy for quick mode).
+
+    `render(plan)` returns the file's text; it is written once per source
+    content and reused afterwards. None when caching is disabled.
+    """
+    directory = cache_dir()
+    if not directory or not plan.sha256:
+        return None
+    target = os.path.join(directory, f"{plan.name}.{tag}.{plan.sha256[:16]}.yaml")
+    if not os.path.exists(target):
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(render(plan))
+            os.replace(tmp, target)
+        except OSError:
+            return None
+    return target
+
+
+def load_yaml(path: str) -> Any:
+    """Suite nodes as yaml.safe_load would return them (normalized to a list), via the cache"""
+    return load_plan(path).items
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP transport for the sync / threaded benchmark loops.
+
+Each worker thread keeps its own keep-alive connection per origin, so a
+measured sample no longer includes TCP (and TLS) setup unless the test asks
+for `connection: fresh`. Every response carries a per-phase breakdown
+(DNS, connect, TLS, TTFB, transfer) taken from the monotonic perf_counter.
+
+Requests go out as the RequestSpec's pre-encoded bytes in a single sendall;
+http.client only parses the response. Under a body_policy.BodyPolicy the body
+is read in chunks through one reused buffer per thread instead of in one piece.
+"""
+
+import http.client
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from body_policy import CHUNK_SIZE, BodyPolicy, BodySink, CapturedBody
+from request_spec import RequestSpec
+from server_timing import next_request_id, server_timings
+
+DEFAULT_TIMEOUT = 30
+CONNECTION_MODES = ('reuse', 'fresh')
+
+# Errors that mean a reused keep-alive socket was closed under us
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+def connection_mode(test_config: Dict, perf_config: Optional[Dict] = None) -> str:
+    """`connection: reuse|fresh` from the performance block, else the test block"""
+    mode = (perf_config or {}).get('connection', test_config.get('connection', 'reuse'))
+    if mode not in CONNECTION_MODES:
+        raise ValueError(f"connection must be one of {CONNECTION_MODES}, got {mode!r}")
+    return mode
+
+
+class PooledTransport:
+    """Per-thread keep-alive connections, closed together at the end of a run"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = []
+        self._ssl_context = None
+
+    def _idle(self) -> Dict[tuple, http.client.HTTPConnection]:
+        idle = getattr(self._local, 'idle', None)
+        if idle is None:
+            idle = self._local.idle = {}
+        return idle
+
+    def _open(self, spec: RequestSpec, timeout: float,
+              track: bool) -> Tuple[http.client.HTTPConnection, Dict[str, Optional[float]]]:
+        """Resolve, connect and (for https) handshake, timing each phase separately"""
+        start = time.perf_counter()
+        addresses = socket.getaddrinfo(spec.host, spec.port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+
+        sock, error = None, None
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                sock, error = None, e
+        if sock is None:
+            raise error or OSError(f"No address for {spec.host}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time.perf_counter()
+
+        tls_ms = None
+        if spec.scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            sock = self._ssl_context.wrap_socket(sock, server_hostname=spec.host)
+            tls_ms = (time.perf_counter() - connected) * 1000
+
+        cls = http.client.HTTPSConnection if spec.scheme == 'https' else http.client.HTTPConnection
+        conn = cls(spec.host, spec.port, timeout=timeout)
+        conn.sock = sock  # already connected, so http.client skips its own connect()
+        if track:
+            with self._lock:
+                if len(self._opened) >= 256:
+                    # Drop connections the server already closed on us
+                    self._opened = [c for c in self._opened if c.sock is not None]
+                self._opened.append(conn)
+        phases = {
+            'dns_ms': (resolved - start) * 1000,
+            'connect_ms': (connected - resolved) * 1000,
+            'tls_ms': tls_ms,
+        }
+        return conn, phases
+
+    def _read_body(self, response: http.client.HTTPResponse, sink: BodySink) -> CapturedBody:
+        """Read the body in CHUNK_SIZE pieces into `sink`, through this thread's scratch buffer"""
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = memoryview(bytearray(CHUNK_SIZE))
+        while True:
+            n = response.readinto(scratch)
+            if not n:
+                return sink.close()
+            sink.write(scratch[:n])
+
+    def send(self, spec: RequestSpec, fresh: bool = False, timeout: Optional[float] = None,
+             body_policy: Optional[BodyPolicy] = None) -> Dict[str, Any]:
+        """Send one request; returns status/headers/body plus phase timings in ms.
+
+        dns/connect/tls are None on a reused connection; ttfb runs from sending
+        the request to the parsed response head, transfer covers the body read.
+        `server_timing` holds the response's own timing headers (None without any).
+        With `body_policy`, `body` is a CapturedBody and the time spent scanning
+        it (`scan_ms`) is left out of transfer and total.
+        """
+        timeout = timeout or self.timeout
+        idle = self._idle()
+        request_id = next_request_id() if spec.stamps_id else None
+        payload = spec.wire_with_id(request_id, keep_alive=not fresh)
+
+        for attempt in range(2):
+            start = time.perf_counter()
+            conn = None if fresh else idle.pop(spec.origin, None)
+            if conn is not None and conn.sock is None:
+                conn = None  # closed by close() at the end of an earlier run
+            reused = conn is not None
+            phases = {'dns_ms': None, 'connect_ms': None, 'tls_ms': None}
+            if conn is None:
+                conn, phases = self._open(spec, timeout, track=not fresh)
+            try:
+                sent = time.perf_counter()
+                conn.sock.sendall(payload)
+                response = conn.response_class(conn.sock, method=spec.method)
+                response.begin()
+                first_byte = time.perf_counter()
+                if body_policy is None:
+                    body = response.read()
+                else:
+                    body = self._read_body(response, body_policy.sink())
+            except STALE_ERRORS:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            done = time.perf_counter()
+
+            if fresh or response.will_close:
+                conn.close()
+            else:
+                idle[spec.origin] = conn
+
+            headers = [(k.lower(), v) for k, v in response.getheaders()]
+            scan_ms = body.scan_ms if body_policy is not None else 0.0
+            return {
+                'status': response.status,
+                'headers': headers,
+                'body': body,
+                'body_bytes': body.size if body_policy is not None else len(body),
+                'request_id': request_id,
+                'server_timing': server_timings(headers),
+                'reused': reused,
+                **phases,
+                'ttfb_ms': (first_byte - sent) * 1000,
+                'transfer_ms': (done - first_byte) * 1000 - scan_ms,
+                'total_ms': (done - start) * 1000 - scan_ms,
+                'scan_ms': scan_ms,
+            }
+
+    def close(self):
+        """Close every connection opened by any thread"""
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            conn.close()
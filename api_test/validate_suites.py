@@ -6,10 +6,12 @@ Checks:
 - Suite 1: Auth & user operations (login, /me, logout)
 - Suite 2: Content read (getPostById, getAllLikes)
 - Suite 3: Concurrency (10+ parallel requests)
-- Suite 4: Performance benchmark (repeat, concurrency, threshold_ms)
+- Suite 4: Performance benchmark (repeat, concurrency, threshold_ms, slo)
 - Suite 5: Retry logic (500, 404, expected_status arrays)
 - Suite 6: Performance sync (advanced runner, mode: sync)
 - Suite 7: Performance async (mode: async, high concurrency)
+- Suites 4/6/7: every performance block declares a valid slo: section
+- Suite 8: Workload scenarios (per-VU login, binds available to the steps using them, slo)
 """
 
 import glob
@@ -22,11 +24,16 @@ except ImportError:
     print("Please run this script with venv Python: source venv/bin/activate && python3 ...")
     sys.exit(1)
 
+from request_spec import RequestTemplate
+from slo import SLO_ASSERTIONS, validate_slo
+from suite_cache import load_plan
+from warmup import parse_warmup
+
 SUITES_DIR = os.path.join(os.path.dirname(__file__), 'suites')
 
 def load_yaml(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+    # Compiled once and cached on disk (suite_cache.py); a bad performance block fails here
+    return load_plan(path).items
 
 def check_suite_1(yaml_obj):
     """Basic Auth & User Operations"""
@@ -92,6 +99,28 @@ def check_suite_3(yaml_obj):
     
     return issues
 
+def check_slo(test, prefix=""):
+    """slo: section of a performance block (required for CI gating)"""
+    perf = test.get('performance', {})
+    name = test.get('name')
+    if 'slo' not in perf:
+        return [f"{prefix}Test '{name}' missing slo (e.g. p95_ms, p99_ms, max_error_rate, min_rps)"]
+    
+    issues = [f"{prefix}Test '{name}' {issue}" for issue in validate_slo(perf['slo'])]
+    if issues:
+        return issues
+    
+    slo = perf['slo']
+    latency_keys = [k for k in ('p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'p999_ms', 'max_ms') if k in slo]
+    for lower, upper in zip(latency_keys, latency_keys[1:]):
+        if slo[lower] > slo[upper]:
+            issues.append(f"{prefix}Test '{name}' slo {lower} ({slo[lower]}) above {upper} ({slo[upper]})")
+    if not any(SLO_ASSERTIONS[k][0] in ('p95_ms', 'p99_ms', 'p999_ms') for k in slo):
+        issues.append(f"{prefix}Test '{name}' slo has no tail latency assertion (p95_ms/p99_ms)")
+    if perf.get('mode') == 'rate' and slo.get('min_rps', 0) > perf.get('rps', 10):
+        issues.append(f"{prefix}Test '{name}' slo min_rps {slo['min_rps']} above the target rps {perf.get('rps', 10)}")
+    return issues
+
 def check_suite_4(yaml_obj):
     """Performance Benchmark"""
     issues = []
@@ -114,6 +143,8 @@ def check_suite_4(yaml_obj):
         
         if 'threshold_ms' not in perf:
             issues.append(f"Test '{t.get('name')}' missing threshold_ms")
+        
+        issues.extend(check_slo(t))
     
     return issues
 
@@ -152,10 +183,51 @@ def check_suite_6_or_7_perf(yaml_obj, suite_name):
         perf = t.get('performance', {})
         mode = perf.get('mode', '')
         if not mode:
-            issues.append(f"{suite_name}: Test '{t.get('name')}' missing mode (sync/async)")
+            issues.append(f"{suite_name}: Test '{t.get('name')}' missing mode (sync/async/rate)")
+        
+        if mode == 'rate':
+            for key in ('rps', 'duration_s'):
+                if key not in perf:
+                    issues.append(f"{suite_name}: Test '{t.get('name')}' rate mode missing {key}")
+                elif isinstance(perf[key], bool) or not isinstance(perf[key], (int, float)) or perf[key] <= 0:
+                    issues.append(f"{suite_name}: Test '{t.get('name')}' rate mode {key} must be > 0, "
+                                  f"got {perf[key]!r}")
         
         if 'repeat' in perf and perf.get('repeat', 0) < 50:
             issues.append(f"{suite_name}: Test '{t.get('name')}' repeat too low for advanced benchmark")
+        
+        try:
+            parse_warmup(perf)
+        except (TypeError, ValueError):
+            issues.append(f"{suite_name}: Test '{t.get('name')}' invalid warmup {perf.get('warmup')!r} "
+                          f"(use N, \"Ns\" or {{requests: N, duration_s: T}})")
+        
+        issues.extend(check_slo(t, f"{suite_name}: "))
+    
+    return issues
+
+def check_suite_8_scenario(yaml_obj):
+    """Workload Scenarios"""
+    issues = []
+    scenarios = [item['scenario'] for item in yaml_obj if 'scenario' in item]
+    if not scenarios:
+        return ["No scenario blocks found"]
+    
+    if not any(s.get('setup') for s in scenarios):
+        issues.append("Missing a scenario with per-VU setup (e.g. Login extracting a token)")
+    for scenario in scenarios:
+        name = scenario.get('name')
+        # Setup binds are there for every step; journey steps also see binds of earlier steps
+        bound = {bind for step in scenario.get('setup') or [] for item in step.get('extract_binds') or []
+                 for bind in item}
+        for step in scenario.get('steps', []):
+            used = RequestTemplate(step).variables
+            missing = [v for v in used if v not in bound]
+            if missing:
+                issues.append(f"Scenario '{name}' step '{step.get('name')}' uses unbound ${', $'.join(missing)}")
+            if scenario.get('mode', 'weighted') == 'journey':
+                bound.update(bind for item in step.get('extract_binds') or [] for bind in item)
+        issues.extend(check_slo({'name': name, 'performance': scenario}, "Scenario: "))
     
     return issues
 
@@ -187,6 +259,8 @@ def validate_all():
             issues = check_suite_5(yaml_obj)
         elif 'test_suite_6' in suite_name or 'test_suite_7' in suite_name:
             issues = check_suite_6_or_7_perf(yaml_obj, suite_name)
+        elif 'test_suite_8' in suite_name:
+            issues = check_suite_8_scenario(yaml_obj)
         
         status = 'PASS' if not issues else 'FAIL'
         report[suite_name] = {'status': status, 'issues': issues}
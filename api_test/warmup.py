@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Warmup and steady-state filtering for performance samples.
+
+The first requests against a cold backend pay for opcache warming, config
+loading and DB connection setup. WarmupGate sits between an engine and the
+PerfRecorder and drops those samples:
+
+    performance:
+      warmup: 20               # first 20 samples (or "5s" / {duration_s: 5})
+      steady_state: true       # or {window: 20, mean_tolerance: 0.1, ...}
+
+After the explicit warmup, steady-state detection buffers samples in windows
+and starts recording once two consecutive windows agree on mean and standard
+deviation. Everything dropped is counted on the recorder.
+"""
+
+import math
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+DEFAULT_STEADY_STATE = {
+    'window': 20,            # samples per window
+    'mean_tolerance': 0.10,  # max relative change of the window mean
+    'std_tolerance': 0.30,   # max relative change of the window std dev
+    'max_discard': 0.5,      # give up (keep everything) after this share of the run
+}
+
+
+def parse_warmup(perf_config: Dict) -> Tuple[int, float]:
+    """(warmup request count, warmup seconds) from `warmup: N | "Ts" | {requests, duration_s}`"""
+    warmup = perf_config.get('warmup')
+    if not warmup:
+        return 0, 0.0
+    if isinstance(warmup, dict):
+        return int(warmup.get('requests', 0)), float(warmup.get('duration_s', 0))
+    if isinstance(warmup, str):
+        text = warmup.strip().lower()
+        if text.endswith('s'):
+            return 0, float(text[:-1])
+        return int(text), 0.0
+    return int(warmup), 0.0
+
+
+def steady_state_config(perf_config: Dict) -> Optional[Dict[str, float]]:
+    """Detector settings, or None when `steady_state` is off"""
+    value = perf_config.get('steady_state')
+    if not value:
+        return None
+    config = dict(DEFAULT_STEADY_STATE)
+    if isinstance(value, dict):
+        config.update(value)
+    return config
+
+
+def _mean_std(values: List[float]) -> Tuple[float, float]:
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def _relative_change(old: float, new: float) -> float:
+    if old == new:
+        return 0.0
+    return abs(new - old) / max(abs(old), 1e-9)
+
+
+class WarmupGate:
+    """Sample callback wrapper that discards warmup and pre-steady-state samples"""
+
+    def __init__(self, record: Callable[[Dict[str, Any]], None], counters,
+                 warmup_count: int = 0, warmup_s: float = 0.0,
+                 steady_state: Optional[Dict[str, float]] = None, expected: int = 0):
+        self.record = record
+        self.counters = counters
+        self.warmup_count = warmup_count
+        self.deadline = time.perf_counter() + warmup_s if warmup_s else None
+        self.steady_state = steady_state
+        self.max_buffer = int(expected * steady_state['max_discard']) if steady_state else 0
+        self.seen = 0
+        self.settled = steady_state is None
+        self._buffer: List[Dict[str, Any]] = []
+
+    def __call__(self, sample: Dict[str, Any]):
+        self.seen += 1
+        if self.seen <= self.warmup_count or (
+                self.deadline is not None and time.perf_counter() < self.deadline):
+            self._discard(sample, 'discarded_warmup')
+            return
+        if self.settled:
+            self.record(sample)
+            return
+        self._buffer.append(sample)
+        self._check_steady()
+
+    def _discard(self, sample: Dict[str, Any], counter: str):
+        self.counters[counter] += 1
+        if not sample['success']:
+            self.counters['discarded_errors'] += 1
+
+    def _check_steady(self):
+        window = int(self.steady_state['window'])
+        if len(self._buffer) % window or len(self._buffer) < 2 * window:
+            return
+        previous = [s['elapsed_ms'] for s in self._buffer[-2 * window:-window] if s['success']]
+        current = [s['elapsed_ms'] for s in self._buffer[-window:] if s['success']]
+        if len(previous) >= 2 and len(current) >= 2:
+            mean_a, std_a = _mean_std(previous)
+            mean_b, std_b = _mean_std(current)
+            if (_relative_change(mean_a, mean_b) <= self.steady_state['mean_tolerance'] and
+                    _relative_change(std_a, std_b) <= self.steady_state['std_tolerance']):
+                for sample in self._buffer[:-2 * window]:
+                    self._discard(sample, 'discarded_steady_state')
+                self._buffer = self._buffer[-2 * window:]
+                self.counters['steady_state_reached'] += 1
+                self._flush()
+                return
+        if self.max_buffer and len(self._buffer) > self.max_buffer:
+            # Never settled within budget: keep everything rather than drop most of the run
+            self.counters['steady_state_missed'] += 1
+            self._flush()
+
+    def _flush(self):
+        self.settled = True
+        buffered, self._buffer = self._buffer, []
+        for sample in buffered:
+            self.record(sample)
+
+    def close(self):
+        """End of run: a detector that never settled keeps its buffered samples"""
+        if not self.settled:
+            self.counters['steady_state_missed'] += 1
+            self._flush()
+
+
+def warmup_report(counters) -> Optional[Dict[str, Any]]:
+    """Discard counts for the metrics dict (None when nothing was filtered)"""
+    warmup = counters.get('discarded_warmup', 0)
+    steady = counters.get('discarded_steady_state', 0)
+    reached = counters.get('steady_state_reached', 0)
+    missed = counters.get('steady_state_missed', 0)
+    if not (warmup or steady or reached or missed):
+        return None
+    report = {
+        'discarded': warmup + steady,
+        'warmup_discarded': warmup,
+        'steady_state_discarded': steady,
+        'discarded_errors': counters.get('discarded_errors', 0),
+    }
+    if reached or missed:
+        report['steady_state_reached'] = missed == 0
+    return report